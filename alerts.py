@@ -0,0 +1,211 @@
+"""Alertas de anomalia: cada campanha, conjunto e anúncio comparado, dia a dia, com a própria linha de base"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from cube import CATEGORY_DIMENSIONS, encode_dimensions, slice_dates
+from metrics import DERIVED_METRICS
+
+# Métricas avaliadas: nome -> (rótulo, denominador mínimo no dia, direção ruim: 1 alta, -1 queda, 0 ambas)
+ALERT_METRICS = {
+    'cpm': ('CPM', 1000, 1),
+    'ctr': ('CTR', 1000, -1),
+    'cpl': ('CPL', 10, 1),
+    'gasto': ('Ritmo de gasto', 0, 0)
+}
+
+# Níveis avaliados: nome -> (rótulo, dimensões que identificam a entidade)
+ALERT_LEVELS = {
+    'campanha': ('Campanha', ['conta', 'campanha']),
+    'conjunto': ('Conjunto', ['conta', 'campanha', 'conjunto']),
+    'anuncio': ('Anúncio', CATEGORY_DIMENSIONS)
+}
+
+# Dias anteriores que formam a linha de base e mínimo de dias válidos nela
+BASELINE_DAYS = 14
+MIN_BASELINE_DAYS = 7
+
+# Escore robusto (em desvios) a partir do qual o dia é sinalizado
+Z_THRESHOLD = 3.5
+
+# Elementos (entidades × dias × janela) processados por bloco, para limitar a memória
+SCORE_BLOCK_SIZE = 4_000_000
+
+# Desvio tolerado do gasto em relação ao ritmo do orçamento (fração)
+PACE_TOLERANCE = 0.1
+
+# Colunas da tabela de alertas
+ALERT_COLUMNS = ['data', 'nivel'] + CATEGORY_DIMENSIONS + ['metrica', 'valor', 'referencia', 'escore']
+
+
+def entity_matrices(daily, dims, columns):
+    """Matrizes entidades × dias das colunas pedidas, somadas por dia (dias sem linha ficam zerados)
+
+    As entidades são as combinações das dimensões `dims` presentes em `daily`; retorna
+    (tabela das entidades, datas, {coluna: matriz}).
+    """
+    key = np.zeros(len(daily), dtype='int64')
+    for dim in dims:
+        codes = daily[dim].cat.codes.to_numpy().astype('int64')
+        key = key * (len(daily[dim].cat.categories) + 1) + codes + 1
+    _, first, entity = np.unique(key, return_index=True, return_inverse=True)
+    days = daily['data'].to_numpy().astype('datetime64[D]')
+    start = days.min()
+    day = (days - start).astype('int64')
+    n_entities, n_days = len(first), int(day.max()) + 1
+
+    cells = entity * n_days + day
+    matrices = {col: np.bincount(cells, weights=daily[col].to_numpy(dtype='float64'),
+                                 minlength=n_entities * n_days).reshape(n_entities, n_days) for col in columns}
+    entities = daily[dims].iloc[first].reset_index(drop=True)
+    return entities, start + np.arange(n_days), matrices
+
+
+def nan_median(windows, count):
+    """Mediana no último eixo ignorando NaN, por ordenação (NaN vão para o fim); `count` é o total de válidos"""
+    ordered = np.sort(windows, axis=-1)
+    lo = np.take_along_axis(ordered, np.maximum((count - 1) // 2, 0)[..., None], axis=-1)[..., 0]
+    hi = np.take_along_axis(ordered, np.minimum(count // 2, windows.shape[-1] - 1)[..., None], axis=-1)[..., 0]
+    return (lo + hi) / 2
+
+
+def robust_scores(values, first_day=0, log_scale=False):
+    """Escore robusto de cada dia contra os BASELINE_DAYS dias anteriores da mesma entidade
+
+    z = (valor - mediana) / (1,4826 × MAD), com a escala limitada a 1% da mediana
+    para linhas de base constantes. Com `log_scale`, o escore é calculado sobre o
+    logaritmo (desvios relativos, adequado a razões como CPM e CPL). Só os dias a
+    partir de `first_day` são avaliados. Devolve (mediana, escore), com NaN onde a
+    linha de base tem menos de MIN_BASELINE_DAYS dias válidos.
+    """
+    n_entities, n_days = values.shape
+    medians = np.full(values.shape, np.nan)
+    scores = np.full(values.shape, np.nan)
+    first_day = max(first_day, MIN_BASELINE_DAYS)
+    if first_day >= n_days:
+        return medians, scores
+    if log_scale:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(values > 0, np.log(values), np.nan)
+
+    # Janela dos BASELINE_DAYS dias anteriores a cada dia avaliado, e quantos deles são válidos
+    padded = np.concatenate([np.full((n_entities, BASELINE_DAYS), np.nan), values[:, :-1]], axis=1)
+    windows = sliding_window_view(padded, BASELINE_DAYS, axis=1)[:, first_day:]
+    valid_days = np.concatenate([np.zeros((n_entities, 1), dtype='int64'),
+                                 np.cumsum(~np.isnan(padded), axis=1)], axis=1)
+    counts = (valid_days[:, BASELINE_DAYS:] - valid_days[:, :-BASELINE_DAYS])[:, first_day:]
+
+    block = max(1, SCORE_BLOCK_SIZE // ((n_days - first_day) * BASELINE_DAYS))
+    for lo in range(0, n_entities, block):
+        part, count = windows[lo:lo + block], counts[lo:lo + block]
+        median = nan_median(part, count)
+        mad = nan_median(np.abs(part - median[..., None]), count)
+        floor = 0.01 if log_scale else 0.01 * np.abs(median)
+        scale = np.maximum(1.4826 * mad, floor)
+        valid = (count >= MIN_BASELINE_DAYS) & (scale > 0)
+        z = np.full(median.shape, np.nan)
+        np.divide(values[lo:lo + block, first_day:] - median, scale, out=z, where=valid)
+        median[~valid] = np.nan
+        medians[lo:lo + block, first_day:] = np.exp(median) if log_scale else median
+        scores[lo:lo + block, first_day:] = z
+    return medians, scores
+
+
+def metric_matrix(matrices, name, min_denominator):
+    """Valores diários da métrica; NaN onde o denominador do dia fica abaixo do mínimo"""
+    if name not in DERIVED_METRICS:
+        return matrices[name]
+    numerator, denominator, scale = DERIVED_METRICS[name]
+    values = np.full(matrices[denominator].shape, np.nan)
+    enough = matrices[denominator] >= max(min_denominator, 1e-9)
+    np.divide(matrices[numerator] * scale, matrices[denominator], out=values, where=enough)
+    return values
+
+
+def score_alerts(daily, since=None, threshold=Z_THRESHOLD):
+    """Sinaliza os dias em que uma campanha, conjunto ou anúncio se afasta da própria linha de base
+
+    Todas as entidades de um nível são avaliadas de uma vez, em matrizes entidades ×
+    dias. Com `since`, só os dias a partir dessa data são avaliados (os anteriores
+    entram apenas como linha de base).
+    """
+    if since is not None and not daily.empty:
+        daily = slice_dates(daily, pd.Timestamp(since) - pd.Timedelta(days=BASELINE_DAYS), daily['data'].iloc[-1])
+    if daily.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+
+    columns = ['impressoes', 'cliques', 'mensagens', 'gasto']
+    alerts = []
+    for level, (level_label, dims) in ALERT_LEVELS.items():
+        entities, dates, matrices = entity_matrices(daily, dims, columns)
+        first_day = 0 if since is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(since), 'D')))
+        for name, (label, min_denominator, direction) in ALERT_METRICS.items():
+            values = metric_matrix(matrices, name, min_denominator)
+            medians, scores = robust_scores(values, first_day, log_scale=name in DERIVED_METRICS)
+            with np.errstate(invalid='ignore'):
+                flagged = np.abs(scores) >= threshold if direction == 0 else scores * direction >= threshold
+            rows, cols = np.nonzero(flagged)
+            if not len(rows):
+                continue
+            found = entities.iloc[rows].reset_index(drop=True)
+            # Níveis acima do anúncio ficam sem as dimensões mais finas (mesmas categorias, para o concat)
+            for dim in CATEGORY_DIMENSIONS:
+                if dim not in found:
+                    found[dim] = pd.Categorical.from_codes(np.full(len(found), -1), daily[dim].cat.categories)
+            found.insert(0, 'data', dates[cols].astype('datetime64[ns]'))
+            found.insert(1, 'nivel', level_label)
+            found['metrica'] = label
+            found['valor'] = values[rows, cols]
+            found['referencia'] = medians[rows, cols]
+            found['escore'] = scores[rows, cols]
+            alerts.append(found[ALERT_COLUMNS])
+
+    if not alerts:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    return sort_alerts(pd.concat(alerts, ignore_index=True))
+
+
+def extend_alerts(history, daily, since, alerts=None):
+    """Alertas dos dias de `daily` a partir de `since`, contra a linha de base dos dias anteriores de `history`
+
+    Só os dias novos são avaliados; `alerts` (já avaliados, de dias anteriores a
+    `since`) são juntados ao resultado.
+    """
+    rows = pd.concat([history[history['data'] < since], daily[daily['data'] >= since]], ignore_index=True)
+    fresh = score_alerts(encode_dimensions(rows).sort_values('data', kind='stable', ignore_index=True), since)
+    parts = [part for part in (alerts, fresh) if part is not None and not part.empty]
+    return stored_alerts(pd.concat(parts, ignore_index=True) if parts else None)
+
+
+def sort_alerts(alerts):
+    """Mais recentes primeiro e, em cada dia, os maiores desvios (em qualquer direção)"""
+    order = np.lexsort((-alerts['escore'].abs().to_numpy(), -alerts['data'].to_numpy().astype('int64')))
+    return alerts.iloc[order].reset_index(drop=True)
+
+
+def stored_alerts(rows):
+    """Alertas relidos da base local, com as dimensões categóricas (vazias nos níveis acima delas)"""
+    if rows is None or rows.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    rows = rows.astype({dim: 'category' for dim in CATEGORY_DIMENSIONS})
+    rows = rows.astype({'valor': 'float64', 'referencia': 'float64', 'escore': 'float64'})
+    return sort_alerts(rows[ALERT_COLUMNS])
+
+
+def filter_alerts(alerts, start_date=None, end_date=None, selections=None):
+    """Alertas do período e das seleções; níveis acima de uma dimensão selecionada não são filtrados por ela"""
+    if alerts is None or alerts.empty:
+        return alerts
+    mask = np.ones(len(alerts), dtype=bool)
+    if start_date is not None and end_date is not None:
+        mask &= alerts['data'].between(pd.Timestamp(start_date), pd.Timestamp(end_date)).to_numpy()
+    for dim, selected in (selections or {}).items():
+        if selected:
+            mask &= (alerts[dim].isna() | alerts[dim].isin(selected)).to_numpy()
+    return alerts[mask]
+
+
+def budget_pace(spent, budget, elapsed_days, total_days):
+    """Gasto em relação ao esperado até o dia, com o orçamento distribuído por igual no período (1 = no ritmo)"""
+    expected = budget * elapsed_days / total_days
+    return spent / expected if expected > 0 else np.nan
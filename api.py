@@ -0,0 +1,170 @@
+"""API HTTP/JSON local com as métricas e tabelas do dashboard, sem passar pela página do Streamlit
+
+Execução isolada: `python api.py --port 8600`. Com a variável de ambiente
+`DASHBOARD_API_PORT`, o próprio dashboard também a serve, compartilhando os
+conjuntos de dados e o cache de agregações com as sessões abertas.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+from urllib.parse import urlencode
+
+import tornado.web
+
+from engine import Engine, QueryError
+from export import EXPORT_DIR
+from memo import MemoCache
+
+# Porta padrão da API
+DEFAULT_PORT = int(os.environ.get('DASHBOARD_API_PORT') or 8600)
+
+# Máximo de consultas por requisição em lote
+MAX_BULK_QUERIES = 100
+
+# Orçamento de memória das respostas em cache (MB)
+RESPONSE_CACHE_MB = float(os.environ.get('DASHBOARD_API_CACHE_MB', 64))
+
+# Endereço da API visto pelo navegador, usado nos links de download das exportações do dashboard
+PUBLIC_URL = os.environ.get('DASHBOARD_API_URL') or f'http://localhost:{DEFAULT_PORT}'
+
+
+class ApiHandler(tornado.web.RequestHandler):
+    def initialize(self, engine, responses):
+        self.engine = engine
+        self.responses = responses
+
+    def write_json(self, payload, status=200):
+        self.set_status(status)
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+        self.finish(payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False))
+
+
+class HealthHandler(ApiHandler):
+    def get(self):
+        self.write_json({'status': 'ok', 'conjuntos': self.engine.registry.stats(),
+                         'agregacoes': self.engine.cache.stats(), 'respostas': self.responses.stats()})
+
+
+class MetricsHandler(ApiHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4')
+        self.finish(self.engine.registry.prometheus_text() + self.engine.cache.prometheus_text()
+                    + self.responses.prometheus_text('dashboard_api_responses'))
+
+
+class QueryHandler(ApiHandler):
+    """POST /query com uma consulta, ou {"queries": [...]} para várias de uma vez
+
+    Cada consulta roda em uma thread, sem bloquear o laço de eventos; as de um lote
+    rodam em paralelo, e um conjunto de dados pedido por várias é carregado uma vez.
+    """
+
+    async def post(self):
+        try:
+            body = json.loads(self.request.body or b'{}')
+        except ValueError:
+            self.write_json({'erro': 'JSON inválido'}, 400)
+            return
+        if not isinstance(body, dict):
+            self.write_json({'erro': 'A consulta deve ser um objeto JSON'}, 400)
+            return
+
+        if 'queries' not in body:
+            response, error = await self.run_query(body)
+            if error:
+                self.write_json({'erro': error}, 400)
+            else:
+                self.set_header('X-Cache', response[1])
+                self.write_json(response[0])
+            return
+
+        queries = body['queries']
+        if not isinstance(queries, list) or len(queries) > MAX_BULK_QUERIES:
+            self.write_json({'erro': f'"queries" deve ser uma lista de até {MAX_BULK_QUERIES} consultas'}, 400)
+            return
+        results = await asyncio.gather(*(self.run_query(query) for query in queries))
+        # As respostas já serializadas são apenas concatenadas
+        parts = [response[0] if not error else json.dumps({'erro': error}, ensure_ascii=False).encode('utf-8')
+                 for response, error in results]
+        self.write_json(b'{"results": [' + b', '.join(parts) + b']}')
+
+    async def run_query(self, query):
+        """Executa a consulta fora do laço de eventos, devolvendo ((json, hit/miss), None) ou (None, erro)"""
+        if not isinstance(query, dict):
+            return None, 'A consulta deve ser um objeto JSON'
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self.cached_query, query), None
+        except QueryError as e:
+            return None, str(e)
+        except Exception as e:
+            # Um erro inesperado fica restrito à consulta, sem derrubar as demais do lote
+            return None, f'Erro ao executar a consulta: {type(e).__name__}: {e}'
+
+    def cached_query(self, query):
+        """Resposta em JSON da consulta, em cache pela chave do conjunto de dados e pela consulta normalizada"""
+        dataset_key, load = self.engine.resolve(query.get('dataset'), query.get('parse_options'))
+        key = (dataset_key, json.dumps(query, sort_keys=True))
+        hit = key in self.responses
+        payload = self.responses.get_or_compute(key, lambda: json.dumps(
+            self.engine.query(query, dataset_key, load), ensure_ascii=False).encode('utf-8'))
+        return payload, 'hit' if hit else 'miss'
+
+
+class ExportHandler(tornado.web.StaticFileHandler):
+    """GET /exports/<arquivo>?nome=<nome do download>: envia uma exportação do dashboard em blocos, sem
+    carregá-la inteira em memória (o nome do arquivo em disco identifica os dados e os filtros)
+    """
+
+    def set_extra_headers(self, path):
+        name = os.path.basename(self.get_argument('nome', path)).replace('"', '')
+        self.set_header('Content-Disposition', f'attachment; filename="{name}"')
+
+
+def export_url(path, file_name):
+    """Link de download de uma exportação gravada em EXPORT_DIR"""
+    return f'{PUBLIC_URL}/exports/{os.path.basename(path)}?{urlencode({"nome": file_name})}'
+
+
+def make_app(engine=None, responses=None):
+    """Aplicação Tornado da API; `engine` permite compartilhar os dados com o dashboard"""
+    handler_args = {'engine': engine or Engine(), 'responses': responses or MemoCache(RESPONSE_CACHE_MB * 2**20)}
+    return tornado.web.Application([
+        (r'/health', HealthHandler, handler_args),
+        (r'/metrics', MetricsHandler, handler_args),
+        (r'/query', QueryHandler, handler_args),
+        (r'/exports/(.*)', ExportHandler, {'path': EXPORT_DIR})
+    ])
+
+
+def start_in_thread(engine, port=DEFAULT_PORT, address='127.0.0.1'):
+    """Serve a API em uma thread própria (com seu laço de eventos), para rodar junto do dashboard"""
+    ready = threading.Event()
+
+    def serve():
+        async def main():
+            make_app(engine).listen(port, address)
+            ready.set()
+            await asyncio.Event().wait()
+        asyncio.run(main())
+
+    thread = threading.Thread(target=serve, name='dashboard-api', daemon=True)
+    thread.start()
+    ready.wait(timeout=10)
+    return thread
+
+
+async def main(port, address):
+    make_app().listen(port, address)
+    print(f'API do dashboard em http://{address}:{port}')
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='API HTTP/JSON com as métricas e tabelas do dashboard')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--address', default='127.0.0.1', help='Use 0.0.0.0 para aceitar conexões externas')
+    args = parser.parse_args()
+    asyncio.run(main(args.port, args.address))
@@ -1,10 +1,32 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import base64
-import io
-from datetime import datetime, timedelta
+import numpy as np
+import os
+import time
+from functools import partial
+
+from alerts import (ALERT_LEVELS, ALERT_METRICS, BASELINE_DAYS, PACE_TOLERANCE, Z_THRESHOLD, budget_pace,
+                    filter_alerts)
+from api import export_url, start_in_thread
+from charts import (campaign_performance_figure, cpl_figure, cumulative_spend_figure, funnel_figure,
+                    message_rate_figure, rolling_figure, spend_figure, trend_figure, weekday_figure)
+from cube import (COMPARISONS, GRANULARITIES, aggregate_hours, aggregate_weekdays, comparison_window, dimension_options,
+                  filter_dimension, select_cube, slice_dates)
+from downsample import DEFAULT_MAX_POINTS, DOWNSAMPLE_METHODS
+from engine import (DEFAULT_WATCH_DIR, SAMPLE_DEFAULTS, Engine, QueryError, data_path, file_sources, load_files,
+                    load_store_dataset, make_filter_key, sample_dataset, save_dataset, upload_alerts,
+                    watched_data_files)
+from export import EXPORT_FORMATS, export_path, use_export, write_export
+from ingest import (file_content_hash, file_options, list_excel_sheets, parse_files_parallel,
+                    parse_to_cube)
+from memo import MemoCache
+from metrics import percent_change
+from profiling import StageProfiler, history_summary, history_to_json, history_to_prometheus, new_history
+from registry import DatasetRegistry
+from rolling import ROLLING_METRICS, rolling_table
+from store import store_signature
+from tables import (AD_COLUMN_CONFIG, CAMPAIGN_COLUMN_CONFIG, COLUMN_FORMATS, PAGE_SIZES, ad_totals, column_config,
+                    styled_table, table_page)
 
 # Configuração da página
 st.set_page_config(
@@ -112,198 +134,438 @@ st.markdown("""
 st.title("Dashboard Meta Ads")
 st.markdown("Análise de métricas de campanhas do Meta Ads")
 
-# Dados de exemplo para inicialização
-@st.cache_data
-def generate_sample_data():
-    # Criar dados de exemplo para demonstração inicial
-    dates = pd.date_range(start='2025-01-01', end='2025-01-31')
-    campaigns = ['Campanha 1', 'Campanha 2', 'Campanha 3', 'Campanha 4', 'Campanha 5']
-    
-    data = []
-    for campaign in campaigns:
-        for date in dates:
-            impressions = int(pd.np.random.randint(1000, 10000))
-            reach = int(impressions * pd.np.random.uniform(0.7, 0.9))
-            clicks = int(reach * pd.np.random.uniform(0.01, 0.1))
-            messages = int(clicks * pd.np.random.uniform(0.1, 0.5))
-            spend = round(pd.np.random.uniform(50, 500), 2)
-            revenue = round(spend * pd.np.random.uniform(0.8, 4.0), 2)
-            
-            data.append({
-                'data': date.strftime('%Y-%m-%d'),
-                'campanha': campaign,
-                'conjunto': f'Conjunto {date.day % 3 + 1}',
-                'anuncio': f'Anúncio {date.day % 5 + 1}',
-                'impressoes': impressions,
-                'alcance': reach,
-                'cliques': clicks,
-                'mensagens': messages,
-                'ctr': round(clicks / impressions * 100, 2),
-                'cpc': round(spend / clicks, 2) if clicks > 0 else 0,
-                'cpm': round(spend / impressions * 1000, 2),
-                'gasto': spend,
-                'receita': revenue,
-                'roas': round(revenue / spend, 2),
-                'roi': round((revenue - spend) / spend * 100, 2)
-            })
-    
-    df = pd.DataFrame(data)
-    return df
+# Painel de desempenho (opcional): ativado por ?debug=1 ou pela opção na barra lateral
+debug_enabled = st.session_state.get('debug_panel', st.query_params.get('debug') == '1')
+profiler = StageProfiler(debug_enabled, st.session_state.get('debug_profile_stages', []))
 
-# Funções auxiliares para cálculos e processamento
-def calculate_metrics(df):
-    """Calcula métricas agregadas a partir do DataFrame"""
-    metrics = {}
-    
-    # Métricas básicas
-    metrics['gasto_total'] = df['gasto'].sum()
-    metrics['impressoes_total'] = df['impressoes'].sum()
-    metrics['alcance_total'] = df['alcance'].sum()
-    metrics['cliques_total'] = df['cliques'].sum()
-    metrics['mensagens_total'] = df['mensagens'].sum()
-    metrics['receita_total'] = df['receita'].sum()
-    
-    # Métricas calculadas
-    metrics['ctr'] = metrics['cliques_total'] / metrics['impressoes_total'] * 100 if metrics['impressoes_total'] > 0 else 0
-    metrics['cpc'] = metrics['gasto_total'] / metrics['cliques_total'] if metrics['cliques_total'] > 0 else 0
-    metrics['cpm'] = metrics['gasto_total'] / metrics['impressoes_total'] * 1000 if metrics['impressoes_total'] > 0 else 0
-    metrics['taxa_mensagens'] = metrics['mensagens_total'] / metrics['cliques_total'] * 100 if metrics['cliques_total'] > 0 else 0
-    metrics['roas'] = metrics['receita_total'] / metrics['gasto_total'] if metrics['gasto_total'] > 0 else 0
-    metrics['roi'] = (metrics['receita_total'] - metrics['gasto_total']) / metrics['gasto_total'] * 100 if metrics['gasto_total'] > 0 else 0
-    
-    return metrics
-
-def parse_uploaded_file(uploaded_file):
-    """Processa o arquivo CSV carregado"""
-    try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(('.xls', '.xlsx')):
-            df = pd.read_excel(uploaded_file)
+# Quantidade máxima de arquivos processados mantidos em cache (LRU)
+INGEST_CACHE_MAX_ENTRIES = 64
+
+@st.cache_data(max_entries=INGEST_CACHE_MAX_ENTRIES, show_spinner="Processando arquivo...")
+def load_data_file(file_key, file_name, options, _source, _preparsed=None, _on_miss=None):
+    """Processa o arquivo uma única vez por conteúdo e opções de leitura, devolvendo (cubo, esboços, erro, segundos)
+
+    `_source` traz os bytes (upload) ou o caminho (pasta monitorada); `_preparsed`
+    reaproveita o resultado já calculado em paralelo para este arquivo. `_on_miss`
+    é chamada só quando o arquivo é de fato processado (em cache hit o Streamlit
+    devolve o resultado salvo sem executar a função).
+    """
+    if _on_miss is not None:
+        _on_miss()
+    if _preparsed is not None:
+        return _preparsed
+    
+    if options.get('streaming') and file_name.lower().endswith('.csv'):
+        # A barra é criada dentro da função para que o cache consiga reproduzi-la
+        progress_bar = st.progress(0.0, text="Lendo arquivo em blocos...")
+        
+        def report_progress(rows, fraction, elapsed):
+            progress_bar.progress(min(fraction, 1.0), text=f"{rows:,} linhas · {rows / max(elapsed, 1e-6):,.0f} linhas/s")
+        
+        result = parse_to_cube(file_name, _source, options, report_progress)
+        progress_bar.empty()
+        return result
+    return parse_to_cube(file_name, _source, options)
+
+@st.cache_data(max_entries=INGEST_CACHE_MAX_ENTRIES, show_spinner=False)
+def excel_sheet_names(file_key, file_name, _source):
+    """Lista as planilhas de um arquivo Excel uma única vez por arquivo"""
+    return list_excel_sheets(file_name, _source)
+
+def load_session_files(sources, parse_options):
+    """Processa e junta os arquivos, devolvendo (cubo ou None, relatório de importação, esboços de alcance,
+    função dos alertas)"""
+    # Arquivos ainda não processados nesta sessão são lidos em paralelo, um por processo
+    options_keys = {key: tuple(sorted(file_options(name, parse_options).items())) for key, name, _ in sources}
+    parsed_keys = st.session_state.setdefault('parsed_file_keys', set())
+    pending = [source for source in sources if (source[0], options_keys[source[0]]) not in parsed_keys]
+    preparsed = {}
+    if len(pending) > 1:
+        with st.spinner(f"Processando {len(pending)} arquivos em paralelo..."):
+            results = parse_files_parallel([(name, source) for _, name, source in pending], parse_options)
+        preparsed = {key: result for (key, _, _), result in zip(pending, results)}
+    
+    cache_hits = []
+    def parse_file(key, name, source):
+        misses = []
+        result = load_data_file(key, name, file_options(name, parse_options), source, preparsed.get(key),
+                                lambda: misses.append(key))
+        parsed_keys.add((key, options_keys[key]))
+        cache_hits.append(not misses)
+        return result
+    
+    cube, report, sketches = load_files(sources, parse_options, parse_file)
+    for row, hit in zip(report, cache_hits):
+        row['Cache'] = 'hit' if hit else 'miss'
+    return cube, report, sketches, upload_alerts
+
+@st.cache_resource
+def dataset_registry():
+    """Registro dos conjuntos de dados, compartilhado por todas as sessões do processo"""
+    return DatasetRegistry()
+
+@st.cache_resource
+def view_cache():
+    """Cache LRU das agregações e figuras, compartilhado por todas as sessões do processo"""
+    return MemoCache()
+
+@st.cache_resource
+def shared_engine():
+    """Importação e agregações sem o Streamlit, com o registro e o cache compartilhados (usados também pela API)"""
+    return Engine(dataset_registry(), view_cache())
+
+# API HTTP/JSON (opcional), servida no mesmo processo e com os mesmos dados do dashboard
+@st.cache_resource
+def api_server():
+    port = os.environ.get('DASHBOARD_API_PORT')
+    return start_in_thread(shared_engine(), int(port)) if port else None
+
+api_server()
+
+def shared_dataset(dataset_key, load):
+    """Tabelas por período e relatório de importação do conjunto de dados, carregados uma única vez por processo
+
+    `load()` devolve (cubo ou None, relatório); em seguida são calculadas as tabelas
+    por hora (se houver), dia, semana e mês, que todas as sessões recebem sem cópia.
+    """
+    def build():
+        with st.spinner("Carregando conjunto de dados..."):
+            return load()
+    return shared_engine().dataset(dataset_key, build)
+
+# Visualizações do dashboard: apenas a escolhida é calculada a cada execução
+VIEWS = ["Tendências e Funil", "Desempenho de Campanhas", "Tabelas Detalhadas", "Alertas"]
+
+# Máximo de alertas exibidos (os mais recentes e de maior desvio primeiro)
+ALERT_ROWS = 1000
+
+ALERT_COLUMN_CONFIG = {
+    'data': st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+    'nivel': st.column_config.TextColumn("Nível"),
+    'conta': st.column_config.TextColumn("Conta"),
+    'campanha': st.column_config.TextColumn("Campanha"),
+    'conjunto': st.column_config.TextColumn("Conjunto"),
+    'anuncio': st.column_config.TextColumn("Anúncio"),
+    'metrica': st.column_config.TextColumn("Métrica"),
+    'valor': st.column_config.NumberColumn("Valor", format="localized"),
+    'referencia': st.column_config.NumberColumn("Linha de base", format="localized",
+                                                help=f"Mediana dos {BASELINE_DAYS} dias anteriores"),
+    'escore': st.column_config.NumberColumn("Escore", format="%.1f",
+                                            help="Desvios robustos em relação à linha de base")
+}
+
+def memoized(name, filter_key, compute):
+    """Resultado de `compute()` em cache; `filter_key` identifica os dados e os filtros aplicados"""
+    return shared_engine().memoized(name, filter_key, compute)
+
+def filtered_metrics(filter_key, cube, sketches, period, selections):
+    """Métricas principais do estado de filtros (alcance sem duplicidade quando há esboços)"""
+    return shared_engine().metrics(filter_key, cube, sketches, period, selections)
+
+def campaign_summary(filter_key, cube):
+    """Totais e métricas por campanha do estado de filtros"""
+    return shared_engine().campaigns(filter_key, cube)
+
+def period_summary(filter_key, rollups, granularity, period, selections):
+    """Totais por período (hora, dia, semana ou mês) do estado de filtros, a partir das tabelas pré-agregadas"""
+    return shared_engine().periods(filter_key, rollups, granularity, period, selections)
+
+def trend_view(filter_key, rollups, granularity, period, selections, window, max_points, method):
+    """Gráfico de tendências, reduzido ao orçamento de pontos; com `window`, só o trecho (início, fim) é plotado"""
+    def build():
+        period_data = period_summary(filter_key, rollups, granularity, period, selections)
+        if window:
+            period_data = period_data[period_data['data'].between(*window)]
+        return trend_figure(period_data, max_points, method)
+    return memoized('tendencia', (filter_key, granularity, window, max_points, method), build)
+
+def zoom_trend():
+    """Guarda o trecho selecionado (seleção em caixa) no gráfico de tendências, para recalculá-lo em detalhe"""
+    boxes = st.session_state['trend_chart'].selection.get('box', [])
+    if boxes:
+        start, end = sorted(pd.to_datetime(boxes[0]['x']))
+        st.session_state['trend_window'] = (st.session_state['trend_filter_key'], (start, end))
+
+def rolling_view(filter_key, dataset_key, rollups, period, selections, metric, budget):
+    """Gráficos de métrica móvel (7 e 28 dias) e de gasto acumulado do período, lidos da série diária acumulada"""
+    def build():
+        series = shared_engine().rolling_series(dataset_key, rollups, selections)
+        rolling_data = rolling_table(series, *period, metrics=[metric])
+        return {
+            'rolling': rolling_figure(rolling_data, metric, ROLLING_METRICS[metric]),
+            'cumulative': cumulative_spend_figure(rolling_data, budget)
+        }
+    return memoized('moveis', (filter_key, metric, budget), build)
+
+def trends_view(filter_key, cube, metrics):
+    """Figuras da visualização Tendências e Funil (exceto o gráfico de tendências)"""
+    def build():
+        campaign_totals = campaign_summary(filter_key, cube)
+        return {
+            'funnel': funnel_figure(metrics),
+            'message_rate': message_rate_figure(campaign_totals),
+            'cpl': cpl_figure(campaign_totals)
+        }
+    return memoized('tendencias', filter_key, build)
+
+def performance_view(filter_key, cube, hourly=None):
+    """Figuras da visualização Desempenho de Campanhas
+
+    Com `hourly` (função que devolve a tabela por hora já filtrada), o desempenho é
+    agrupado por hora do dia em vez de dia da semana.
+    """
+    def build():
+        campaign_totals = campaign_summary(filter_key, cube)
+        if hourly:
+            day_figure = weekday_figure(aggregate_hours(hourly(), ['ctr']), 'hora_dia')
         else:
-            return None, "Formato de arquivo não suportado. Use CSV ou Excel."
-        
-        # Verificar e padronizar nomes das colunas
-        required_columns = ['data', 'campanha', 'conjunto', 'anuncio', 'impressoes', 
-                           'alcance', 'cliques', 'mensagens', 'gasto', 'receita']
-        
-        # Mapeamento de possíveis nomes de colunas para os nomes padronizados
-        column_mapping = {
-            'date': 'data', 'data': 'data', 'dia': 'data',
-            'campaign': 'campanha', 'campanha': 'campanha', 'campaign_name': 'campanha',
-            'adset': 'conjunto', 'conjunto': 'conjunto', 'ad_set': 'conjunto', 'adset_name': 'conjunto',
-            'ad': 'anuncio', 'anuncio': 'anuncio', 'ad_name': 'anuncio',
-            'impressions': 'impressoes', 'impressoes': 'impressoes',
-            'reach': 'alcance', 'alcance': 'alcance',
-            'clicks': 'cliques', 'cliques': 'cliques',
-            'messages': 'mensagens', 'mensagens': 'mensagens',
-            'spend': 'gasto', 'gasto': 'gasto', 'custo': 'gasto',
-            'revenue': 'receita', 'receita': 'receita', 'valor': 'receita'
+            # Agrupar por dia da semana (já na ordem Segunda → Domingo)
+            day_figure = weekday_figure(aggregate_weekdays(cube, ['ctr']))
+        return {
+            'spend': spend_figure(campaign_totals),
+            'weekday': day_figure,
+            'campaign_performance': campaign_performance_figure(campaign_totals)
         }
-        
-        # Renomear colunas com base no mapeamento
-        df_columns_lower = {col: col.lower() for col in df.columns}
-        df = df.rename(columns=df_columns_lower)
-        
-        for col in df.columns:
-            if col.lower() in column_mapping:
-                df = df.rename(columns={col: column_mapping[col.lower()]})
-        
-        # Verificar se todas as colunas necessárias estão presentes
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            # Para colunas ausentes, criar com valores padrão
-            for col in missing_columns:
-                if col == 'data':
-                    df['data'] = datetime.now().strftime('%Y-%m-%d')
-                elif col in ['impressoes', 'alcance', 'cliques', 'mensagens']:
-                    df[col] = 0
-                elif col in ['gasto', 'receita']:
-                    df[col] = 0.0
-                else:
-                    df[col] = 'Não especificado'
-        
-        # Calcular métricas derivadas se não existirem
-        if 'ctr' not in df.columns:
-            df['ctr'] = df.apply(lambda row: row['cliques'] / row['impressoes'] * 100 if row['impressoes'] > 0 else 0, axis=1)
-        
-        if 'cpc' not in df.columns:
-            df['cpc'] = df.apply(lambda row: row['gasto'] / row['cliques'] if row['cliques'] > 0 else 0, axis=1)
-        
-        if 'cpm' not in df.columns:
-            df['cpm'] = df.apply(lambda row: row['gasto'] / row['impressoes'] * 1000 if row['impressoes'] > 0 else 0, axis=1)
-        
-        if 'roas' not in df.columns:
-            df['roas'] = df.apply(lambda row: row['receita'] / row['gasto'] if row['gasto'] > 0 else 0, axis=1)
-        
-        if 'roi' not in df.columns:
-            df['roi'] = df.apply(lambda row: (row['receita'] - row['gasto']) / row['gasto'] * 100 if row['gasto'] > 0 else 0, axis=1)
-        
-        return df, None
-    except Exception as e:
-        return None, f'Erro ao processar o arquivo: {str(e)}'
+    return memoized('desempenho', (filter_key, hourly is not None), build)
+
+def tables_view(filter_key, cube):
+    """Tabelas da visualização Tabelas Detalhadas"""
+    return shared_engine().tables(filter_key, cube)
+
+def alerts_view(filter_key, alerts, period, selections):
+    return memoized('alertas', filter_key, lambda: filter_alerts(alerts, *period, selections))
+
+def paginated_table(table, config, key):
+    """Exibe uma página da tabela; busca, ordenação e top-N são feitos no servidor e só a página é enviada"""
+    columns = list(table.columns)
+    col_search, col_sort, col_order, col_top, col_size, col_page = st.columns([3, 2, 1, 1, 1, 1])
+    with col_search:
+        search = st.text_input(f"Buscar {COLUMN_FORMATS[columns[0]][0].lower()}", key=f'{key}_search')
+    with col_sort:
+        sort_by = st.selectbox("Ordenar por", columns, index=columns.index('gasto'),
+                               format_func=lambda col: COLUMN_FORMATS[col][0], key=f'{key}_sort')
+    with col_order:
+        ascending = st.selectbox("Ordem", [False, True], format_func=lambda x: 'Crescente' if x else 'Decrescente',
+                                 key=f'{key}_order')
+    with col_top:
+        top_n = st.number_input("Top N", min_value=0, value=0, step=10, key=f'{key}_top', help="0 = todas as linhas")
+    with col_size:
+        page_size = st.selectbox("Linhas por página", PAGE_SIZES, index=1, key=f'{key}_page_size')
+    with col_page:
+        page = st.number_input("Página", min_value=1, value=1, key=f'{key}_page')
+    
+    rows, total, page = table_page(table, search, sort_by, ascending, top_n, page, page_size)
+    st.dataframe(styled_table(rows), use_container_width=True, hide_index=True, column_config=config)
+    page_count = max(1, -(-total // page_size))
+    first = (page - 1) * page_size + 1 if total else 0
+    st.caption(f"{first:,}–{first + len(rows) - 1 if total else 0:,} de {total:,} linha(s) · página {page} de {page_count}")
 
 # Sidebar para upload de arquivo e filtros
 with st.sidebar:
     st.header("Configurações")
     
-    # Upload de arquivo
-    st.subheader("Importar Dados")
-    uploaded_file = st.file_uploader("Carregar arquivo CSV ou Excel", type=["csv", "xlsx", "xls"])
-    
-    if uploaded_file is not None:
-        df, error = parse_uploaded_file(uploaded_file)
-        if error:
-            st.error(error)
-            df = generate_sample_data()
-    else:
-        df = generate_sample_data()
+    with profiler.stage('ingest'):
+        # Upload de arquivo
+        st.subheader("Importar Dados")
+        uploaded_files = st.file_uploader("Carregar arquivos CSV ou Excel", type=["csv", "xlsx", "xls"],
+                                          accept_multiple_files=True)
+        
+        import_options = st.expander("Opções de importação")
+        with import_options:
+            parse_options = {
+                'sep': st.selectbox("Separador (CSV)", [',', ';', '\t'], format_func=lambda x: 'Tab' if x == '\t' else x),
+                'decimal': st.selectbox("Separador decimal (CSV)", ['.', ',']),
+                'streaming': st.checkbox("Leitura em blocos (CSV grandes)",
+                                         help="Lê o arquivo em partes, agregando cada uma, para limitar o uso de memória")
+            }
+            watch_dir = st.text_input("Pasta monitorada", value=DEFAULT_WATCH_DIR,
+                                      help="Arquivos CSV/Excel desta pasta são importados junto com os carregados")
+        
+        # Arquivos a importar: (chave de cache, nome, conteúdo em bytes ou caminho)
+        sources = [(file_content_hash(f.getvalue()), f.name, f.getvalue()) for f in uploaded_files]
+        if watch_dir:
+            try:
+                sources += file_sources(watched_data_files(data_path(watch_dir)))
+            except QueryError as e:
+                st.error(f"Pasta monitorada: {e}")
+        
+        # Planilha a importar dos arquivos Excel (apenas as colunas reconhecidas são lidas)
+        excel_sources = [source for source in sources if source[1].lower().endswith(('.xls', '.xlsx'))]
+        sheet_names = []
+        for key, name, source in excel_sources:
+            try:
+                sheet_names += [sheet for sheet in excel_sheet_names(key, name, source) if sheet not in sheet_names]
+            except Exception as e:
+                st.error(f"{name}: Erro ao abrir a planilha: {str(e)}")
+        with import_options:
+            parse_options['sheet'] = st.selectbox(
+                "Planilha (Excel)", [''] + sheet_names, format_func=lambda x: x or 'Primeira planilha',
+                disabled=not excel_sources
+            )
+        
+        rollups = None
+        if sources:
+            # Conjunto identificado pelo conteúdo dos arquivos e pelas opções de leitura
+            dataset_key = ('arquivos', tuple(key for key, _, _ in sources), tuple(sorted(parse_options.items())))
+            lookup_start = time.perf_counter()
+            shared = dataset_key in dataset_registry()
+            dataset = shared_dataset(dataset_key, partial(load_session_files, sources, parse_options))
+            lookup_time = time.perf_counter() - lookup_start
+            report = dataset['report']
+            for row in report:
+                if row['Erro']:
+                    st.error(f"{row['Arquivo']}: {row['Erro']}")
+                if row['Datas inválidas']:
+                    st.warning(f"{row['Arquivo']}: {row['Datas inválidas']:,} linha(s) com data inválida descartada(s)")
+            
+            # Indicador de cache e relatório do tempo de processamento por arquivo
+            if shared:
+                st.caption(f"⚡ {len(report)} arquivo(s) · compartilhado(s) entre sessões · "
+                           f"consulta em {lookup_time * 1000:.0f} ms")
+            else:
+                hits = sum(row['Cache'] == 'hit' for row in report)
+                st.caption(f"{'⚡ ' if hits == len(report) else ''}{len(report)} arquivo(s) · cache hit {hits} · "
+                           f"miss {len(report) - hits} · consulta em {lookup_time * 1000:.0f} ms")
+            with st.expander("Relatório de importação"):
+                st.dataframe(pd.DataFrame(report), hide_index=True, use_container_width=True)
+            
+            rollups = dataset['rollups']
+            if rollups is not None and st.button("Salvar na base local", help="Acrescenta os arquivos à base local, substituindo dias já importados"):
+                months = save_dataset(dataset)
+                st.success(f"Base local atualizada: {', '.join(months)}")
+        
+        # Sem arquivo válido, usar a base local (se existir) ou os dados de exemplo
+        if rollups is None:
+            signature = store_signature()
+            if signature:
+                dataset_key = ('base', signature)
+                dataset = shared_dataset(dataset_key, load_store_dataset)
+                rollups = dataset['rollups']
+                st.caption(f"Base local · {len(signature)} mês(es) salvos")
+            else:
+                # Tamanho configurável, para testes de carga sem dados reais de clientes
+                with st.expander("Dados de exemplo"):
+                    sample_size = {
+                        'campaigns': st.number_input("Campanhas", min_value=1, value=SAMPLE_DEFAULTS['campaigns']),
+                        'adsets': st.number_input("Conjuntos por campanha", min_value=1,
+                                                  value=SAMPLE_DEFAULTS['adsets']),
+                        'ads': st.number_input("Anúncios por conjunto", min_value=1, value=SAMPLE_DEFAULTS['ads']),
+                        'days': st.number_input("Dias", min_value=1, value=SAMPLE_DEFAULTS['days']),
+                        'seed': st.number_input("Semente", min_value=0, value=SAMPLE_DEFAULTS['seed']),
+                        'hourly': st.checkbox("Dados por hora", value=SAMPLE_DEFAULTS['hourly'])
+                    }
+                    rows = sample_size['campaigns'] * sample_size['adsets'] * sample_size['ads'] * sample_size['days']
+                    rows *= 24 if sample_size['hourly'] else 1
+                    st.caption(f"{rows:,} linhas")
+                try:
+                    dataset_key, load_sample = sample_dataset(sample_size)
+                except QueryError as e:
+                    st.error(str(e))
+                    dataset_key, load_sample = sample_dataset({})
+                dataset = shared_dataset(dataset_key, load_sample)
+                rollups = dataset['rollups']
+        
+        # Tabelas por hora (se houver), dia, semana e mês; filtros e totais usam a diária
+        cube = rollups['dia']
     
     # Filtros
-    st.subheader("Filtros")
-    
-    # Filtro de data
-    min_date = pd.to_datetime(df['data']).min().date()
-    max_date = pd.to_datetime(df['data']).max().date()
-    
-    date_range = st.date_input(
-        "Período",
-        value=(min_date, max_date),
-        min_value=min_date,
-        max_value=max_date
-    )
-    
-    if len(date_range) == 2:
-        start_date, end_date = date_range
-        df_filtered = df[(pd.to_datetime(df['data']).dt.date >= start_date) & 
-                         (pd.to_datetime(df['data']).dt.date <= end_date)]
-    else:
-        df_filtered = df
-    
-    # Filtro de campanha
-    campaigns = sorted(df_filtered['campanha'].unique())
-    selected_campaigns = st.multiselect("Campanhas", campaigns, default=[])
-    
-    if selected_campaigns:
-        df_filtered = df_filtered[df_filtered['campanha'].isin(selected_campaigns)]
-    
-    # Filtro de conjunto
-    adsets = sorted(df_filtered['conjunto'].unique())
-    selected_adsets = st.multiselect("Conjuntos", adsets, default=[])
-    
-    if selected_adsets:
-        df_filtered = df_filtered[df_filtered['conjunto'].isin(selected_adsets)]
-    
-    # Filtro de anúncio
-    ads = sorted(df_filtered['anuncio'].unique())
-    selected_ads = st.multiselect("Anúncios", ads, default=[])
-    
-    if selected_ads:
-        df_filtered = df_filtered[df_filtered['anuncio'].isin(selected_ads)]
+    with profiler.stage('filters'):
+        st.subheader("Filtros")
+        
+        # Filtro de data
+        # O cubo já vem ordenado por data (datetime64)
+        min_date = cube['data'].iloc[0].date()
+        max_date = cube['data'].iloc[-1].date()
+        
+        date_range = st.date_input(
+            "Período",
+            value=(min_date, max_date),
+            min_value=min_date,
+            max_value=max_date
+        )
+        
+        if len(date_range) == 2:
+            start_date, end_date = date_range
+            cube_filtered = slice_dates(cube, start_date, end_date)
+        else:
+            start_date = end_date = None
+            cube_filtered = cube
+        
+        # Comparação com o período anterior de mesma duração ou com o mesmo período do ano anterior
+        comparison = st.selectbox("Comparar com", [None] + list(COMPARISONS), disabled=start_date is None,
+                                  format_func=lambda x: COMPARISONS.get(x, 'Sem comparação'))
+        if start_date is None:
+            comparison = None
+        elif comparison:
+            window = comparison_window(start_date, end_date, comparison)
+            st.caption(f"Comparação: {window[0]:%d/%m/%Y} a {window[1]:%d/%m/%Y}")
+        
+        # Filtro de conta
+        accounts = dimension_options(cube_filtered, 'conta')
+        selected_accounts = st.multiselect("Contas", accounts, default=[])
+        cube_filtered = filter_dimension(cube_filtered, 'conta', selected_accounts)
+        
+        # Filtro de campanha
+        campaigns = dimension_options(cube_filtered, 'campanha')
+        selected_campaigns = st.multiselect("Campanhas", campaigns, default=[])
+        cube_filtered = filter_dimension(cube_filtered, 'campanha', selected_campaigns)
+        
+        # Filtro de conjunto
+        adsets = dimension_options(cube_filtered, 'conjunto')
+        selected_adsets = st.multiselect("Conjuntos", adsets, default=[])
+        cube_filtered = filter_dimension(cube_filtered, 'conjunto', selected_adsets)
+        
+        # Filtro de anúncio
+        ads = dimension_options(cube_filtered, 'anuncio')
+        selected_ads = st.multiselect("Anúncios", ads, default=[])
+        cube_filtered = filter_dimension(cube_filtered, 'anuncio', selected_ads)
+    
+    # Identifica os dados e os filtros aplicados, para o cache das visualizações
+    selections = {'conta': selected_accounts, 'campanha': selected_campaigns, 'conjunto': selected_adsets,
+                  'anuncio': selected_ads}
+    filter_key = make_filter_key(dataset_key, start_date, end_date, selections)
+    
+    # Gráficos de linha longos são reduzidos a um orçamento de pontos por série
+    with st.expander("Opções de gráficos"):
+        granularities = [name for name in GRANULARITIES if name in rollups]
+        granularity = st.selectbox("Granularidade", granularities, index=granularities.index('dia'),
+                                   format_func=GRANULARITIES.get,
+                                   help="Hora disponível quando os dados importados trazem a hora")
+        max_points = st.number_input("Pontos por série (máx.)", min_value=100, max_value=20000,
+                                     value=DEFAULT_MAX_POINTS, step=100)
+        downsample_method = st.selectbox("Redução de pontos", list(DOWNSAMPLE_METHODS),
+                                         format_func=DOWNSAMPLE_METHODS.get)
+        rolling_metric = st.selectbox("Métrica móvel", list(ROLLING_METRICS), format_func=ROLLING_METRICS.get,
+                                      help="Razão das somas de 7 e 28 dias, e não média das razões diárias")
+        budget = st.number_input("Orçamento do período (R$)", min_value=0.0, value=0.0, step=1000.0,
+                                 help="Linha de orçamento no gráfico de gasto acumulado (0 = sem orçamento)")
+    
+    st.toggle("Painel de desempenho", value=debug_enabled, key='debug_panel',
+              help="Mede o tempo de cada etapa da página a cada atualização")
 
 # Calcular métricas
-metrics = calculate_metrics(df_filtered)
+with profiler.stage('metrics'):
+    metrics = filtered_metrics(filter_key, cube_filtered, dataset['reach'], (start_date, end_date), selections)
+    comparison_data = None
+    if comparison:
+        comparison_data = shared_engine().compare(filter_key, rollups, (start_date, end_date), selections, comparison,
+                                                  dataset['reach'])
+
+def show_change(name, lower_is_better=False, neutral=False):
+    """Variação do cartão em relação ao período de comparação (verde quando melhora, vermelho quando piora)"""
+    if comparison_data is None:
+        return
+    change = percent_change(metrics[name], comparison_data['metricas'][name])
+    if np.isnan(change):
+        st.markdown('<p class="metric-change-neutral">Sem dados no período de comparação</p>', unsafe_allow_html=True)
+        return
+    if neutral or round(change, 1) == 0:
+        css = 'neutral'
+    else:
+        css = 'positive' if (change > 0) != lower_is_better else 'negative'
+    arrow = '▲' if change > 0 else '▼' if change < 0 else '■'
+    st.markdown(f'<p class="metric-change-{css}">{arrow} {change:+.1f}% vs {COMPARISONS[comparison].lower()}</p>',
+                unsafe_allow_html=True)
 
 # Métricas principais
 st.header("Visão Geral | Principais Métricas")
@@ -315,24 +577,30 @@ with col1:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     st.markdown('<p class="metric-label">Valor Investido</p>', unsafe_allow_html=True)
     st.markdown(f'<p class="metric-value">R$ {metrics["gasto_total"]:,.2f}</p>', unsafe_allow_html=True)
+    show_change('gasto_total', neutral=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col2:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    st.markdown('<p class="metric-label">Alcance</p>', unsafe_allow_html=True)
+    # Com os esboços de alcance, o cartão mostra as pessoas distintas (estimativa) e não a soma dos dias
+    reach_label = "Alcance único (estimado)" if dataset['reach'] is not None else "Alcance"
+    st.markdown(f'<p class="metric-label">{reach_label}</p>', unsafe_allow_html=True)
     st.markdown(f'<p class="metric-value">{int(metrics["alcance_total"]):,}</p>', unsafe_allow_html=True)
+    show_change('alcance_total')
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col3:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     st.markdown('<p class="metric-label">Impressões</p>', unsafe_allow_html=True)
     st.markdown(f'<p class="metric-value">{int(metrics["impressoes_total"]):,}</p>', unsafe_allow_html=True)
+    show_change('impressoes_total')
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col4:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     st.markdown('<p class="metric-label">CPM</p>', unsafe_allow_html=True)
     st.markdown(f'<p class="metric-value">R$ {metrics["cpm"]:.2f}</p>', unsafe_allow_html=True)
+    show_change('cpm', lower_is_better=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 col5, col6, col7, col8 = st.columns(4)
@@ -341,501 +609,257 @@ with col5:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     st.markdown('<p class="metric-label">Cliques</p>', unsafe_allow_html=True)
     st.markdown(f'<p class="metric-value">{int(metrics["cliques_total"]):,}</p>', unsafe_allow_html=True)
+    show_change('cliques_total')
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col6:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     st.markdown('<p class="metric-label">Mensagens</p>', unsafe_allow_html=True)
     st.markdown(f'<p class="metric-value">{int(metrics["mensagens_total"]):,}</p>', unsafe_allow_html=True)
+    show_change('mensagens_total')
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col7:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     st.markdown('<p class="metric-label">ROI</p>', unsafe_allow_html=True)
     st.markdown(f'<p class="metric-value">{metrics["roi"]:.2f}%</p>', unsafe_allow_html=True)
+    show_change('roi')
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col8:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
     st.markdown('<p class="metric-label">ROAS</p>', unsafe_allow_html=True)
     st.markdown(f'<p class="metric-value">{metrics["roas"]:.2f}</p>', unsafe_allow_html=True)
+    show_change('roas')
     st.markdown('</div>', unsafe_allow_html=True)
 
-# Criar abas para diferentes visualizações
-tab1, tab2, tab3 = st.tabs(["Tendências e Funil", "Desempenho de Campanhas", "Tabelas Detalhadas"])
+# Seletor de visualização: só a escolhida é calculada e enviada ao navegador
+view = st.segmented_control("Visualização", VIEWS, default=VIEWS[0], key='view', label_visibility='collapsed')
 
-with tab1:
-    # Tendências temporais e Funil de Tráfego
-    col_trend, col_funnel = st.columns([2, 1])
-    
-    with col_trend:
-        st.subheader("Tendências Temporais")
-        
-        # Agrupar por data
-        daily_data = df_filtered.groupby('data').agg({
-            'impressoes': 'sum',
-            'alcance': 'sum',
-            'cliques': 'sum',
-            'gasto': 'sum'
-        }).reset_index()
-        
-        # Criar figura de tendências
-        fig_trend = go.Figure()
-        
-        fig_trend.add_trace(go.Scatter(
-            x=daily_data['data'],
-            y=daily_data['impressoes'],
-            mode='lines',
-            name='Impressões',
-            line=dict(color='#3498db', width=2)
-        ))
-        
-        fig_trend.add_trace(go.Scatter(
-            x=daily_data['data'],
-            y=daily_data['alcance'],
-            mode='lines',
-            name='Alcance',
-            line=dict(color='#2ecc71', width=2)
-        ))
-        
-        fig_trend.add_trace(go.Scatter(
-            x=daily_data['data'],
-            y=daily_data['cliques'],
-            mode='lines',
-            name='Cliques',
-            line=dict(color='#e74c3c', width=2)
-        ))
-        
-        fig_trend.update_layout(
-            template='plotly_dark',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=10, r=10, t=10, b=10),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            ),
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(255,255,255,0.1)'
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(255,255,255,0.1)'
-            ),
-            hovermode='x unified'
-        )
-        
-        st.plotly_chart(fig_trend, use_container_width=True)
-    
-    with col_funnel:
-        st.subheader("Funil de Tráfego")
-        
-        # Criar figura de funil
-        fig_funnel = go.Figure(go.Funnel(
-            y=['Impressões', 'Alcance', 'Cliques', 'Mensagens'],
-            x=[metrics['impressoes_total'], metrics['alcance_total'], metrics['cliques_total'], metrics['mensagens_total']],
-            textinfo='value+percent initial',
-            marker=dict(color=['#3498db', '#2ecc71', '#e74c3c', '#f39c12'])
-        ))
-        
-        fig_funnel.update_layout(
-            template='plotly_dark',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=10, r=10, t=10, b=10),
-            funnelmode='stack'
-        )
-        
-        st.plotly_chart(fig_funnel, use_container_width=True)
-    
-    # Segunda linha de gráficos
-    col_msg, col_cpl = st.columns(2)
-    
-    with col_msg:
-        st.subheader("Maiores Taxas de Envio de Mensagens")
-        
-        # Agrupar por campanha
-        campaign_data = df_filtered.groupby('campanha').agg({
-            'mensagens': 'sum',
-            'cliques': 'sum'
-        }).reset_index()
-        
-        # Calcular taxa de mensagens
-        campaign_data['taxa_mensagens'] = campaign_data['mensagens'] / campaign_data['cliques'] * 100
-        campaign_data = campaign_data.sort_values('taxa_mensagens', ascending=False).head(10)
-        
-        # Criar figura de pizza
-        fig_msg = go.Figure(go.Pie(
-            labels=campaign_data['campanha'],
-            values=campaign_data['taxa_mensagens'],
-            hole=0.5,
-            marker=dict(
-                colors=px.colors.sequential.Blues_r,
-                line=dict(color='#000000', width=1)
-            ),
-            textinfo='label+percent',
-            textposition='outside'
-        ))
-        
-        fig_msg.update_layout(
-            template='plotly_dark',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=10, r=10, t=10, b=10),
-            showlegend=False
-        )
-        
-        st.plotly_chart(fig_msg, use_container_width=True)
+if view == VIEWS[1]:
+    with profiler.stage('views.performance'):
+        hourly = None
+        if granularity == 'hora':
+            hourly = partial(select_cube, rollups['hora'], start_date, end_date, selections)
+        figures = performance_view(filter_key, cube_filtered, hourly)
     
-    with col_cpl:
-        st.subheader("Melhores CPL's")
-        
-        # Agrupar por campanha
-        campaign_data = df_filtered.groupby('campanha').agg({
-            'mensagens': 'sum',
-            'gasto': 'sum'
-        }).reset_index()
-        
-        # Calcular CPL (Custo por Lead/Mensagem)
-        campaign_data['cpl'] = campaign_data['gasto'] / campaign_data['mensagens']
-        campaign_data = campaign_data.replace([float('inf'), -float('inf')], float('nan')).dropna(subset=['cpl'])
-        campaign_data = campaign_data.sort_values('cpl').head(10)
-        
-        # Criar figura de barras
-        fig_cpl = go.Figure(go.Bar(
-            x=campaign_data['cpl'],
-            y=campaign_data['campanha'],
-            orientation='h',
-            marker=dict(
-                color='#2ecc71',
-                line=dict(color='#27ae60', width=1)
-            ),
-            text=campaign_data['cpl'].apply(lambda x: f'R$ {x:.2f}'),
-            textposition='auto'
-        ))
-        
-        fig_cpl.update_layout(
-            template='plotly_dark',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=10, r=10, t=10, b=10),
-            xaxis_title='Custo por Lead (R$)',
-            yaxis=dict(
-                title='',
-                autorange='reversed'
-            )
-        )
-        
-        st.plotly_chart(fig_cpl, use_container_width=True)
-
-with tab2:
     # Desempenho de Campanhas
     col_spend, col_day = st.columns(2)
     
     with col_spend:
         st.subheader("Campanhas com Maior Investimento")
-        
-        # Agrupar por campanha
-        campaign_data = df_filtered.groupby('campanha').agg({
-            'gasto': 'sum'
-        }).reset_index()
-        
-        campaign_data = campaign_data.sort_values('gasto', ascending=False).head(10)
-        
-        # Criar figura de pizza
-        fig_spend = go.Figure(go.Pie(
-            labels=campaign_data['campanha'],
-            values=campaign_data['gasto'],
-            hole=0.5,
-            marker=dict(
-                colors=px.colors.sequential.Reds_r,
-                line=dict(color='#000000', width=1)
-            ),
-            textinfo='label+percent',
-            textposition='outside',
-            hovertemplate='%{label}<br>R$ %{value:.2f}<br>%{percent}'
-        ))
-        
-        fig_spend.update_layout(
-            template='plotly_dark',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=10, r=10, t=10, b=10),
-            showlegend=False
-        )
-        
-        st.plotly_chart(fig_spend, use_container_width=True)
+        with profiler.stage('charts.spend'):
+            st.plotly_chart(figures['spend'], use_container_width=True)
     
     with col_day:
-        st.subheader("Desempenho por Dia da Semana")
-        
-        # Converter data para dia da semana
-        df_filtered['dia_semana'] = pd.to_datetime(df_filtered['data']).dt.day_name()
-        
-        # Ordem dos dias da semana
-        dias_semana_ordem = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        dias_semana_pt = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
-        dia_mapping = dict(zip(dias_semana_ordem, dias_semana_pt))
-        
-        # Mapear nomes em inglês para português
-        df_filtered['dia_semana_pt'] = df_filtered['dia_semana'].map(dia_mapping)
-        
-        # Agrupar por dia da semana
-        day_data = df_filtered.groupby('dia_semana_pt').agg({
-            'mensagens': 'sum',
-            'cliques': 'sum',
-            'impressoes': 'sum',
-            'gasto': 'sum'
-        }).reset_index()
-        
-        # Reordenar os dias da semana
-        day_data['dia_semana_ordem'] = day_data['dia_semana_pt'].map(dict(zip(dias_semana_pt, range(7))))
-        day_data = day_data.sort_values('dia_semana_ordem')
-        
-        # Criar figura
-        fig_day = go.Figure()
-        
-        # Adicionar barras para mensagens
-        fig_day.add_trace(go.Bar(
-            x=day_data['dia_semana_pt'],
-            y=day_data['mensagens'],
-            name='Mensagens',
-            marker_color='#3498db'
-        ))
-        
-        # Adicionar linha para CTR (Cliques / Impressões)
-        day_data['ctr'] = day_data['cliques'] / day_data['impressoes'] * 100
-        
-        fig_day.add_trace(go.Scatter(
-            x=day_data['dia_semana_pt'],
-            y=day_data['ctr'],
-            mode='lines+markers',
-            name='CTR (%)',
-            yaxis='y2',
-            line=dict(color='#f39c12', width=3),
-            marker=dict(size=8)
-        ))
-        
-        # Configurar layout
-        fig_day.update_layout(
-            template='plotly_dark',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=10, r=10, t=10, b=10),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            ),
-            yaxis=dict(
-                title='Mensagens',
-                showgrid=True,
-                gridcolor='rgba(255,255,255,0.1)'
-            ),
-            yaxis2=dict(
-                title='CTR (%)',
-                overlaying='y',
-                side='right',
-                showgrid=False
-            ),
-            barmode='group'
-        )
-        
-        st.plotly_chart(fig_day, use_container_width=True)
+        st.subheader("Desempenho por Hora do Dia" if hourly else "Desempenho por Dia da Semana")
+        with profiler.stage('charts.weekday'):
+            st.plotly_chart(figures['weekday'], use_container_width=True)
     
     # Gráfico de desempenho por campanha
     st.subheader("Desempenho por Campanha")
-    
-    # Agrupar por campanha
-    campaign_perf = df_filtered.groupby('campanha').agg({
-        'impressoes': 'sum',
-        'alcance': 'sum',
-        'cliques': 'sum',
-        'mensagens': 'sum',
-        'gasto': 'sum',
-        'receita': 'sum'
-    }).reset_index()
-    
-    # Calcular métricas adicionais
-    campaign_perf['ctr'] = campaign_perf['cliques'] / campaign_perf['impressoes'] * 100
-    campaign_perf['roas'] = campaign_perf['receita'] / campaign_perf['gasto']
-    campaign_perf = campaign_perf.sort_values('gasto', ascending=False)
-    
-    # Criar figura de barras
-    fig_perf = go.Figure()
-    
-    fig_perf.add_trace(go.Bar(
-        x=campaign_perf['campanha'],
-        y=campaign_perf['gasto'],
-        name='Gasto (R$)',
-        marker_color='#e74c3c'
-    ))
-    
-    fig_perf.add_trace(go.Bar(
-        x=campaign_perf['campanha'],
-        y=campaign_perf['receita'],
-        name='Receita (R$)',
-        marker_color='#2ecc71'
-    ))
-    
-    fig_perf.add_trace(go.Scatter(
-        x=campaign_perf['campanha'],
-        y=campaign_perf['roas'],
-        mode='lines+markers',
-        name='ROAS',
-        yaxis='y2',
-        line=dict(color='#f39c12', width=3),
-        marker=dict(size=8)
-    ))
-    
-    fig_perf.update_layout(
-        template='plotly_dark',
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        margin=dict(l=10, r=10, t=10, b=10),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        ),
-        yaxis=dict(
-            title='Valor (R$)',
-            showgrid=True,
-            gridcolor='rgba(255,255,255,0.1)'
-        ),
-        yaxis2=dict(
-            title='ROAS',
-            overlaying='y',
-            side='right',
-            showgrid=False
-        ),
-        barmode='group'
-    )
-    
-    st.plotly_chart(fig_perf, use_container_width=True)
+    with profiler.stage('charts.campaign_performance'):
+        st.plotly_chart(figures['campaign_performance'], use_container_width=True)
 
-with tab3:
+elif view == VIEWS[2]:
+    with profiler.stage('views.tables'):
+        if comparison_data:
+            tables = shared_engine().compare_tables(filter_key, rollups, (start_date, end_date), selections, comparison)
+        else:
+            tables = tables_view(filter_key, cube_filtered)
+    
     # Tabelas Detalhadas
     st.subheader("Campanhas Publicadas")
-    
-    # Agrupar por campanha
-    campaign_data = df_filtered.groupby('campanha').agg({
-        'alcance': 'sum',
-        'impressoes': 'sum',
-        'cliques': 'sum',
-        'mensagens': 'sum',
-        'gasto': 'sum',
-        'receita': 'sum'
-    }).reset_index()
-    
-    # Calcular métricas adicionais
-    campaign_data['ctr'] = campaign_data['cliques'] / campaign_data['impressoes'] * 100
-    campaign_data['cpc'] = campaign_data['gasto'] / campaign_data['cliques']
-    campaign_data['cpm'] = campaign_data['gasto'] / campaign_data['impressoes'] * 1000
-    campaign_data['roas'] = campaign_data['receita'] / campaign_data['gasto']
-    campaign_data['roi'] = (campaign_data['receita'] - campaign_data['gasto']) / campaign_data['gasto'] * 100
-    
-    # Substituir infinitos e NaN
-    campaign_data = campaign_data.replace([float('inf'), -float('inf')], 0).fillna(0)
-    
-    # Formatar valores para exibição
-    campaign_data_display = campaign_data.copy()
-    campaign_data_display['alcance'] = campaign_data_display['alcance'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
-    campaign_data_display['impressoes'] = campaign_data_display['impressoes'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
-    campaign_data_display['cliques'] = campaign_data_display['cliques'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
-    campaign_data_display['mensagens'] = campaign_data_display['mensagens'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
-    campaign_data_display['gasto'] = campaign_data_display['gasto'].apply(lambda x: f"R$ {x:.2f}")
-    campaign_data_display['ctr'] = campaign_data_display['ctr'].apply(lambda x: f"{x:.2f}%")
-    campaign_data_display['cpc'] = campaign_data_display['cpc'].apply(lambda x: f"R$ {x:.2f}")
-    campaign_data_display['cpm'] = campaign_data_display['cpm'].apply(lambda x: f"R$ {x:.2f}")
-    campaign_data_display['roas'] = campaign_data_display['roas'].apply(lambda x: f"{x:.2f}")
-    campaign_data_display['roi'] = campaign_data_display['roi'].apply(lambda x: f"{x:.2f}%")
-    
-    # Renomear colunas para exibição
-    campaign_data_display = campaign_data_display.rename(columns={
-        'campanha': 'Campanha',
-        'alcance': 'Alcance',
-        'impressoes': 'Impressões',
-        'cliques': 'Cliques',
-        'mensagens': 'Mensagens',
-        'gasto': 'Gasto',
-        'ctr': 'CTR',
-        'cpc': 'CPC',
-        'cpm': 'CPM',
-        'roas': 'ROAS',
-        'roi': 'ROI'
-    })
-    
-    st.dataframe(campaign_data_display, use_container_width=True)
+    with profiler.stage('tables.campaigns'):
+        paginated_table(tables['campaigns'], column_config(tables['campaigns'].columns) if comparison_data
+                        else CAMPAIGN_COLUMN_CONFIG, 'campaigns')
     
     st.subheader("Criativos Validados")
+    with profiler.stage('tables.ads'):
+        paginated_table(tables['ads'], column_config(tables['ads'].columns) if comparison_data else AD_COLUMN_CONFIG,
+                        'ads')
+
+elif view == VIEWS[3]:
+    with profiler.stage('views.alerts'):
+        alerts = alerts_view(filter_key, dataset['alerts'], (start_date, end_date), selections)
+    
+    # Ritmo de gasto do período em relação ao orçamento informado
+    st.subheader("Ritmo do Orçamento")
+    if budget > 0 and not cube_filtered.empty:
+        period_start, period_end = start_date or min_date, end_date or max_date
+        last_day = min(cube_filtered['data'].iloc[-1].date(), period_end)
+        total_days = (period_end - period_start).days + 1
+        elapsed_days = (last_day - period_start).days + 1
+        pace = budget_pace(metrics['gasto_total'], budget, elapsed_days, total_days)
+        expected = budget * elapsed_days / total_days
+        message = (f"Gasto de R$ {metrics['gasto_total']:,.2f} em {elapsed_days} de {total_days} dia(s): "
+                   f"{pace:.0%} do esperado (R$ {expected:,.2f})")
+        if pace > 1 + PACE_TOLERANCE:
+            st.warning(f"Acima do ritmo. {message}")
+        elif pace < 1 - PACE_TOLERANCE:
+            st.warning(f"Abaixo do ritmo. {message}")
+        else:
+            st.success(f"No ritmo. {message}")
+    else:
+        st.caption("Informe o orçamento do período em \"Opções de gráficos\" para acompanhar o ritmo de gasto")
     
-    # Agrupar por anúncio
-    ad_data = df_filtered.groupby('anuncio').agg({
-        'alcance': 'sum',
-        'impressoes': 'sum',
-        'cliques': 'sum',
-        'mensagens': 'sum',
-        'gasto': 'sum'
-    }).reset_index()
+    # Dias em que campanhas, conjuntos ou anúncios se afastaram da própria linha de base
+    st.subheader("Anomalias")
+    if alerts is None or alerts.empty:
+        st.info("Nenhum alerta no período e nos filtros selecionados")
+    else:
+        counts = alerts['metrica'].value_counts()
+        for col, (label, _, _) in zip(st.columns(len(ALERT_METRICS)), ALERT_METRICS.values()):
+            col.metric(label, f"{counts.get(label, 0):,}")
+        level_labels = [label for label, _ in ALERT_LEVELS.values()]
+        levels = st.multiselect("Níveis", level_labels, default=level_labels)
+        shown = alerts[alerts['nivel'].isin(levels)]
+        st.dataframe(shown.head(ALERT_ROWS), use_container_width=True, hide_index=True,
+                     column_config=ALERT_COLUMN_CONFIG)
+        st.caption(f"{min(len(shown), ALERT_ROWS):,} de {len(shown):,} alerta(s) · escore robusto ≥ {Z_THRESHOLD} "
+                   f"em relação à mediana dos {BASELINE_DAYS} dias anteriores de cada entidade")
+
+else:
+    with profiler.stage('views.trends'):
+        figures = trends_view(filter_key, cube_filtered, metrics)
     
-    # Calcular métricas adicionais
-    ad_data['ctr'] = ad_data['cliques'] / ad_data['impressoes'] * 100
-    ad_data['cpc'] = ad_data['gasto'] / ad_data['cliques']
-    ad_data['cpm'] = ad_data['gasto'] / ad_data['impressoes'] * 1000
-    ad_data['cpl'] = ad_data['gasto'] / ad_data['mensagens']
+    # Tendências temporais e Funil de Tráfego
+    col_trend, col_funnel = st.columns([2, 1])
     
-    # Substituir infinitos e NaN
-    ad_data = ad_data.replace([float('inf'), -float('inf')], 0).fillna(0)
+    with col_trend:
+        st.subheader("Tendências Temporais")
+        
+        # Selecionar um trecho no gráfico recalcula apenas esse trecho, com mais detalhe
+        zoom = st.session_state.get('trend_window')
+        window = zoom[1] if zoom and zoom[0] == filter_key else None
+        st.session_state['trend_filter_key'] = filter_key
+        with profiler.stage('charts.trend'):
+            st.plotly_chart(trend_view(filter_key, rollups, granularity, (start_date, end_date), selections, window,
+                                       max_points, downsample_method),
+                            use_container_width=True, key='trend_chart', on_select=zoom_trend, selection_mode='box')
+        if window:
+            st.caption(f"Trecho de {window[0]:%d/%m/%Y %H:%M} a {window[1]:%d/%m/%Y %H:%M}")
+            st.button("Ver período completo", on_click=lambda: st.session_state.pop('trend_window', None))
     
-    # Formatar valores para exibição
-    ad_data_display = ad_data.copy()
-    ad_data_display['alcance'] = ad_data_display['alcance'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
-    ad_data_display['impressoes'] = ad_data_display['impressoes'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
-    ad_data_display['cliques'] = ad_data_display['cliques'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
-    ad_data_display['mensagens'] = ad_data_display['mensagens'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
-    ad_data_display['gasto'] = ad_data_display['gasto'].apply(lambda x: f"R$ {x:.2f}")
-    ad_data_display['ctr'] = ad_data_display['ctr'].apply(lambda x: f"{x:.2f}%")
-    ad_data_display['cpc'] = ad_data_display['cpc'].apply(lambda x: f"R$ {x:.2f}")
-    ad_data_display['cpm'] = ad_data_display['cpm'].apply(lambda x: f"R$ {x:.2f}")
-    ad_data_display['cpl'] = ad_data_display['cpl'].apply(lambda x: f"R$ {x:.2f}")
+    with col_funnel:
+        st.subheader("Funil de Tráfego")
+        with profiler.stage('charts.funnel'):
+            st.plotly_chart(figures['funnel'], use_container_width=True)
     
-    # Renomear colunas para exibição
-    ad_data_display = ad_data_display.rename(columns={
-        'anuncio': 'Anúncio',
-        'alcance': 'Alcance',
-        'impressoes': 'Impressões',
-        'cliques': 'Cliques',
-        'mensagens': 'Mensagens',
-        'gasto': 'Gasto',
-        'ctr': 'CTR',
-        'cpc': 'CPC',
-        'cpm': 'CPM',
-        'cpl': 'CPL'
-    })
+    # Segunda linha de gráficos
+    col_msg, col_cpl = st.columns(2)
     
-    st.dataframe(ad_data_display, use_container_width=True)
+    with col_msg:
+        st.subheader("Maiores Taxas de Envio de Mensagens")
+        with profiler.stage('charts.message_rate'):
+            st.plotly_chart(figures['message_rate'], use_container_width=True)
+    
+    with col_cpl:
+        st.subheader("Melhores CPL's")
+        with profiler.stage('charts.cpl'):
+            st.plotly_chart(figures['cpl'], use_container_width=True)
+    
+    # Terceira linha: métricas móveis e gasto acumulado
+    with profiler.stage('views.rolling'):
+        rolling_figures = rolling_view(filter_key, dataset_key, rollups, (start_date, end_date), selections,
+                                       rolling_metric, budget)
+    col_rolling, col_cumulative = st.columns(2)
+    
+    with col_rolling:
+        st.subheader(f"{ROLLING_METRICS[rolling_metric].split(' (')[0]} Móvel (7 e 28 dias)")
+        with profiler.stage('charts.rolling'):
+            st.plotly_chart(rolling_figures['rolling'], use_container_width=True)
+    
+    with col_cumulative:
+        st.subheader("Gasto Acumulado")
+        with profiler.stage('charts.cumulative'):
+            st.plotly_chart(rolling_figures['cumulative'], use_container_width=True)
 
 # Rodapé
 st.markdown("---")
 st.markdown("Dashboard Meta Ads - Versão Online")
 
-# Botão para download dos dados
-def convert_df_to_csv(df):
-    return df.to_csv(index=False).encode('utf-8')
+# Exportação dos dados: gerada só quando pedida e reaproveitada para o mesmo estado de filtros
+EXPORT_SCOPES = {'detalhado': 'Dados filtrados', 'agregado': 'Tabelas de campanhas e anúncios'}
 
-csv = convert_df_to_csv(df_filtered)
-st.download_button(
-    label="Baixar Dados Filtrados (CSV)",
-    data=csv,
-    file_name='meta_ads_data.csv',
-    mime='text/csv',
-)
+with st.expander("Exportar dados"):
+    col_scope, col_format = st.columns(2)
+    with col_scope:
+        export_scope = st.radio("Conteúdo", list(EXPORT_SCOPES), format_func=EXPORT_SCOPES.get, horizontal=True)
+    with col_format:
+        export_format = st.radio("Formato", list(EXPORT_FORMATS), format_func=lambda x: EXPORT_FORMATS[x][0],
+                                 horizontal=True)
+    
+    aggregated = export_scope == 'agregado'
+    path = export_path((filter_key, export_scope), export_format, multiple=aggregated)
+    if st.button("Preparar arquivo") and not os.path.exists(path):
+        with profiler.stage('export'), st.spinner("Gerando arquivo..."):
+            try:
+                if aggregated:
+                    write_export({'campanhas': campaign_summary(filter_key, cube_filtered),
+                                  'anuncios': ad_totals(cube_filtered)}, path, export_format)
+                else:
+                    # Com dados por hora, o detalhado sai por hora, e não somado por dia
+                    detailed = select_cube(rollups.get('hora', cube), start_date, end_date, selections)
+                    write_export({'dados': detailed}, path, export_format, derived=True)
+            except ValueError as e:
+                st.error(str(e))
+    
+    if use_export(path):
+        label = f"Baixar arquivo ({os.path.getsize(path) / 2**20:,.1f} MB)"
+        file_name = f'meta_ads_{export_scope}{os.path.splitext(path)[1]}'
+        if api_server():
+            # A API envia o arquivo do disco em blocos
+            st.link_button(label, export_url(path, file_name))
+        else:
+            # Sem a API, o st.download_button lê o arquivo inteiro para a sessão
+            with open(path, 'rb') as export_file:
+                st.download_button(
+                    label=label,
+                    data=export_file,
+                    file_name=file_name,
+                    mime='application/zip' if path.endswith('.zip') else EXPORT_FORMATS[export_format][2]
+                )
+
+# Painel de desempenho: tempos desta execução e histórico da sessão
+if profiler.enabled:
+    history = st.session_state.setdefault('debug_history', new_history())
+    run = profiler.finish(history)
+    
+    with st.expander(f"Desempenho · {run['total'] * 1000:.0f} ms nesta execução", expanded=True):
+        summary = pd.DataFrame(history_summary(history))
+        for col in ['ultima', 'mediana', 'p90', 'media']:
+            summary[col] = summary[col] * 1000
+        st.dataframe(
+            summary.rename(columns={'etapa': 'Etapa', 'ultima': 'Última (ms)', 'mediana': 'Mediana (ms)',
+                                    'p90': 'p90 (ms)', 'media': 'Média (ms)', 'execucoes': 'Execuções'}),
+            hide_index=True, use_container_width=True,
+            column_config={col: st.column_config.NumberColumn(format="%.1f")
+                           for col in ['Última (ms)', 'Mediana (ms)', 'p90 (ms)', 'Média (ms)']}
+        )
+        st.caption(f"Histórico das últimas {len(history)} execução(ões) desta sessão")
+        
+        cache_stats = view_cache().stats()
+        st.caption(f"Cache de agregações e figuras: hit {cache_stats['hits']} · miss {cache_stats['misses']} · "
+                   f"{cache_stats['entries']} entrada(s) · {cache_stats['bytes'] / 2**20:.1f} de "
+                   f"{cache_stats['max_bytes'] / 2**20:.0f} MB · {cache_stats['evictions']} descartada(s)")
+        registry_stats = dataset_registry().stats()
+        st.caption(f"Conjuntos de dados compartilhados: {registry_stats['entries']} · hit {registry_stats['hits']} · "
+                   f"miss {registry_stats['misses']} · {registry_stats['bytes'] / 2**20:.1f} de "
+                   f"{registry_stats['max_bytes'] / 2**20:.0f} MB · {registry_stats['evictions']} descartado(s)")
+        
+        col_json, col_prom = st.columns(2)
+        with col_json:
+            st.download_button("Exportar histórico (JSON)", history_to_json(history),
+                               file_name='desempenho.json', mime='application/json')
+        with col_prom:
+            st.download_button("Exportar histórico (Prometheus)",
+                               history_to_prometheus(history) + view_cache().prometheus_text()
+                               + dataset_registry().prometheus_text(),
+                               file_name='desempenho.prom', mime='text/plain')
+        
+        # O perfil é capturado na próxima execução das etapas escolhidas
+        st.multiselect("Capturar perfil (cProfile) das etapas", list(run['stages']), key='debug_profile_stages')
+        for name, report in profiler.profiles.items():
+            st.markdown(f"**{name}**")
+            st.code(report, language=None)
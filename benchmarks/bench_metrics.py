@@ -0,0 +1,66 @@
+"""Compara o cálculo linha a linha (df.apply) com o cálculo vetorizado das métricas derivadas
+
+Uso:
+    python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --sizes 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import add_derived_metrics  # noqa: E402
+
+
+def make_frame(rows, seed=42):
+    """Gera colunas numéricas aleatórias com alguns denominadores zerados"""
+    rng = np.random.default_rng(seed)
+    impressions = rng.integers(0, 10000, rows)
+    clicks = (impressions * rng.uniform(0, 0.1, rows)).astype(int)
+    spend = np.round(rng.uniform(0, 500, rows), 2)
+    spend[rng.random(rows) < 0.01] = 0
+    return pd.DataFrame({
+        'impressoes': impressions,
+        'cliques': clicks,
+        'gasto': spend,
+        'receita': np.round(spend * rng.uniform(0.8, 4.0, rows), 2),
+    })
+
+
+def rowwise_metrics(df):
+    """Implementação anterior, com um df.apply por métrica"""
+    df['ctr'] = df.apply(lambda row: row['cliques'] / row['impressoes'] * 100 if row['impressoes'] > 0 else 0, axis=1)
+    df['cpc'] = df.apply(lambda row: row['gasto'] / row['cliques'] if row['cliques'] > 0 else 0, axis=1)
+    df['cpm'] = df.apply(lambda row: row['gasto'] / row['impressoes'] * 1000 if row['impressoes'] > 0 else 0, axis=1)
+    df['roas'] = df.apply(lambda row: row['receita'] / row['gasto'] if row['gasto'] > 0 else 0, axis=1)
+    df['roi'] = df.apply(lambda row: (row['receita'] - row['gasto']) / row['gasto'] * 100 if row['gasto'] > 0 else 0, axis=1)
+    return df
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df.copy())
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'df.apply (s)':>14} {'vetorizado (s)':>16} {'ganho':>8}")
+    for rows in args.sizes:
+        df = make_frame(rows)
+        expected, rowwise_time = timed(rowwise_metrics, df)
+        result, vectorized_time = timed(add_derived_metrics, df)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+        print(f"{rows:>10,} {rowwise_time:>14.3f} {vectorized_time:>16.4f} {rowwise_time / vectorized_time:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""Mede cada etapa do pipeline do dashboard (importação, filtros, agregações, gráficos e tabelas)
+
+Gera dados sintéticos em várias escalas, executa as mesmas funções usadas pelo
+app.py e grava, em JSON, o tempo (melhor de N execuções) e o pico de memória de
+cada etapa. Com --baseline, compara com um resultado anterior e termina com
+erro se alguma etapa ficou mais lenta que o limite.
+
+Uso:
+    python benchmarks/bench_pipeline.py --output resultados.json
+    python benchmarks/bench_pipeline.py --sizes 10000 100000 --baseline resultados.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import charts  # noqa: E402
+from cube import aggregate, aggregate_weekdays, build_cube, dimension_options, filter_dimension, slice_dates  # noqa: E402
+from ingest import parse_uploaded_file, stream_csv_to_cube  # noqa: E402
+from metrics import calculate_metrics  # noqa: E402
+from sample_data import generate_sample_data  # noqa: E402
+from tables import ad_table, ad_totals, campaign_table  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+
+# Dimensões fixas dos dados sintéticos; o número de campanhas cresce com a escala
+DAYS = 90
+ADSETS = 4
+ADS = 5
+
+
+def measure(func, repeat):
+    """Executa a etapa sob tracemalloc (pico de memória) e depois mede o melhor tempo de `repeat` execuções"""
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, {'seconds': best, 'peak_mb': peak / 2**20}
+
+
+def csv_buffer(csv_bytes):
+    buffer = io.BytesIO(csv_bytes)
+    buffer.name = 'benchmark.csv'
+    return buffer
+
+
+def run_scale(rows, repeat):
+    """Executa todas as etapas para um volume de linhas"""
+    campaigns = max(1, round(rows / (DAYS * ADSETS * ADS)))
+    raw = generate_sample_data(campaigns, ADSETS, ADS, DAYS, seed=42)
+    raw_rows = len(raw)
+    csv_bytes = raw.to_csv(index=False, date_format='%Y-%m-%d').encode('utf-8')
+    del raw
+
+    stages = {}
+
+    def stage(name, func):
+        result, stages[name] = measure(func, repeat)
+        return result
+
+    # Importação
+    df = stage('ingest.parse_csv', lambda: parse_uploaded_file(csv_buffer(csv_bytes))[0])
+    cube = stage('ingest.build_cube', lambda: build_cube(df))
+    del df
+    stage('ingest.stream_csv', lambda: stream_csv_to_cube(csv_buffer(csv_bytes))[0])
+
+    # Filtros: metade do período e metade das campanhas
+    dates = cube['data']
+    start_date = dates.iloc[0] + (dates.iloc[-1] - dates.iloc[0]) / 4
+    end_date = dates.iloc[-1] - (dates.iloc[-1] - dates.iloc[0]) / 4
+    selected = dimension_options(cube, 'campanha')[::2]
+
+    def apply_filters():
+        filtered = slice_dates(cube, start_date, end_date)
+        for dimension in ['conta', 'conjunto', 'anuncio']:
+            dimension_options(filtered, dimension)
+        return filter_dimension(filtered, 'campanha', selected)
+
+    filtered = stage('filter', apply_filters)
+
+    # Métricas e agregações
+    metrics = stage('metrics.calculate', lambda: calculate_metrics(filtered))
+    daily_data = stage('aggregate.daily', lambda: aggregate(filtered, 'data'))
+    campaign_totals = stage('aggregate.campaigns', lambda: aggregate(
+        filtered, 'campanha', ['ctr', 'cpc', 'cpm', 'cpl', 'taxa_mensagens', 'roas', 'roi']))
+    day_data = stage('aggregate.weekdays', lambda: aggregate_weekdays(filtered, ['ctr']))
+    ad_data = stage('aggregate.ads', lambda: ad_totals(filtered))
+
+    # Gráficos e serialização para o navegador
+    figures = [
+        stage('charts.trend', lambda: charts.trend_figure(daily_data)),
+        stage('charts.funnel', lambda: charts.funnel_figure(metrics)),
+        stage('charts.message_rate', lambda: charts.message_rate_figure(campaign_totals)),
+        stage('charts.cpl', lambda: charts.cpl_figure(campaign_totals)),
+        stage('charts.spend', lambda: charts.spend_figure(campaign_totals)),
+        stage('charts.weekday', lambda: charts.weekday_figure(day_data)),
+        stage('charts.campaign_performance', lambda: charts.campaign_performance_figure(campaign_totals)),
+    ]
+    stage('charts.to_json', lambda: [figure.to_json() for figure in figures])
+
+    # Tabelas do tab3
+    stage('tables.campaigns', lambda: campaign_table(campaign_totals))
+    stage('tables.ads', lambda: ad_table(ad_data))
+
+    return {
+        'rows': raw_rows,
+        'cube_rows': int(cube.shape[0]),
+        'csv_mb': len(csv_bytes) / 2**20,
+        'campaigns': int(campaign_totals.shape[0]),
+        'ads': int(ad_data.shape[0]),
+        'stages': stages,
+    }
+
+
+def environment():
+    """Metadados para comparar resultados entre commits"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Lista as etapas mais lentas que a referência; retorna True se houver regressão"""
+    regressed = False
+    print(f"\n{'escala':>10} {'etapa':<28} {'ref (s)':>10} {'atual (s)':>10} {'razão':>7}")
+    for size, current in results.items():
+        reference = baseline.get('results', {}).get(size)
+        if not reference:
+            continue
+        for name, timing in current['stages'].items():
+            before = reference['stages'].get(name)
+            if not before:
+                continue
+            ratio = timing['seconds'] / max(before['seconds'], 1e-9)
+            slower = ratio > threshold and timing['seconds'] - before['seconds'] > min_delta
+            regressed |= slower
+            flag = '  <-- regressão' if slower else ''
+            print(f"{size:>10} {name:<28} {before['seconds']:>10.4f} {timing['seconds']:>10.4f} {ratio:>6.2f}x{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3, help='Execuções cronometradas por etapa (vale a melhor)')
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: apenas imprime)')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Razão de tempo considerada regressão')
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help='Diferença mínima em segundos para considerar regressão (ignora ruído)')
+    args = parser.parse_args()
+
+    results = {}
+    for rows in args.sizes:
+        print(f'Executando {rows:,} linhas...', file=sys.stderr)
+        results[str(rows)] = run_scale(rows, args.repeat)
+        for name, timing in results[str(rows)]['stages'].items():
+            print(f"  {name:<28} {timing['seconds']:>9.4f} s {timing['peak_mb']:>9.1f} MB", file=sys.stderr)
+
+    report = {'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold, args.min_delta):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+"""Figuras Plotly do dashboard, montadas a partir das agregações do cubo"""
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from downsample import DEFAULT_MAX_POINTS, WEBGL_THRESHOLD, downsample_indices
+from rolling import ROLLING_WINDOWS
+
+
+def trend_figure(daily_data, max_points=DEFAULT_MAX_POINTS, method='lttb'):
+    """Tendências temporais de impressões, alcance e cliques
+
+    Cada série é reduzida a no máximo `max_points` pontos; acima de WEBGL_THRESHOLD
+    pontos plotados, as linhas são desenhadas com WebGL.
+    """
+    fig_trend = go.Figure()
+    scatter = go.Scattergl if min(len(daily_data), max_points) > WEBGL_THRESHOLD else go.Scatter
+    dates = daily_data['data'].to_numpy()
+
+    for col, name, color in [('impressoes', 'Impressões', '#3498db'),
+                             ('alcance', 'Alcance', '#2ecc71'),
+                             ('cliques', 'Cliques', '#e74c3c')]:
+        values = daily_data[col].to_numpy()
+        points = downsample_indices(dates, values, max_points, method)
+        fig_trend.add_trace(scatter(
+            x=dates[points],
+            y=values[points],
+            mode='lines',
+            name=name,
+            line=dict(color=color, width=2)
+        ))
+
+    fig_trend.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.1)'
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.1)'
+        ),
+        hovermode='x unified'
+    )
+
+    return fig_trend
+
+
+def rolling_figure(rolling_data, metric, label, windows=ROLLING_WINDOWS):
+    """Métrica diária e móvel (janelas em dias), a partir da tabela de `rolling_table`"""
+    fig_rolling = go.Figure()
+    dates = rolling_data['data'].to_numpy()
+
+    fig_rolling.add_trace(go.Scatter(
+        x=dates,
+        y=rolling_data[f'{metric}_1d'],
+        mode='lines',
+        name='Diário',
+        line=dict(color='rgba(255,255,255,0.3)', width=1)
+    ))
+    for window, color in zip(windows, ['#f39c12', '#9b59b6', '#1abc9c']):
+        fig_rolling.add_trace(go.Scatter(
+            x=dates,
+            y=rolling_data[f'{metric}_{window}d'],
+            mode='lines',
+            name=f'{window} dias',
+            line=dict(color=color, width=2)
+        ))
+
+    fig_rolling.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        yaxis=dict(title=label, showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
+        xaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
+        hovermode='x unified'
+    )
+
+    return fig_rolling
+
+
+def cumulative_spend_figure(rolling_data, budget=0):
+    """Gasto acumulado no período; com `budget`, a linha do orçamento e o ritmo linear até ele"""
+    fig_cumulative = go.Figure()
+    dates = rolling_data['data'].to_numpy()
+
+    fig_cumulative.add_trace(go.Scatter(
+        x=dates,
+        y=rolling_data['gasto_acumulado'],
+        mode='lines',
+        name='Gasto acumulado',
+        fill='tozeroy',
+        line=dict(color='#e74c3c', width=2),
+        hovertemplate='R$ %{y:,.2f}'
+    ))
+    if budget:
+        pace = budget * np.arange(1, len(dates) + 1) / max(len(dates), 1)
+        fig_cumulative.add_trace(go.Scatter(
+            x=dates,
+            y=pace,
+            mode='lines',
+            name='Ritmo do orçamento',
+            line=dict(color='#95a5a6', width=1, dash='dot'),
+            hovertemplate='R$ %{y:,.2f}'
+        ))
+        fig_cumulative.add_hline(y=budget, line=dict(color='#f1c40f', width=2, dash='dash'),
+                                 annotation_text=f'Orçamento R$ {budget:,.2f}', annotation_position='top left')
+
+    fig_cumulative.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        yaxis=dict(title='R$', showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
+        xaxis=dict(showgrid=True, gridcolor='rgba(255,255,255,0.1)'),
+        hovermode='x unified'
+    )
+
+    return fig_cumulative
+
+
+def funnel_figure(metrics):
+    """Funil de tráfego: impressões → alcance → cliques → mensagens"""
+    fig_funnel = go.Figure(go.Funnel(
+        y=['Impressões', 'Alcance', 'Cliques', 'Mensagens'],
+        x=[metrics['impressoes_total'], metrics['alcance_total'], metrics['cliques_total'], metrics['mensagens_total']],
+        textinfo='value+percent initial',
+        marker=dict(color=['#3498db', '#2ecc71', '#e74c3c', '#f39c12'])
+    ))
+
+    fig_funnel.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        funnelmode='stack'
+    )
+
+    return fig_funnel
+
+
+def message_rate_figure(campaign_totals):
+    """Pizza com as campanhas de maior taxa de envio de mensagens"""
+    # Campanhas com maior taxa de mensagens
+    campaign_data = campaign_totals.sort_values('taxa_mensagens', ascending=False).head(10)
+
+    fig_msg = go.Figure(go.Pie(
+        labels=campaign_data['campanha'],
+        values=campaign_data['taxa_mensagens'],
+        hole=0.5,
+        marker=dict(
+            colors=px.colors.sequential.Blues_r,
+            line=dict(color='#000000', width=1)
+        ),
+        textinfo='label+percent',
+        textposition='outside'
+    ))
+
+    fig_msg.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        showlegend=False
+    )
+
+    return fig_msg
+
+
+def cpl_figure(campaign_totals):
+    """Barras com os melhores CPLs (Custo por Lead/Mensagem)"""
+    # Ignorar campanhas sem mensagens
+    campaign_data = campaign_totals[campaign_totals['mensagens'] > 0]
+    campaign_data = campaign_data.sort_values('cpl').head(10)
+
+    fig_cpl = go.Figure(go.Bar(
+        x=campaign_data['cpl'],
+        y=campaign_data['campanha'],
+        orientation='h',
+        marker=dict(
+            color='#2ecc71',
+            line=dict(color='#27ae60', width=1)
+        ),
+        text=campaign_data['cpl'].apply(lambda x: f'R$ {x:.2f}'),
+        textposition='auto'
+    ))
+
+    fig_cpl.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        xaxis_title='Custo por Lead (R$)',
+        yaxis=dict(
+            title='',
+            autorange='reversed'
+        )
+    )
+
+    return fig_cpl
+
+
+def spend_figure(campaign_totals):
+    """Pizza com as campanhas de maior investimento"""
+    campaign_data = campaign_totals.sort_values('gasto', ascending=False).head(10)
+
+    fig_spend = go.Figure(go.Pie(
+        labels=campaign_data['campanha'],
+        values=campaign_data['gasto'],
+        hole=0.5,
+        marker=dict(
+            colors=px.colors.sequential.Reds_r,
+            line=dict(color='#000000', width=1)
+        ),
+        textinfo='label+percent',
+        textposition='outside',
+        hovertemplate='%{label}<br>R$ %{value:.2f}<br>%{percent}'
+    ))
+
+    fig_spend.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        showlegend=False
+    )
+
+    return fig_spend
+
+
+def weekday_figure(day_data, x_col='dia_semana_pt'):
+    """Mensagens (barras) e CTR (linha) por dia da semana (ou pela coluna `x_col`, ex.: hora do dia)"""
+    fig_day = go.Figure()
+
+    # Adicionar barras para mensagens
+    fig_day.add_trace(go.Bar(
+        x=day_data[x_col],
+        y=day_data['mensagens'],
+        name='Mensagens',
+        marker_color='#3498db'
+    ))
+
+    # Adicionar linha para CTR (Cliques / Impressões)
+    fig_day.add_trace(go.Scatter(
+        x=day_data[x_col],
+        y=day_data['ctr'],
+        mode='lines+markers',
+        name='CTR (%)',
+        yaxis='y2',
+        line=dict(color='#f39c12', width=3),
+        marker=dict(size=8)
+    ))
+
+    # Configurar layout
+    fig_day.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        yaxis=dict(
+            title='Mensagens',
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.1)'
+        ),
+        yaxis2=dict(
+            title='CTR (%)',
+            overlaying='y',
+            side='right',
+            showgrid=False
+        ),
+        barmode='group'
+    )
+
+    return fig_day
+
+
+def campaign_performance_figure(campaign_totals):
+    """Gasto e receita (barras) e ROAS (linha) por campanha"""
+    campaign_perf = campaign_totals.sort_values('gasto', ascending=False)
+
+    fig_perf = go.Figure()
+
+    fig_perf.add_trace(go.Bar(
+        x=campaign_perf['campanha'],
+        y=campaign_perf['gasto'],
+        name='Gasto (R$)',
+        marker_color='#e74c3c'
+    ))
+
+    fig_perf.add_trace(go.Bar(
+        x=campaign_perf['campanha'],
+        y=campaign_perf['receita'],
+        name='Receita (R$)',
+        marker_color='#2ecc71'
+    ))
+
+    fig_perf.add_trace(go.Scatter(
+        x=campaign_perf['campanha'],
+        y=campaign_perf['roas'],
+        mode='lines+markers',
+        name='ROAS',
+        yaxis='y2',
+        line=dict(color='#f39c12', width=3),
+        marker=dict(size=8)
+    ))
+
+    fig_perf.update_layout(
+        template='plotly_dark',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        yaxis=dict(
+            title='Valor (R$)',
+            showgrid=True,
+            gridcolor='rgba(255,255,255,0.1)'
+        ),
+        yaxis2=dict(
+            title='ROAS',
+            overlaying='y',
+            side='right',
+            showgrid=False
+        ),
+        barmode='group'
+    )
+
+    return fig_perf
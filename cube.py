@@ -0,0 +1,300 @@
+"""Cubo pré-agregado (data × conta × campanha × conjunto × anúncio) e camada de agregação do dashboard"""
+import numpy as np
+import pandas as pd
+
+from metrics import BASE_COLUMNS, add_derived_metrics
+
+# Dimensões do cubo, na ordem de ordenação
+CUBE_DIMENSIONS = ['data', 'conta', 'campanha', 'conjunto', 'anuncio']
+
+# Colunas de contagem, armazenadas como int32 no cubo
+COUNT_COLUMNS = ['impressoes', 'alcance', 'cliques', 'mensagens']
+
+# Dimensões de texto armazenadas como categóricas (códigos inteiros)
+CATEGORY_DIMENSIONS = ['conta', 'campanha', 'conjunto', 'anuncio']
+
+# Dias da semana em português, na ordem de exibição
+WEEKDAYS_PT = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+
+# Comparações de período: nome -> rótulo
+COMPARISONS = {'anterior': 'Período anterior', 'ano_anterior': 'Mesmo período do ano anterior'}
+
+# Rótulos dos períodos nas agregações comparadas
+PERIOD_LABELS = ['atual', 'comparacao']
+
+# Granularidades das séries temporais (tabelas pré-agregadas por período)
+GRANULARITIES = {'hora': 'Hora', 'dia': 'Dia', 'semana': 'Semana (ISO)', 'mes': 'Mês'}
+
+
+def parse_dates(df):
+    """Converte a coluna `data` para datetime64 e descarta as linhas com data inválida
+
+    Retorna (linhas, quantidade de linhas descartadas).
+    """
+    dates = df['data']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+    invalid = dates.isna()
+    dropped = int(invalid.sum())
+    df = df.assign(data=dates)
+    return (df[~invalid] if dropped else df), dropped
+
+
+def prepare_rows(df):
+    """Padroniza as linhas brutas nas dimensões do cubo
+
+    A coluna `data` é convertida uma única vez para datetime64 (linhas com data
+    inválida são descartadas) e truncada na hora (somada à coluna `hora`, se
+    existir). Conta, campanha, conjunto e anúncio viram categóricas com
+    categorias em ordem alfabética.
+    """
+    df, _ = parse_dates(df)
+    dates = df['data']
+    if 'hora' in df.columns:
+        dates = dates.dt.normalize() + hour_offsets(df['hora'])
+        df = df.drop(columns='hora')
+    return encode_dimensions(df.assign(data=dates.dt.floor('h')))
+
+
+def build_cube(df):
+    """Pré-agrega as linhas brutas somando as colunas aditivas por célula do cubo (ordenado por data)"""
+    cube = prepare_rows(df).groupby(CUBE_DIMENSIONS, as_index=False, sort=True, observed=True)[BASE_COLUMNS].sum()
+    return compact_counts(cube)
+
+
+def hour_offsets(hours):
+    """Converte a hora do dia (13, "13:00" ou "13:00:00 - 13:59:59") em deslocamento a partir da meia-noite"""
+    if not pd.api.types.is_numeric_dtype(hours):
+        hours = pd.to_numeric(hours.astype(str).str.extract(r'^\s*(\d{1,2})', expand=False), errors='coerce')
+    return pd.to_timedelta(hours.fillna(0).clip(0, 23).astype('int64'), unit='h')
+
+
+def merge_cubes(cubes):
+    """Combina cubos parciais (ex.: blocos de um mesmo arquivo) em um único cubo, somando as células"""
+    cube = encode_dimensions(pd.concat(cubes, ignore_index=True))
+    cube = cube.groupby(CUBE_DIMENSIONS, as_index=False, sort=True, observed=True)[BASE_COLUMNS].sum()
+    return compact_counts(cube)
+
+
+def combine_files(cubes):
+    """Combina os cubos de arquivos diferentes; células presentes em mais de um ficam com as do último
+
+    Reexportações sobrepostas da mesma origem (ex.: de 1 a 7 e de 1 a 8 de janeiro)
+    trazem os mesmos dias: somá-los, como em `merge_cubes`, contaria esses dias duas
+    vezes. Arquivos de origens diferentes têm contas diferentes (a coluna de conta
+    ou o nome do arquivo) e não se sobrepõem.
+    """
+    cube = encode_dimensions(pd.concat(cubes, ignore_index=True))
+    cube = cube.drop_duplicates(subset=CUBE_DIMENSIONS, keep='last')
+    return compact_counts(cube.sort_values(CUBE_DIMENSIONS, ignore_index=True))
+
+
+def compact_counts(cube):
+    """Armazena as contagens como int32 quando os valores cabem nesse tipo"""
+    limit = np.iinfo('int32').max
+    for col in COUNT_COLUMNS:
+        values = cube[col]
+        if not pd.api.types.is_integer_dtype(values) or values.dtype == 'int32':
+            continue
+        if values.empty or (values.min() >= -limit and values.max() <= limit):
+            cube[col] = values.astype('int32')
+    return cube
+
+
+def encode_dimensions(df):
+    """Converte conta, campanha, conjunto e anúncio em categóricas (códigos inteiros)"""
+    for dimension in CATEGORY_DIMENSIONS:
+        if dimension not in df.columns:
+            # Dados sem a dimensão (ex.: base local gravada antes dela existir)
+            df[dimension] = 'Não especificado'
+        column = df[dimension]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Já categórica: apenas preenche ausentes e ordena as categorias, sem materializar o texto
+            if column.isna().any():
+                column = column.cat.add_categories(['Não especificado']).fillna('Não especificado')
+            if not column.cat.categories.is_monotonic_increasing:
+                column = column.cat.reorder_categories(column.cat.categories.sort_values())
+            df[dimension] = column
+        else:
+            df[dimension] = column.fillna('Não especificado').astype(str).astype('category')
+    return df
+
+
+def date_positions(dates, start_date, end_date):
+    """Posições (início, fim exclusivo) das datas informadas (inclusive) por busca binária na coluna ordenada"""
+    start = np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date)), side='left')
+    stop = np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1)), side='left')
+    return start, stop
+
+
+def slice_dates(cube, start_date, end_date):
+    """Seleciona as linhas entre as datas informadas (inclusive) por busca binária na coluna ordenada"""
+    start, stop = date_positions(cube['data'].to_numpy(), start_date, end_date)
+    return cube.iloc[start:stop]
+
+
+def dimension_options(cube, dimension):
+    """Lista, em ordem alfabética, as categorias presentes no recorte a partir dos códigos"""
+    column = cube[dimension]
+    counts = np.bincount(column.cat.codes.to_numpy(), minlength=len(column.cat.categories))
+    return column.cat.categories[counts > 0].tolist()
+
+
+def filter_dimension(cube, dimension, selected):
+    """Filtra o recorte pelas categorias selecionadas via tabela de consulta indexada por código"""
+    if not selected:
+        return cube
+    column = cube[dimension]
+    codes = column.cat.categories.get_indexer(selected)
+    lookup = np.zeros(len(column.cat.categories), dtype=bool)
+    lookup[codes[codes >= 0]] = True
+    return cube[lookup[column.cat.codes.to_numpy()]]
+
+
+def aggregate(cube, by, metrics=()):
+    """Agrega o cubo pelas dimensões informadas e calcula as métricas derivadas pedidas"""
+    grouped = cube.groupby(by, as_index=False, observed=True, dropna=False)[BASE_COLUMNS].sum()
+    return add_derived_metrics(grouped, metrics)
+
+
+def aggregate_weekdays(cube, metrics=()):
+    """Agrega o cubo por dia da semana, partindo da série diária"""
+    daily = aggregate(cube, 'data')
+    weekday = daily['data'].dt.weekday
+    daily['dia_semana_pt'] = pd.Categorical.from_codes(weekday, WEEKDAYS_PT)
+    weekly = daily.groupby('dia_semana_pt', as_index=False, observed=True)[BASE_COLUMNS].sum()
+    return add_derived_metrics(weekly, metrics)
+
+
+def period_start(dates, granularity):
+    """Início do período (hora, dia, semana ISO a partir de segunda-feira ou mês) de cada data"""
+    values = np.asarray(dates, dtype='datetime64[ns]')
+    if granularity == 'hora':
+        return values.astype('datetime64[h]').astype('datetime64[ns]')
+    if granularity == 'mes':
+        return values.astype('datetime64[M]').astype('datetime64[ns]')
+    days = values.astype('datetime64[D]')
+    if granularity == 'semana':
+        # 01/01/1970 foi uma quinta-feira (dia 3 contando a partir de segunda = 0)
+        weekday = (days.astype('int64') + 3) % 7
+        days = days - weekday.astype('timedelta64[D]')
+    return days.astype('datetime64[ns]')
+
+
+def next_period_start(date, granularity):
+    """Início do período seguinte ao que contém a data"""
+    start = pd.Timestamp(period_start([date], granularity)[0])
+    if granularity == 'mes':
+        return start + pd.offsets.MonthBegin(1)
+    return start + {'hora': pd.Timedelta(hours=1), 'dia': pd.Timedelta(days=1), 'semana': pd.Timedelta(days=7)}[granularity]
+
+
+def rollup(cube, granularity):
+    """Reagrega o cubo por período, mantendo conta, campanha, conjunto e anúncio (para os filtros)"""
+    rolled = cube.assign(data=period_start(cube['data'], granularity))
+    rolled = rolled.groupby(CUBE_DIMENSIONS, as_index=False, sort=True, observed=True)[BASE_COLUMNS].sum()
+    return compact_counts(rolled)
+
+
+def has_hours(cube):
+    """Indica se o cubo tem dados por hora (datas com hora diferente de meia-noite)"""
+    dates = cube['data'].to_numpy()
+    return bool((dates != dates.astype('datetime64[D]')).any())
+
+
+def build_rollups(cube):
+    """Tabelas por hora (se houver), dia, semana ISO e mês, calculadas uma vez por conjunto de dados
+
+    As semanais e mensais partem da diária, e nenhuma consulta posterior precisa
+    voltar às linhas de granularidade mais fina.
+    """
+    rollups = {'hora': cube} if has_hours(cube) else {}
+    daily = rollup(cube, 'dia') if rollups else cube
+    rollups.update(dia=daily, semana=rollup(daily, 'semana'), mes=rollup(daily, 'mes'))
+    return rollups
+
+
+def select_cube(cube, start_date=None, end_date=None, selections=None):
+    """Aplica o período (datas inclusivas) e as seleções {dimensão: categorias} a uma tabela do cubo"""
+    if start_date is not None and end_date is not None:
+        cube = slice_dates(cube, start_date, end_date)
+    for dimension, selected in (selections or {}).items():
+        cube = filter_dimension(cube, dimension, selected)
+    return cube
+
+
+def period_totals(rollups, granularity, start_date=None, end_date=None, selections=None):
+    """Totais por período entre as datas informadas, a partir das tabelas pré-agregadas
+
+    Hora e dia saem direto da tabela correspondente. Em semana e mês, os períodos
+    inteiros dentro do intervalo vêm da tabela do período, e os cortados pelas datas
+    do filtro (bordas) são completados com a tabela diária, para não somar dias
+    fora do intervalo.
+    """
+    if granularity in ('hora', 'dia') or start_date is None or end_date is None:
+        table = rollups['hora'] if granularity == 'hora' and 'hora' in rollups else rollups[granularity]
+        return aggregate(select_cube(table, start_date, end_date, selections), 'data')
+
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    first_full = start if pd.Timestamp(period_start([start], granularity)[0]) == start else next_period_start(start, granularity)
+    # Limite (exclusivo) dos períodos inteiros: o período de `end` só entra se `end` for seu último dia
+    after_end = end + pd.Timedelta(days=1)
+    limit = after_end if pd.Timestamp(period_start([after_end], granularity)[0]) == after_end else pd.Timestamp(period_start([end], granularity)[0])
+
+    parts = []
+    if first_full < limit:
+        parts.append(select_cube(rollups[granularity], first_full, limit - pd.Timedelta(days=1), selections))
+    edges = [(start, min(first_full, after_end) - pd.Timedelta(days=1)), (max(limit, first_full), end)]
+    for edge_start, edge_end in edges:
+        if edge_start <= edge_end:
+            daily = select_cube(rollups['dia'], edge_start, edge_end, selections)
+            parts.append(daily.assign(data=period_start(daily['data'], granularity)))
+    table = pd.concat(parts, ignore_index=True) if parts else rollups[granularity].iloc[:0]
+    return aggregate(table, 'data')
+
+
+def aggregate_hours(cube, metrics=()):
+    """Agrega o cubo por hora do dia (0 a 23), partindo da série por hora"""
+    hourly = aggregate(cube, 'data')
+    hourly['hora_dia'] = hourly['data'].dt.hour
+    by_hour = hourly.groupby('hora_dia', as_index=False)[BASE_COLUMNS].sum()
+    return add_derived_metrics(by_hour, metrics)
+
+
+def comparison_window(start_date, end_date, comparison):
+    """Datas (início, fim) do período de comparação: o anterior de mesma duração ou o mesmo do ano anterior"""
+    if comparison == 'ano_anterior':
+        year = pd.DateOffset(years=1)
+        return (pd.Timestamp(start_date) - year).date(), (pd.Timestamp(end_date) - year).date()
+    length = pd.Timestamp(end_date) - pd.Timestamp(start_date) + pd.Timedelta(days=1)
+    return (pd.Timestamp(start_date) - length).date(), (pd.Timestamp(start_date) - pd.Timedelta(days=1)).date()
+
+
+def compare_totals(cube, current, previous, by=None, metrics=()):
+    """Totais do período atual e do de comparação, alinhados linha a linha, em uma única agregação
+
+    `current` e `previous` são (início, fim). As linhas dos dois períodos são
+    localizadas por busca binária, recebem o rótulo do período e são agrupadas de
+    uma só vez. Sem `by`, cada tabela tem uma única linha; com `by`, as linhas são
+    as presentes no período atual, zeradas onde não há dados de comparação.
+    """
+    dates = cube['data'].to_numpy()
+    positions = [np.arange(*date_positions(dates, *window)) for window in (current, previous)]
+    rows = cube.iloc[np.concatenate(positions)]
+    codes = np.repeat(np.arange(len(PERIOD_LABELS), dtype='int8'), [len(p) for p in positions])
+    period = pd.Categorical.from_codes(codes, categories=PERIOD_LABELS)
+
+    if by is None:
+        grouped = rows[BASE_COLUMNS].groupby(period, observed=False).sum()
+        tables = [grouped.loc[[label]].reset_index(drop=True) for label in PERIOD_LABELS]
+    else:
+        grouped = rows.groupby([by, period], observed=True)[BASE_COLUMNS].sum().unstack(-1)
+        grouped = grouped.reindex(columns=pd.MultiIndex.from_product([BASE_COLUMNS, PERIOD_LABELS]))
+        grouped = grouped[grouped[(BASE_COLUMNS[0], PERIOD_LABELS[0])].notna()].fillna(0)
+        tables = [grouped.xs(label, axis=1, level=1).reset_index() for label in PERIOD_LABELS]
+
+    for table in tables:
+        table[COUNT_COLUMNS] = table[COUNT_COLUMNS].astype('int64')
+        add_derived_metrics(table, metrics)
+    return tables
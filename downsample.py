@@ -0,0 +1,82 @@
+"""Redução do número de pontos de séries temporais antes de plotar (LTTB e mínimo/máximo por faixa)"""
+import os
+
+import numpy as np
+
+# Orçamento padrão de pontos por série nos gráficos de linha
+DEFAULT_MAX_POINTS = int(os.environ.get('DASHBOARD_MAX_POINTS', 1500))
+
+# Acima desta quantidade de pontos plotados, os gráficos de linha usam WebGL (Scattergl)
+WEBGL_THRESHOLD = 1000
+
+DOWNSAMPLE_METHODS = {
+    'lttb': 'LTTB (preserva a forma)',
+    'minmax': 'Mínimo/máximo por faixa (preserva picos)'
+}
+
+
+def as_float(values):
+    """Converte datas (datetime64) ou números para float64, para o cálculo das áreas"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype('int64').astype('float64')
+    return values.astype('float64')
+
+
+def lttb_indices(x, y, max_points):
+    """Índices escolhidos pelo Largest-Triangle-Three-Buckets
+
+    Mantém o primeiro e o último ponto e, em cada uma das `max_points - 2` faixas,
+    o ponto que forma o maior triângulo com o ponto anterior escolhido e a média
+    da faixa seguinte.
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = as_float(x)
+    y = as_float(y)
+
+    # Limites das faixas (entre o primeiro e o último ponto) e média de cada faixa
+    bounds = (np.arange(max_points - 1) * ((n - 2) / (max_points - 2))).astype('int64') + 1
+    bounds[-1] = n - 1
+    sizes = np.diff(bounds)
+    x_sums = np.add.reduceat(x[:n - 1], bounds[:-1])
+    y_sums = np.add.reduceat(y[:n - 1], bounds[:-1])
+    next_x = np.append(x_sums[1:] / sizes[1:], x[-1])
+    next_y = np.append(y_sums[1:] / sizes[1:], y[-1])
+
+    indices = np.empty(max_points, dtype='int64')
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def minmax_indices(y, max_points):
+    """Índices do mínimo e do máximo de cada faixa (max_points / 2 faixas), em ordem"""
+    n = len(y)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+    y = as_float(y)
+    buckets = max_points // 2
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    valid = ~np.isnan(padded).all(axis=1)
+    offsets = np.arange(buckets)[valid] * size
+    lows = offsets + np.nanargmin(padded[valid], axis=1)
+    highs = offsets + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+
+def downsample_indices(x, y, max_points=DEFAULT_MAX_POINTS, method='lttb'):
+    """Índices dos pontos a plotar de uma série, dentro do orçamento `max_points`"""
+    if method == 'minmax':
+        return minmax_indices(y, max_points)
+    return lttb_indices(x, y, max_points)
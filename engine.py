@@ -0,0 +1,511 @@
+"""Importação, filtros e agregações do dashboard sem o Streamlit, usados pela página e pela API"""
+import json
+import os
+from datetime import date, datetime, timedelta
+
+from alerts import BASELINE_DAYS, extend_alerts, filter_alerts, score_alerts, stored_alerts
+from cube import (COMPARISONS, aggregate, build_cube, build_rollups, combine_files, compare_totals, comparison_window,
+                  has_hours, period_totals, rollup, select_cube)
+from ingest import DEFAULT_PARSE_OPTIONS, file_options, list_watched_files, parse_files_parallel, parse_to_cube
+from memo import MemoCache
+from metrics import calculate_metrics, percent_change
+from reach import covers_cube, daily_sketches, distinct_reach, merge_sketches
+from registry import DatasetRegistry
+from rolling import RollingSeries, rolling_table
+from sample_data import generate_sample_data
+from store import (ALERT_DATASET, SKETCH_DATASET, append_cube, changed_months, load_store, partition_months, read_store,
+                   replace_from, store_signature)
+from tables import AD_METRICS, CHANGE_COLUMNS, ad_table, ad_totals, add_changes, campaign_table
+
+# Parâmetros padrão dos dados de exemplo
+SAMPLE_DEFAULTS = {'campaigns': 5, 'adsets': 3, 'ads': 5, 'days': 31, 'seed': 42, 'hourly': False}
+
+# Máximo de linhas dos dados de exemplo gerados a pedido (API e página)
+SAMPLE_MAX_ROWS = int(os.environ.get('DASHBOARD_SAMPLE_MAX_ROWS', 5_000_000))
+
+# Dimensões filtráveis, na ordem dos filtros da barra lateral
+FILTER_DIMENSIONS = ['conta', 'campanha', 'conjunto', 'anuncio']
+
+# Métricas derivadas do resumo por campanha
+CAMPAIGN_METRICS = ['ctr', 'cpc', 'cpm', 'cpl', 'taxa_mensagens', 'roas', 'roi']
+
+# Resultados que uma consulta pode pedir
+QUERY_VIEWS = ['metricas', 'campanhas', 'anuncios', 'periodos', 'moveis', 'alertas']
+
+# Pasta monitorada padrão: arquivos CSV/Excel nela são importados automaticamente
+DEFAULT_WATCH_DIR = os.environ.get('DASHBOARD_WATCH_DIR', '')
+
+# Pasta raiz dos arquivos que a API e a página podem ler (padrão: a pasta monitorada ou a pasta atual)
+DATA_ROOT = os.path.realpath(os.environ.get('DASHBOARD_DATA_ROOT') or DEFAULT_WATCH_DIR or '.')
+
+
+class QueryError(ValueError):
+    """Consulta inválida ou conjunto de dados que não pôde ser carregado"""
+
+
+def file_sources(files):
+    """Fontes (chave, nome, caminho) de arquivos em disco listados como (caminho, tamanho, modificação)"""
+    return [(f'{path}:{size}:{mtime}', os.path.basename(path), path) for path, size, mtime in files]
+
+
+def load_files(sources, parse_options, parse_file=None):
+    """Processa e junta os arquivos (chave, nome, bytes ou caminho), devolvendo (cubo ou None, relatório, esboços)
+
+    `parse_file(chave, nome, fonte)` devolve (cubo, esboços, erro, segundos, datas
+    inválidas) de um arquivo; sem ele, os arquivos são processados em paralelo, um por processo. Os
+    esboços de alcance só existem quando todos os arquivos válidos trazem o usuário.
+    """
+    if parse_file is not None:
+        results = [parse_file(key, name, source) for key, name, source in sources]
+    elif len(sources) > 1:
+        results = parse_files_parallel([(name, source) for _, name, source in sources], parse_options)
+    else:
+        results = [parse_to_cube(name, source, file_options(name, parse_options)) for _, name, source in sources]
+
+    cubes, sketches, report = [], [], []
+    for (_, name, _), (file_cube, file_sketches, error, parse_time, invalid_dates) in zip(sources, results):
+        report.append({'Arquivo': name, 'Tempo (ms)': round(parse_time * 1000), 'Datas inválidas': invalid_dates,
+                       'Erro': error or ''})
+        if not error:
+            cubes.append(file_cube)
+            sketches.append(file_sketches)
+    if not cubes:
+        return None, report, None
+    return (cubes[0] if len(cubes) == 1 else combine_files(cubes)), report, merge_sketches(sketches)
+
+
+def build_dataset(cube, report=(), sketches=None, alerts=None):
+    """Conjunto de dados guardado no registro: tabelas por período, alertas, esboços de alcance e relatório
+
+    Sem dados válidos, as tabelas e os alertas são None; sem usuários nos arquivos,
+    os esboços também. Os alertas (quando não vêm prontos da base local) e os
+    esboços por dia são calculados aqui, uma vez por importação, e não a cada filtro:
+    `alerts` pode ser a tabela pronta, uma função que a calcula a partir da tabela
+    diária ou None (todo o histórico é avaliado).
+    """
+    if cube is None:
+        return {'rollups': None, 'alerts': None, 'reach': None, 'report': list(report)}
+    rollups = build_rollups(cube)
+    if alerts is None:
+        alerts = score_alerts(rollups['dia'])
+    elif callable(alerts):
+        alerts = alerts(rollups['dia'])
+    return {'rollups': rollups, 'alerts': alerts, 'reach': daily_sketches(sketches), 'report': list(report)}
+
+
+def upload_alerts(daily):
+    """Alertas dos arquivos importados, a partir da tabela diária
+
+    Quando as contas dos arquivos já têm dias anteriores gravados na base local,
+    com os alertas, só os dias após o último dia gravado são avaliados, contra a
+    linha de base da base; os dias já gravados usam os alertas salvos (uma
+    reexportação traz os mesmos valores). Na primeira importação, ou com alguma
+    conta nova, o histórico dos arquivos é avaliado inteiro.
+    """
+    months = partition_months()
+    if not months or not set(months) <= set(partition_months(dataset=ALERT_DATASET)):
+        return score_alerts(daily)
+    first, last = daily['data'].iloc[0], daily['data'].iloc[-1]
+    accounts = daily['conta'].unique()
+    history = load_store(start_month=(first - timedelta(days=BASELINE_DAYS)).strftime('%Y-%m'))
+    if history is None:
+        return score_alerts(daily)
+    history = history[history['conta'].isin(accounts)]
+    spans = history.groupby('conta', observed=True)['data'].agg(['min', 'max'])
+    if len(spans) < len(accounts) or not (spans['min'] < first).all():
+        return score_alerts(daily)
+
+    since = max(first, spans['max'].min().normalize() + timedelta(days=1))
+    alerts = stored_alerts(read_store(dataset=ALERT_DATASET, start_month=first.strftime('%Y-%m')))
+    alerts = alerts[alerts['data'].between(first, since - timedelta(days=1)) & alerts['conta'].isin(accounts)]
+    if since > last:
+        return alerts.reset_index(drop=True)
+    return extend_alerts(rollup(history, 'dia') if has_hours(history) else history, daily, since, alerts)
+
+
+def load_store_dataset():
+    """Cubo da base local com os esboços de alcance e os alertas gravados
+
+    Os esboços só são usados se cobrem todas as células do cubo, e os alertas, se
+    foram gravados para todos os meses da base (senão são recalculados).
+    """
+    cube, sketches = load_store(), load_store(dataset=SKETCH_DATASET)
+    alerts = None
+    if set(partition_months()) <= set(partition_months(dataset=ALERT_DATASET)):
+        alerts = stored_alerts(read_store(dataset=ALERT_DATASET))
+    return cube, [], sketches if covers_cube(sketches, cube) else None, alerts
+
+
+def save_dataset(dataset):
+    """Acrescenta o conjunto de dados à base local, com os esboços de alcance e os alertas; retorna os meses gravados
+
+    Os alertas são avaliados só a partir do primeiro dia gravado (os dias
+    anteriores entram apenas como linha de base de cada entidade) e substituem os
+    gravados desses dias. Numa base com meses anteriores ainda sem alertas, o
+    histórico inteiro é avaliado uma vez.
+    """
+    rollups = dataset['rollups']
+    months = append_cube(rollups.get('hora', rollups['dia']))
+    if dataset['reach'] is not None:
+        append_cube(dataset['reach'], dataset=SKETCH_DATASET)
+
+    since = rollups['dia']['data'].iloc[0]
+    earlier = {month for month in partition_months() if month < since.strftime('%Y-%m')}
+    if not earlier <= set(partition_months(dataset=ALERT_DATASET)):
+        since = None
+    start_month = None if since is None else (since - timedelta(days=BASELINE_DAYS)).strftime('%Y-%m')
+    history = load_store(start_month=start_month)
+    daily = rollup(history, 'dia') if has_hours(history) else history
+    replace_from(score_alerts(daily, since), daily['data'].iloc[0] if since is None else since, daily['data'].iloc[-1],
+                 dataset=ALERT_DATASET)
+    return months
+
+
+def load_sample(campaigns=5, adsets=3, ads=5, days=31, seed=None, hourly=False):
+    """Gera os dados de exemplo e os pré-agrega no cubo do dashboard"""
+    return build_cube(generate_sample_data(campaigns, adsets, ads, days, seed=seed, hourly=hourly))
+
+
+def sample_dataset(params):
+    """Chave e função de carga dos dados de exemplo; parâmetros ausentes vêm de SAMPLE_DEFAULTS"""
+    params = parse_object(params, 'sample')
+    unknown = set(params) - set(SAMPLE_DEFAULTS)
+    if unknown:
+        raise QueryError(f'Parâmetro(s) desconhecido(s) dos dados de exemplo: {", ".join(sorted(unknown))}')
+    for name, value in params.items():
+        if name == 'hourly':
+            valid = isinstance(value, bool)
+        else:
+            valid = isinstance(value, int) and not isinstance(value, bool) and value >= (0 if name == 'seed' else 1)
+        if not valid:
+            raise QueryError(f'Valor inválido para "{name}" dos dados de exemplo: {value!r}')
+    sample = {**SAMPLE_DEFAULTS, **params}
+    rows = sample['campaigns'] * sample['adsets'] * sample['ads'] * sample['days'] * (24 if sample['hourly'] else 1)
+    if rows > SAMPLE_MAX_ROWS:
+        raise QueryError(f'Dados de exemplo grandes demais: {rows:,} linhas (máximo {SAMPLE_MAX_ROWS:,})')
+    return ('exemplo', tuple(sorted(sample.items()))), lambda: (load_sample(**sample), [])
+
+
+def make_filter_key(dataset_key, start_date, end_date, selections):
+    """Identifica os dados e os filtros aplicados, para o cache das agregações"""
+    return (dataset_key, start_date, end_date) + tuple(tuple(selections.get(dim, ())) for dim in FILTER_DIMENSIONS)
+
+
+def campaign_totals(cube):
+    """Totais e métricas por campanha"""
+    return aggregate(cube, 'campanha', CAMPAIGN_METRICS)
+
+
+def to_records(df):
+    """DataFrame em lista de dicionários serializáveis em JSON (datas em ISO 8601)"""
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+def with_changes(current, previous):
+    """Totais do período atual com a variação percentual (`<coluna>_var`) de cada coluna de CHANGE_COLUMNS"""
+    table = current.copy()
+    columns = [col for col in CHANGE_COLUMNS if col in table.columns]
+    changes = percent_change(current[columns].to_numpy(), previous[columns].to_numpy())
+    for i, col in enumerate(columns):
+        table[f'{col}_var'] = changes[:, i]
+    return table
+
+
+def inside_data_root(path):
+    """Se o caminho (já resolvido, sem links simbólicos) fica dentro de DATA_ROOT"""
+    return os.path.commonpath([DATA_ROOT, path]) == DATA_ROOT
+
+
+def data_path(path):
+    """Caminho real de um arquivo ou pasta informado pelo usuário, relativo a DATA_ROOT
+
+    Links simbólicos e ".." são resolvidos antes da verificação; caminhos fora
+    da raiz geram QueryError.
+    """
+    if not isinstance(path, str) or not path:
+        raise QueryError('Caminho inválido')
+    resolved = os.path.realpath(os.path.join(DATA_ROOT, path))
+    if not inside_data_root(resolved):
+        raise QueryError(f'Caminho fora da pasta de dados: {path}')
+    return resolved
+
+
+def watched_data_files(directory):
+    """Arquivos da pasta monitorada, sem os links simbólicos que apontam para fora de DATA_ROOT"""
+    return [file for file in list_watched_files(directory) if inside_data_root(os.path.realpath(file[0]))]
+
+
+def parse_list(value, name):
+    """Lista de valores de um campo da consulta; um valor único vira lista de um item"""
+    if value is None:
+        return []
+    if isinstance(value, (str, int, float)):
+        return [value]
+    if not isinstance(value, list) or not all(isinstance(item, (str, int, float)) for item in value):
+        raise QueryError(f'"{name}" deve ser um valor ou uma lista de valores')
+    return value
+
+
+def parse_object(value, name):
+    """Objeto (dicionário) de um campo da consulta; ausente, um objeto vazio"""
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise QueryError(f'"{name}" deve ser um objeto')
+    return value
+
+
+def parse_text(value, name, default=None):
+    """Texto de um campo da consulta (`default` se ausente)"""
+    if value is None:
+        return default
+    if not isinstance(value, str):
+        raise QueryError(f'"{name}" deve ser um texto')
+    return value
+
+
+def parse_options_of(value):
+    """Opções de leitura da consulta, com os mesmos tipos de DEFAULT_PARSE_OPTIONS"""
+    options = parse_object(value, 'parse_options')
+    for name, option in options.items():
+        if name not in DEFAULT_PARSE_OPTIONS or type(option) is not type(DEFAULT_PARSE_OPTIONS[name]):
+            raise QueryError(f'Opção de leitura inválida: "{name}"')
+    return {**DEFAULT_PARSE_OPTIONS, **options}
+
+
+def parse_date(value, name):
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise QueryError(f'Data inválida em "{name}": {value}')
+
+
+class Engine:
+    """Conjuntos de dados e agregações compartilhados por todas as sessões e consumidores do processo
+
+    `registry` guarda os conjuntos de dados (tabelas somente leitura) e `cache` as
+    agregações por estado de filtros, com as mesmas chaves usadas pela página.
+    """
+
+    def __init__(self, registry=None, cache=None):
+        self.registry = registry if registry is not None else DatasetRegistry()
+        self.cache = cache if cache is not None else MemoCache()
+        # Última versão da base local com série diária calculada, para reaproveitá-la na próxima
+        self.store_key = None
+
+    def dataset(self, dataset_key, load):
+        """Conjunto de dados de `dataset_key`; `load()` devolve (cubo ou None, relatório[, esboços[, alertas]])
+        em caso de miss (ver `build_dataset`)
+        """
+        return self.registry.get_or_compute(dataset_key, lambda: build_dataset(*load()))
+
+    def memoized(self, name, filter_key, compute):
+        """Resultado de `compute()` em cache; `filter_key` identifica os dados e os filtros aplicados"""
+        return self.cache.get_or_compute((name, filter_key), compute)
+
+    def metrics(self, filter_key, cube, sketches=None, period=(None, None), selections=None):
+        """Métricas principais do estado de filtros; com os esboços, o alcance é o sem duplicidade"""
+        def build():
+            metrics = calculate_metrics(cube)
+            if sketches is not None:
+                metrics['alcance_total'] = distinct_reach(sketches, *period, selections)
+            return metrics
+        return self.memoized('metricas', filter_key, build)
+
+    def campaigns(self, filter_key, cube):
+        """Totais e métricas por campanha do estado de filtros"""
+        return self.memoized('campanhas', filter_key, lambda: campaign_totals(cube))
+
+    def periods(self, filter_key, rollups, granularity, period, selections):
+        """Totais por período (hora, dia, semana ou mês) do estado de filtros"""
+        return self.memoized('periodos', (filter_key, granularity),
+                             lambda: period_totals(rollups, granularity, *period, selections))
+
+    def totals(self, filter_key, cube):
+        """Totais e métricas por campanha e por anúncio do estado de filtros, sem formatação"""
+        return self.memoized('totais', filter_key, lambda: {
+            'campaigns': self.campaigns(filter_key, cube),
+            'ads': ad_totals(cube)
+        })
+
+    def tables(self, filter_key, cube):
+        """Tabelas de campanhas e de anúncios do estado de filtros, formatadas para exibição"""
+        return self.memoized('tabelas', filter_key, lambda: {
+            'campaigns': campaign_table(self.totals(filter_key, cube)['campaigns']),
+            'ads': ad_table(self.totals(filter_key, cube)['ads'])
+        })
+
+    def rolling_series(self, dataset_key, rollups, selections):
+        """Série diária acumulada das seleções (sem o período), calculada uma vez e usada por todos os gráficos
+
+        Trocar o período, a janela ou a métrica apenas lê trechos da série. Numa nova
+        versão da base local, a série da versão anterior (ainda em cache) é
+        reaproveitada, e só os dias a partir do primeiro mês regravado são somados
+        e acrescentados.
+        """
+        def build():
+            daily = rollups['dia']
+            series, since = RollingSeries(), daily['data'].iloc[0]
+            previous = self.store_key if dataset_key[0] == 'base' else None
+            if previous is not None:
+                months = changed_months(previous[1], dataset_key[1])
+                cached = self.cache.get(('serie_diaria', make_filter_key(previous, None, None, selections)))
+                if cached is not None and months:
+                    since = max(since, datetime.strptime(months[0], '%Y-%m'))
+                    series = cached.until(since)
+            return series.append(period_totals(rollups, 'dia', since, daily['data'].iloc[-1], selections))
+
+        series = self.memoized('serie_diaria', make_filter_key(dataset_key, None, None, selections), build)
+        if dataset_key[0] == 'base':
+            self.store_key = dataset_key
+        return series
+
+    def compare(self, filter_key, rollups, period, selections, comparison, sketches=None):
+        """Período e métricas de comparação do período filtrado com o de `comparison` (ver COMPARISONS)
+
+        Com os esboços, o alcance do período de comparação é o sem duplicidade.
+        """
+        def build():
+            cube = select_cube(rollups['dia'], selections=selections)
+            window = comparison_window(*period, comparison)
+            _, previous = compare_totals(cube, period, window)
+            metrics = calculate_metrics(previous)
+            if sketches is not None:
+                metrics['alcance_total'] = distinct_reach(sketches, *window, selections)
+            return {'periodo': window, 'metricas': metrics}
+        return self.memoized('comparacao', (filter_key, comparison), build)
+
+    def compare_tables(self, filter_key, rollups, period, selections, comparison):
+        """Tabelas de campanhas e de anúncios com as variações em relação ao período de `comparison`
+
+        Formatadas para exibição e, em 'totals', sem formatação; cada uma sai de uma
+        única agregação sobre a tabela diária com as linhas dos dois períodos rotuladas.
+        """
+        def build():
+            cube = select_cube(rollups['dia'], selections=selections)
+            window = comparison_window(*period, comparison)
+            campaigns = compare_totals(cube, period, window, 'campanha', CAMPAIGN_METRICS)
+            ads = compare_totals(cube, period, window, 'anuncio', AD_METRICS)
+            return {
+                'campaigns': add_changes(campaign_table(campaigns[0]), *campaigns),
+                'ads': add_changes(ad_table(ads[0]), *ads),
+                'totals': {'campaigns': with_changes(*campaigns), 'ads': with_changes(*ads)}
+            }
+        return self.memoized('comparacao_tabelas', (filter_key, comparison), build)
+
+    def resolve(self, spec, parse_options=None):
+        """Chave e função de carga do conjunto de dados descrito por `spec`
+
+        `spec` aceita {"files": [caminhos]}, {"watch_dir": pasta}, {"store": true} ou
+        {"sample": {parâmetros}}; os caminhos são relativos a DATA_ROOT e não podem
+        sair dela. Vazio, segue a página: pasta monitorada padrão,
+        base local ou dados de exemplo. As chaves coincidem com as da página, que
+        assim compartilha os conjuntos já carregados.
+        """
+        spec = parse_object(spec, 'dataset')
+        if 'sample' in spec:
+            return sample_dataset(spec['sample'])
+        if 'files' in spec:
+            paths = [data_path(path) for path in parse_list(spec['files'], 'files')]
+            missing = [path for path in paths if not os.path.isfile(path)]
+            if missing:
+                raise QueryError(f'Arquivo(s) não encontrado(s): {", ".join(missing)}')
+            files = [(path, os.stat(path).st_size, os.stat(path).st_mtime_ns) for path in paths]
+        elif 'watch_dir' in spec:
+            files = watched_data_files(data_path(spec['watch_dir']))
+            if not files:
+                raise QueryError(f'Nenhum arquivo CSV/Excel em {spec["watch_dir"]}')
+        elif spec.get('store'):
+            files = []
+        else:
+            files = watched_data_files(data_path(DEFAULT_WATCH_DIR)) if DEFAULT_WATCH_DIR else []
+
+        if files:
+            parse_options = parse_options_of(parse_options)
+            sources = file_sources(files)
+            dataset_key = ('arquivos', tuple(key for key, _, _ in sources), tuple(sorted(parse_options.items())))
+            return dataset_key, lambda: (*load_files(sources, parse_options), upload_alerts)
+        signature = store_signature()
+        if signature:
+            return ('base', signature), load_store_dataset
+        if spec.get('store'):
+            raise QueryError('A base local está vazia')
+        return sample_dataset({})
+
+    def query(self, query, dataset_key=None, load=None):
+        """Executa uma consulta e devolve um dicionário serializável em JSON
+
+        `query` traz "dataset" (ver `resolve`), "parse_options", "filters" ({"inicio",
+        "fim", "conta", "campanha", "conjunto", "anuncio"}), "views" (de QUERY_VIEWS)
+        "granularity" (dos totais por período) e "comparison" (de COMPARISONS, com
+        "inicio" e "fim": as tabelas ganham as variações e o resultado, a chave
+        "comparacao" com o período e as métricas de comparação). `dataset_key` e `load` evitam
+        resolver o conjunto de dados de novo quando já foram calculados.
+        """
+        if dataset_key is None:
+            dataset_key, load = self.resolve(query.get('dataset'), query.get('parse_options'))
+        dataset = self.dataset(dataset_key, load)
+        rollups = dataset['rollups']
+        if rollups is None:
+            errors = '; '.join(f"{row['Arquivo']}: {row['Erro']}" for row in dataset['report'])
+            raise QueryError(f'Nenhum arquivo válido ({errors})')
+
+        filters = parse_object(query.get('filters'), 'filters')
+        unknown = set(filters) - {'inicio', 'fim'} - set(FILTER_DIMENSIONS)
+        if unknown:
+            raise QueryError(f'Filtro(s) desconhecido(s): {", ".join(sorted(unknown))}')
+        start_date, end_date = parse_date(filters.get('inicio'), 'inicio'), parse_date(filters.get('fim'), 'fim')
+        if (start_date is None) != (end_date is None):
+            raise QueryError('Informe "inicio" e "fim" juntos')
+        selections = {dim: [str(value) for value in parse_list(filters.get(dim), dim)] for dim in FILTER_DIMENSIONS}
+        filter_key = make_filter_key(dataset_key, start_date, end_date, selections)
+
+        views = parse_list(query.get('views'), 'views') or QUERY_VIEWS
+        unknown = set(views) - set(QUERY_VIEWS)
+        if unknown:
+            raise QueryError(f'Visualização(ões) desconhecida(s): {", ".join(sorted(unknown))}')
+        granularity = parse_text(query.get('granularity'), 'granularity', 'dia')
+        if granularity not in rollups:
+            raise QueryError(f'Granularidade indisponível: {granularity} (use {", ".join(rollups)})')
+
+        comparison = parse_text(query.get('comparison'), 'comparison')
+        if comparison is not None and comparison not in COMPARISONS:
+            raise QueryError(f'Comparação desconhecida: {comparison} (use {", ".join(COMPARISONS)})')
+        if comparison and start_date is None:
+            raise QueryError('A comparação exige "inicio" e "fim"')
+
+        cube = select_cube(rollups['dia'], start_date, end_date, selections)
+        sketches = dataset['reach']
+        # Registros da API a partir dos totais sem formatação (percentuais de 0 a 100, como nas métricas)
+        comparison_data = (self.compare(filter_key, rollups, (start_date, end_date), selections, comparison, sketches)
+                           if comparison else None)
+        tables = None
+        if 'campanhas' in views or 'anuncios' in views:
+            tables = (self.compare_tables(filter_key, rollups, (start_date, end_date), selections, comparison)['totals']
+                      if comparison else self.totals(filter_key, cube))
+        result = {}
+        if 'metricas' in views:
+            metrics = self.metrics(filter_key, cube, sketches, (start_date, end_date), selections)
+            result['metricas'] = {name: float(value) for name, value in metrics.items()}
+        if comparison:
+            result['comparacao'] = {
+                'inicio': comparison_data['periodo'][0].isoformat(),
+                'fim': comparison_data['periodo'][1].isoformat(),
+                'metricas': {name: float(value) for name, value in comparison_data['metricas'].items()}
+            }
+        if 'campanhas' in views:
+            result['campanhas'] = to_records(tables['campaigns'])
+        if 'anuncios' in views:
+            result['anuncios'] = to_records(tables['ads'])
+        if 'periodos' in views:
+            result['periodos'] = to_records(self.periods(filter_key, rollups, granularity,
+                                                         (start_date, end_date), selections))
+        if 'moveis' in views:
+            series = self.rolling_series(dataset_key, rollups, selections)
+            result['moveis'] = to_records(rolling_table(series, start_date, end_date))
+        if 'alertas' in views:
+            result['alertas'] = to_records(filter_alerts(dataset['alerts'], start_date, end_date, selections))
+        return result
+
@@ -0,0 +1,158 @@
+"""Exportação dos dados filtrados em CSV, Parquet ou Excel, gravada em blocos em arquivos reaproveitáveis"""
+import hashlib
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from metrics import add_derived_metrics
+
+# Formatos de exportação: nome -> (rótulo, extensão, tipo MIME)
+EXPORT_FORMATS = {
+    'csv': ('CSV', 'csv', 'text/csv'),
+    'parquet': ('Parquet', 'parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('Excel', 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+}
+
+# Linhas gravadas por bloco, para não montar o arquivo inteiro em memória
+EXPORT_CHUNK_ROWS = 100_000
+
+# Limite de linhas de uma planilha do Excel (sem o cabeçalho)
+EXCEL_MAX_ROWS = 1_048_575
+
+# Pasta dos arquivos exportados e quantos são mantidos (os mais antigos são apagados)
+EXPORT_DIR = os.environ.get('DASHBOARD_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'dashboard_exports'))
+EXPORT_MAX_FILES = 16
+
+# Tempo (s) desde o último uso em que uma exportação não é apagada, para não interromper downloads
+EXPORT_GRACE_SECONDS = 15 * 60
+
+
+def export_path(key, export_format, multiple=False):
+    """Caminho do arquivo de uma exportação; `key` identifica os dados e os filtros"""
+    digest = hashlib.blake2b(repr((key, export_format)).encode('utf-8'), digest_size=16).hexdigest()
+    extension = 'zip' if multiple and export_format != 'xlsx' else EXPORT_FORMATS[export_format][1]
+    return os.path.join(EXPORT_DIR, f'{digest}.{extension}')
+
+
+def chunks(df, derived=False):
+    """Blocos de linhas do DataFrame; com `derived`, as métricas derivadas são calculadas por bloco"""
+    for start in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        yield add_derived_metrics(chunk.copy()) if derived else chunk
+
+
+def write_csv(df, file, derived=False):
+    for i, chunk in enumerate(chunks(df, derived)):
+        chunk.to_csv(file, index=False, header=i == 0)
+
+
+def write_parquet(df, file, derived=False):
+    writer = None
+    try:
+        for chunk in chunks(df, derived):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(file, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_excel_sheet(workbook, name, df, derived=False):
+    if len(df) > EXCEL_MAX_ROWS:
+        raise ValueError(f'{len(df):,} linhas excedem o limite do Excel ({EXCEL_MAX_ROWS:,}); use CSV ou Parquet.')
+    sheet = workbook.create_sheet(name)
+    for i, chunk in enumerate(chunks(df, derived)):
+        if i == 0:
+            sheet.append(list(chunk.columns))
+        # Datas e categorias viram tipos que o openpyxl grava diretamente (sem alterar o bloco, que
+        # pode ser um trecho da tabela original)
+        chunk = chunk.astype({col: str for col in chunk.select_dtypes('category').columns})
+        chunk = chunk.assign(**{col: chunk[col].dt.to_pydatetime() for col in chunk.select_dtypes('datetime').columns})
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append(row)
+
+
+def write_export(tables, path, export_format, derived=False):
+    """Grava as tabelas {nome: DataFrame} no formato pedido
+
+    Uma tabela vira um arquivo simples; várias viram abas (Excel) ou um .zip com um
+    arquivo por tabela (CSV/Parquet). O arquivo é gravado com um nome temporário
+    único (sessões que exportam os mesmos dados ao mesmo tempo não se misturam) e
+    só então renomeado, para que uma exportação interrompida não seja reaproveitada.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writer = write_csv if export_format == 'csv' else write_parquet
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+        temp_path = f.name
+    try:
+        if export_format == 'xlsx':
+            workbook = Workbook(write_only=True)
+            for name, df in tables.items():
+                write_excel_sheet(workbook, name, df, derived)
+            workbook.save(temp_path)
+        elif len(tables) == 1:
+            with open(temp_path, 'wb') as f:
+                write_binary(writer, next(iter(tables.values())), f, export_format, derived)
+        else:
+            with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for name, df in tables.items():
+                    with archive.open(f'{name}.{EXPORT_FORMATS[export_format][1]}', 'w') as member:
+                        write_binary(writer, df, member, export_format, derived)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    prune_exports()
+    return path
+
+
+def write_binary(writer, df, file, export_format, derived=False):
+    """Grava em um arquivo binário; o CSV passa por um wrapper de texto UTF-8"""
+    if export_format != 'csv':
+        writer(df, file, derived)
+        return
+    text = io.TextIOWrapper(file, encoding='utf-8', newline='')
+    writer(df, text, derived)
+    text.flush()
+    text.detach()
+
+
+def use_export(path):
+    """Se a exportação existe; marca o uso (data de modificação), adiando a limpeza durante o download"""
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def prune_exports(max_files=EXPORT_MAX_FILES, grace_seconds=EXPORT_GRACE_SECONDS):
+    """Apaga as exportações mais antigas além do limite, exceto as usadas há menos de `grace_seconds`
+
+    Arquivos temporários abandonados (de gravações interrompidas) também são
+    apagados depois do mesmo intervalo.
+    """
+    limit = time.time() - grace_seconds
+    files = []
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            files.append((os.path.getmtime(path), name.endswith('.tmp'), path))
+        except OSError:
+            pass
+    exports = sorted((file for file in files if not file[1]), reverse=True)
+    stale = [file for file in files if file[1]] + exports[max_files:]
+    for mtime, _, path in stale:
+        if mtime < limit:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
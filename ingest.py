@@ -0,0 +1,239 @@
+"""Leitura e padronização dos arquivos exportados do Meta Ads (CSV ou Excel)"""
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from cube import COUNT_COLUMNS, build_cube, merge_cubes, parse_dates
+from metrics import add_derived_metrics
+from reach import USER_COLUMN, build_sketches, merge_sketches
+
+# Opções de leitura padrão (planilha vazia = primeira planilha do Excel)
+DEFAULT_PARSE_OPTIONS = {'sep': ',', 'decimal': '.', 'streaming': False, 'sheet': ''}
+
+# Opções que afetam cada tipo de arquivo (as demais não entram na chave de cache)
+CSV_OPTIONS = ('sep', 'decimal', 'streaming')
+EXCEL_OPTIONS = ('sheet',)
+
+# Linhas por bloco na leitura em blocos de arquivos CSV grandes
+STREAM_CHUNK_ROWS = 250_000
+
+# Erro de arquivos sem nenhuma linha com data válida (inclusive só com o cabeçalho)
+EMPTY_FILE_ERROR = 'O arquivo não contém linhas de dados.'
+
+# Extensões de arquivo aceitas
+SUPPORTED_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+
+# Colunas necessárias, com os nomes padronizados
+REQUIRED_COLUMNS = ['data', 'conta', 'campanha', 'conjunto', 'anuncio', 'impressoes',
+                    'alcance', 'cliques', 'mensagens', 'gasto', 'receita']
+
+# Colunas opcionais lidas quando presentes (hora do dia, em exportações por hora, e usuário
+# alcançado, em exportações por usuário ou por grupo de usuários)
+OPTIONAL_COLUMNS = ['hora', USER_COLUMN]
+
+# Mapeamento de possíveis nomes de colunas para os nomes padronizados
+COLUMN_MAPPING = {
+    'date': 'data', 'data': 'data', 'dia': 'data',
+    'hour': 'hora', 'hora': 'hora', 'hora do dia': 'hora',
+    'hourly_stats_aggregated_by_advertiser_time_zone': 'hora',
+    'hora do dia (fuso horário do anunciante)': 'hora',
+    'user_id': USER_COLUMN, 'usuario': USER_COLUMN, 'id_usuario': USER_COLUMN, 'reach_bucket': USER_COLUMN,
+    'account': 'conta', 'account_name': 'conta', 'conta': 'conta',
+    'campaign': 'campanha', 'campanha': 'campanha', 'campaign_name': 'campanha',
+    'adset': 'conjunto', 'conjunto': 'conjunto', 'ad_set': 'conjunto', 'adset_name': 'conjunto',
+    'ad': 'anuncio', 'anuncio': 'anuncio', 'ad_name': 'anuncio',
+    'impressions': 'impressoes', 'impressoes': 'impressoes',
+    'reach': 'alcance', 'alcance': 'alcance',
+    'clicks': 'cliques', 'cliques': 'cliques',
+    'messages': 'mensagens', 'mensagens': 'mensagens',
+    'spend': 'gasto', 'gasto': 'gasto', 'custo': 'gasto',
+    'revenue': 'receita', 'receita': 'receita', 'valor': 'receita'
+}
+
+
+def map_columns(columns):
+    """Monta de uma só vez o renomeio das colunas do arquivo para os nomes padronizados"""
+    return {col: COLUMN_MAPPING.get(str(col).lower(), str(col).lower()) for col in columns}
+
+
+def file_options(file_name, options):
+    """Seleciona as opções de leitura que afetam o arquivo, para não invalidar o cache à toa"""
+    keys = CSV_OPTIONS if file_name.lower().endswith('.csv') else EXCEL_OPTIONS
+    return {key: options[key] for key in keys if key in options}
+
+
+def account_from_file_name(file_name):
+    """Conta usada quando o arquivo não traz essa coluna: o nome do arquivo sem pasta e extensão
+
+    A conta faz parte da chave das células, então arquivos de origens diferentes
+    nunca se substituem; só a reexportação de uma mesma origem (mesmo nome de
+    arquivo ou mesma coluna de conta) troca as células já importadas.
+    """
+    return os.path.splitext(os.path.basename(file_name or ''))[0]
+
+
+def fill_missing_columns(df, file_name=''):
+    """Cria as colunas necessárias ausentes com valores padrão (a conta ausente vem do nome do arquivo)"""
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
+    for col in missing_columns:
+        if col == 'data':
+            df['data'] = datetime.now().strftime('%Y-%m-%d')
+        elif col == 'conta':
+            df['conta'] = account_from_file_name(file_name) or 'Não especificado'
+        elif col in COUNT_COLUMNS:
+            df[col] = 0
+        elif col in ['gasto', 'receita']:
+            df[col] = 0.0
+        else:
+            df[col] = 'Não especificado'
+
+    return df
+
+
+def read_excel_sheet(excel_file, sheet=''):
+    """Lê uma planilha do Excel carregando apenas as colunas reconhecidas pelo mapeamento
+
+    Se a planilha pedida não existir no arquivo, é usada a primeira.
+    """
+    with pd.ExcelFile(excel_file) as workbook:
+        sheet_name = sheet if sheet in workbook.sheet_names else workbook.sheet_names[0]
+        return workbook.parse(sheet_name, usecols=lambda col: str(col).lower() in COLUMN_MAPPING)
+
+
+def list_excel_sheets(file_name, source):
+    """Lista as planilhas de um arquivo Excel (bytes ou caminho)"""
+    with open_source(file_name, source) as buffer, pd.ExcelFile(buffer) as workbook:
+        return workbook.sheet_names
+
+
+def parse_uploaded_file(uploaded_file, options=None):
+    """Processa o arquivo CSV carregado"""
+    options = {**DEFAULT_PARSE_OPTIONS, **(options or {})}
+    try:
+        file_name = uploaded_file.name.lower()
+        if file_name.endswith('.csv'):
+            df = pd.read_csv(uploaded_file, sep=options['sep'], decimal=options['decimal'])
+        elif file_name.endswith(('.xls', '.xlsx')):
+            df = read_excel_sheet(uploaded_file, options['sheet'])
+        else:
+            return None, "Formato de arquivo não suportado. Use CSV ou Excel."
+
+        # Padronizar nomes das colunas e criar as ausentes com valores padrão
+        df = fill_missing_columns(df.rename(columns=map_columns(df.columns)), uploaded_file.name)
+
+        # Calcular métricas derivadas se não existirem
+        df = add_derived_metrics(df, only_missing=True)
+
+        return df, None
+    except Exception as e:
+        return None, f'Erro ao processar o arquivo: {str(e)}'
+
+
+def stream_csv_to_cube(uploaded_file, options=None, on_progress=None):
+    """Lê o CSV em blocos, agregando cada bloco direto no cubo para limitar o uso de memória
+
+    Retorna (cubo, esboços de alcance ou None, erro, linhas descartadas por data inválida).
+    """
+    options = {**DEFAULT_PARSE_OPTIONS, **(options or {})}
+    try:
+        # Ler apenas o cabeçalho para montar o renomeio e descartar colunas não usadas
+        header = pd.read_csv(uploaded_file, sep=options['sep'], nrows=0)
+        rename_map = map_columns(header.columns)
+        usecols = [col for col, name in rename_map.items() if name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS]
+        total_bytes = uploaded_file.seek(0, io.SEEK_END) or 1
+        uploaded_file.seek(0)
+
+        reader = pd.read_csv(uploaded_file, sep=options['sep'], decimal=options['decimal'],
+                             usecols=usecols, chunksize=STREAM_CHUNK_ROWS)
+        parts, sketches = [], []
+        rows = invalid_dates = 0
+        start = time.perf_counter()
+        for chunk in reader:
+            chunk = fill_missing_columns(chunk.rename(columns=rename_map), uploaded_file.name)
+            # Contagens em int32; valores monetários seguem em float64 para não acumular erro nas somas
+            chunk[COUNT_COLUMNS] = chunk[COUNT_COLUMNS].fillna(0).astype('int32')
+            chunk, dropped = parse_dates(chunk)
+            invalid_dates += dropped
+            parts.append(build_cube(chunk))
+            sketches.append(build_sketches(chunk))
+            if len(parts) >= 8:
+                parts = [merge_cubes(parts)]
+                sketches = [merge_sketches(sketches)]
+
+            rows += len(chunk) + dropped
+            if on_progress:
+                on_progress(rows, uploaded_file.tell() / total_bytes, time.perf_counter() - start)
+
+        if not parts:
+            return None, None, EMPTY_FILE_ERROR, invalid_dates
+        return merge_cubes(parts), merge_sketches(sketches), None, invalid_dates
+    except Exception as e:
+        return None, None, f'Erro ao processar o arquivo: {str(e)}', 0
+
+
+def file_content_hash(file_bytes):
+    """Calcula o hash do conteúdo do arquivo carregado"""
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+
+def open_source(file_name, source):
+    """Abre o conteúdo de um arquivo, recebido em bytes (upload) ou como caminho em disco"""
+    if isinstance(source, bytes):
+        buffer = io.BytesIO(source)
+        buffer.name = file_name
+        return buffer
+    return open(source, 'rb')
+
+
+def parse_to_cube(file_name, source, options=None, on_progress=None):
+    """Processa um arquivo até o cubo pré-agregado
+
+    Retorna (cubo, esboços de alcance ou None, erro, segundos, linhas descartadas por
+    data inválida). Um arquivo sem nenhuma linha com data válida volta com erro.
+    """
+    options = {**DEFAULT_PARSE_OPTIONS, **(options or {})}
+    start = time.perf_counter()
+    with open_source(file_name, source) as buffer:
+        if options['streaming'] and file_name.lower().endswith('.csv'):
+            cube, sketches, error, invalid_dates = stream_csv_to_cube(buffer, options, on_progress)
+        else:
+            df, error = parse_uploaded_file(buffer, options)
+            cube = sketches = None
+            invalid_dates = 0
+            if df is not None:
+                df, invalid_dates = parse_dates(df)
+                cube, sketches = build_cube(df), build_sketches(df)
+    if error is None and cube.empty:
+        cube, sketches, error = None, None, EMPTY_FILE_ERROR
+    return cube, sketches, error, time.perf_counter() - start, invalid_dates
+
+
+def parse_files_parallel(files, options=None, max_workers=None):
+    """Processa vários arquivos em paralelo, um por processo
+
+    `files` é uma lista de pares (nome, bytes ou caminho); o resultado segue a
+    mesma ordem, com uma tupla (cubo, esboços, erro, segundos, datas inválidas) por arquivo.
+    """
+    max_workers = min(len(files), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(parse_to_cube, name, source, options) for name, source in files]
+        return [future.result() for future in futures]
+
+
+def list_watched_files(directory):
+    """Lista os arquivos CSV/Excel da pasta monitorada como (caminho, tamanho, data de modificação)"""
+    if not directory or not os.path.isdir(directory):
+        return []
+    files = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith(SUPPORTED_EXTENSIONS) and os.path.isfile(path):
+            stat = os.stat(path)
+            files.append((path, stat.st_size, stat.st_mtime_ns))
+    return files
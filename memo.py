@@ -0,0 +1,125 @@
+"""Cache LRU em memória, limitado por tamanho, para agregações e figuras por estado de filtros"""
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+
+# Orçamento padrão de memória do cache (MB), configurável por variável de ambiente
+DEFAULT_MAX_MB = float(os.environ.get('DASHBOARD_MEMO_MB', 256))
+
+
+def estimate_size(value):
+    """Tamanho aproximado do valor em bytes (serializado), usado para respeitar o orçamento"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class MemoCache:
+    """Cache LRU compartilhado entre sessões, com orçamento de memória e contadores de hit/miss
+
+    Os valores guardados são devolvidos sem cópia: quem os usa não deve alterá-los.
+    `sizeof` mede cada valor; com `keep_oversized`, um valor maior que o orçamento
+    ainda é guardado (sozinho) em vez de ser recalculado a cada uso.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 2**20, sizeof=estimate_size, keep_oversized=False):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.keep_oversized = keep_oversized
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.entries
+
+    def _lookup(self, key):
+        """Valor guardado de `key` (ou None), contando o hit; chamado com o lock"""
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return self.entries[key]
+
+    def get(self, key):
+        """Valor guardado de `key` (ou None), sem calculá-lo nem contar hit/miss"""
+        with self._lock:
+            entry = self.entries.get(key)
+            return None if entry is None else entry[0]
+
+    def get_or_compute(self, key, compute):
+        """Devolve o valor de `key`, calculando-o com `compute()` em caso de miss"""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Uma única sessão calcula cada chave (fora do lock geral); as demais esperam o resultado
+        with key_lock:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry[0]
+                self.misses += 1
+            try:
+                value = compute()
+                self._store(key, value)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return value
+
+    def _store(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes and not self.keep_oversized:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.nbytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def prometheus_text(self, metric='dashboard_view_cache'):
+        """Contadores no formato texto do Prometheus"""
+        stats = self.stats()
+        return '\n'.join([
+            f'# TYPE {metric}_hits_total counter',
+            f'{metric}_hits_total {stats["hits"]}',
+            f'# TYPE {metric}_misses_total counter',
+            f'{metric}_misses_total {stats["misses"]}',
+            f'# TYPE {metric}_evictions_total counter',
+            f'{metric}_evictions_total {stats["evictions"]}',
+            f'# TYPE {metric}_entries gauge',
+            f'{metric}_entries {stats["entries"]}',
+            f'# TYPE {metric}_bytes gauge',
+            f'{metric}_bytes {stats["bytes"]}'
+        ]) + '\n'
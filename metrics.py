@@ -0,0 +1,76 @@
+"""Cálculo vetorizado das métricas derivadas do Meta Ads"""
+import numpy as np
+
+# Colunas somáveis a partir das quais todas as métricas são derivadas
+BASE_COLUMNS = ['impressoes', 'alcance', 'cliques', 'mensagens', 'gasto', 'receita']
+
+# Métricas derivadas: nome -> (numerador, denominador, escala)
+DERIVED_METRICS = {
+    'ctr': ('cliques', 'impressoes', 100),
+    'cpc': ('gasto', 'cliques', 1),
+    'cpm': ('gasto', 'impressoes', 1000),
+    'cpl': ('gasto', 'mensagens', 1),
+    'taxa_mensagens': ('mensagens', 'cliques', 100),
+    'roas': ('receita', 'gasto', 1),
+    'roi': ('lucro', 'gasto', 100),
+}
+
+
+def safe_divide(numerator, denominator, scale=1):
+    """Divide elemento a elemento, retornando 0 onde o denominador não é positivo"""
+    numerator = np.asarray(numerator, dtype='float64')
+    denominator = np.asarray(denominator, dtype='float64')
+    result = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    if scale != 1:
+        result *= scale
+    if result.ndim == 0:
+        return float(result)
+    return result
+
+
+def percent_change(current, previous):
+    """Variação percentual em relação ao valor anterior; NaN onde o anterior é zero (sem base de comparação)"""
+    current = np.asarray(current, dtype='float64')
+    previous = np.asarray(previous, dtype='float64')
+    result = np.full(np.broadcast(current, previous).shape, np.nan)
+    np.divide(current - previous, np.abs(previous), out=result, where=previous != 0)
+    result *= 100
+    if result.ndim == 0:
+        return float(result)
+    return result
+
+
+def compute_metric(data, name):
+    """Calcula uma métrica derivada a partir de um DataFrame ou dicionário de totais"""
+    numerator, denominator, scale = DERIVED_METRICS[name]
+    if numerator == 'lucro':
+        numerator_values = np.asarray(data['receita'], dtype='float64') - np.asarray(data['gasto'], dtype='float64')
+    else:
+        numerator_values = data[numerator]
+    return safe_divide(numerator_values, data[denominator], scale)
+
+
+def add_derived_metrics(df, names=('ctr', 'cpc', 'cpm', 'roas', 'roi'), only_missing=False):
+    """Adiciona as métricas derivadas como colunas do DataFrame e o retorna"""
+    for name in names:
+        if only_missing and name in df.columns:
+            continue
+        df[name] = compute_metric(df, name)
+    return df
+
+
+def calculate_metrics(df):
+    """Calcula métricas agregadas a partir do DataFrame"""
+    metrics = {}
+
+    # Métricas básicas
+    totals = {col: df[col].sum() for col in BASE_COLUMNS}
+    for col, total in totals.items():
+        metrics[f'{col}_total'] = total
+
+    # Métricas calculadas
+    for name in ['ctr', 'cpc', 'cpm', 'taxa_mensagens', 'roas', 'roi']:
+        metrics[name] = compute_metric(totals, name)
+
+    return metrics
@@ -0,0 +1,114 @@
+"""Medição opcional do tempo de cada etapa do script, com histórico e exportação (JSON / Prometheus)"""
+import cProfile
+import io
+import json
+import pstats
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Quantidade de execuções mantidas no histórico
+HISTORY_SIZE = 100
+
+# Linhas do relatório do cProfile exibidas por etapa
+PROFILE_LINES = 30
+
+
+class StageProfiler:
+    """Cronometra etapas nomeadas de uma execução do script
+
+    Desativado, `stage()` não mede nada. As etapas em `profile_stages` também são
+    executadas sob o cProfile (uma por vez, pois o cProfile não aceita aninhamento).
+    """
+
+    def __init__(self, enabled=False, profile_stages=()):
+        self.enabled = enabled
+        self.profile_stages = set(profile_stages)
+        self.timings = {}
+        self.profiles = {}
+        self.start = time.perf_counter()
+        self._profiling = False
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        profiler = None
+        if name in self.profile_stages and not self._profiling:
+            profiler = cProfile.Profile()
+            self._profiling = True
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                self.profiles[name] = profile_report(profiler)
+            # Etapas repetidas na mesma execução são somadas
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def finish(self, history):
+        """Registra a execução no histórico e a retorna"""
+        run = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'total': time.perf_counter() - self.start,
+            'stages': dict(self.timings)
+        }
+        history.append(run)
+        return run
+
+
+def new_history():
+    return deque(maxlen=HISTORY_SIZE)
+
+
+def profile_report(profiler):
+    """Texto do cProfile com as funções de maior tempo acumulado"""
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return output.getvalue()
+
+
+def quantile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def history_summary(history):
+    """Resumo por etapa: última execução, mediana, p90 e média (em segundos)"""
+    stages = {}
+    for run in history:
+        for name, seconds in run['stages'].items():
+            stages.setdefault(name, []).append(seconds)
+    last = history[-1]['stages'] if history else {}
+    return [{
+        'etapa': name,
+        'ultima': last.get(name, 0.0),
+        'mediana': quantile(values, 0.5),
+        'p90': quantile(values, 0.9),
+        'media': sum(values) / len(values),
+        'execucoes': len(values)
+    } for name, values in stages.items()]
+
+
+def history_to_json(history):
+    return json.dumps(list(history), indent=2)
+
+
+def history_to_prometheus(history, metric='dashboard_stage_seconds'):
+    """Histórico no formato texto do Prometheus (summary por etapa)"""
+    lines = [f'# HELP {metric} Tempo de cada etapa do script do dashboard',
+             f'# TYPE {metric} summary']
+    for row in history_summary(history):
+        label = row['etapa'].replace('\\', '\\\\').replace('"', '\\"')
+        lines.append(f'{metric}{{stage="{label}",quantile="0.5"}} {row["mediana"]:.6f}')
+        lines.append(f'{metric}{{stage="{label}",quantile="0.9"}} {row["p90"]:.6f}')
+        lines.append(f'{metric}_sum{{stage="{label}"}} {row["media"] * row["execucoes"]:.6f}')
+        lines.append(f'{metric}_count{{stage="{label}"}} {row["execucoes"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,70 @@
+"""Registro dos conjuntos de dados carregados, compartilhado entre sessões, com tabelas somente leitura"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from memo import MemoCache
+
+# Orçamento padrão de memória dos conjuntos de dados (MB), configurável por variável de ambiente
+DEFAULT_MAX_MB = float(os.environ.get('DASHBOARD_DATASET_MB', 2048))
+
+
+def readonly(values):
+    """Cópia do array marcada como somente leitura"""
+    values = np.array(values, copy=True)
+    values.setflags(write=False)
+    return values
+
+
+def freeze_frame(df):
+    """Cópia do DataFrame cujas colunas são arrays somente leitura
+
+    Cada coluna fica em um bloco próprio (sem consolidação), de modo que qualquer
+    escrita no lugar falha em vez de alterar os dados vistos pelas outras sessões.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col].array
+        if isinstance(values, pd.Categorical):
+            columns[col] = pd.Categorical.from_codes(readonly(values.codes), dtype=values.dtype)
+        else:
+            columns[col] = readonly(df[col].to_numpy())
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def freeze(value):
+    """Congela os DataFrames de um valor (dicionários são percorridos)"""
+    if isinstance(value, pd.DataFrame):
+        return freeze_frame(value)
+    if isinstance(value, dict):
+        return {key: freeze(item) for key, item in value.items()}
+    return value
+
+
+def dataset_size(value):
+    """Memória ocupada pelos DataFrames de um valor, em bytes"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(dataset_size(item) for item in value.values())
+    return 0
+
+
+class DatasetRegistry(MemoCache):
+    """Conjuntos de dados por chave (hash dos arquivos, assinatura da base, parâmetros do exemplo)
+
+    Cada conjunto é carregado uma única vez por processo, mesmo com várias sessões
+    pedindo-o ao mesmo tempo, e todas recebem as mesmas tabelas, somente leitura;
+    cada sessão guarda apenas os seus filtros. Os menos usados recentemente são
+    descartados além do orçamento de memória (o mais recente é sempre mantido).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 2**20):
+        super().__init__(max_bytes, sizeof=dataset_size, keep_oversized=True)
+
+    def get_or_compute(self, key, compute):
+        return super().get_or_compute(key, lambda: freeze(compute()))
+
+    def prometheus_text(self, metric='dashboard_dataset_registry'):
+        return super().prometheus_text(metric)
@@ -0,0 +1,109 @@
+"""Janelas móveis (7 e 28 dias) e acumulados sobre a série diária, atualizados de forma incremental"""
+import numpy as np
+import pandas as pd
+
+from metrics import BASE_COLUMNS, compute_metric
+
+# Janelas móveis padrão, em dias
+ROLLING_WINDOWS = [7, 28]
+
+# Métricas de razão disponíveis nas janelas móveis: nome -> rótulo
+ROLLING_METRICS = {'ctr': 'CTR (%)', 'cpc': 'CPC (R$)', 'cpl': 'CPL (R$)', 'roas': 'ROAS'}
+
+
+class RollingSeries:
+    """Somas acumuladas diárias das colunas base, das quais saem janelas móveis e acumulados
+
+    `prefix[i]` guarda a soma dos dias anteriores ao dia `i` da série (dias sem
+    dados contam como zero). A janela de `w` dias terminando no dia `i` é
+    `prefix[i + 1] - prefix[i + 1 - w]`: as razões saem das somas de numerador e
+    denominador da janela, nunca da média das razões diárias.
+    """
+
+    def __init__(self):
+        self.start = None
+        self.prefix = np.zeros((1, len(BASE_COLUMNS)))
+
+    def __len__(self):
+        return len(self.prefix) - 1
+
+    @property
+    def dates(self):
+        if self.start is None:
+            return np.array([], dtype='datetime64[D]')
+        return self.start + np.arange(len(self))
+
+    def append(self, daily):
+        """Acrescenta totais diários (coluna `data` e colunas base) e retorna a própria série
+
+        Dias já presentes na série são substituídos. Os acumulados são refeitos
+        apenas a partir do primeiro dia recebido, com custo proporcional aos dias
+        acrescentados (e não ao histórico inteiro).
+        """
+        if daily.empty:
+            return self
+        days = daily['data'].to_numpy().astype('datetime64[D]')
+        if self.start is None:
+            self.start = days.min()
+        offsets = (days - self.start).astype('int64')
+        if offsets.min() < 0:
+            raise ValueError('Os dias acrescentados não podem ser anteriores ao início da série.')
+
+        # Totais por dia a partir do primeiro recebido: os atuais, com os dias recebidos substituídos
+        first = int(offsets.min())
+        end = max(int(offsets.max()) + 1, len(self))
+        block = np.zeros((end - first, len(BASE_COLUMNS)))
+        kept = len(self) - first
+        if kept > 0:
+            block[:kept] = np.diff(self.prefix[first:], axis=0)
+        block[offsets - first] = 0
+        np.add.at(block, offsets - first, daily[BASE_COLUMNS].to_numpy(dtype='float64'))
+
+        self.prefix = np.concatenate([self.prefix[:first + 1], self.prefix[first] + np.cumsum(block, axis=0)])
+        return self
+
+    def until(self, end_date):
+        """Nova série só com os dias anteriores a `end_date` (a original não muda)"""
+        series = RollingSeries()
+        stop = int(np.searchsorted(self.dates, np.datetime64(end_date, 'D'), side='left'))
+        if stop:
+            series.start = self.start
+            series.prefix = self.prefix[:stop + 1]
+        return series
+
+    def positions(self, start_date=None, end_date=None):
+        """Índices (início, fim exclusivo) dos dias entre as datas informadas (inclusive)"""
+        dates = self.dates
+        start = 0 if start_date is None else np.searchsorted(dates, np.datetime64(start_date, 'D'), side='left')
+        stop = len(dates) if end_date is None else np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right')
+        return int(start), int(stop)
+
+    def window_sums(self, window, start_date=None, end_date=None):
+        """Somas das colunas base nas janelas de `window` dias terminando em cada dia do período
+
+        Dias sem histórico suficiente para a janela completa ficam com NaN.
+        """
+        start, stop = self.positions(start_date, end_date)
+        ends = np.arange(start, stop) + 1
+        sums = self.prefix[ends] - self.prefix[np.maximum(ends - window, 0)]
+        sums[ends < window] = np.nan
+        return pd.DataFrame(sums, columns=BASE_COLUMNS)
+
+    def cumulative(self, column='gasto', start_date=None, end_date=None):
+        """Acumulado da coluna desde o início do período até cada dia"""
+        start, stop = self.positions(start_date, end_date)
+        j = BASE_COLUMNS.index(column)
+        return self.prefix[start + 1:stop + 1, j] - self.prefix[start, j]
+
+
+def rolling_table(series, start_date=None, end_date=None, windows=ROLLING_WINDOWS, metrics=ROLLING_METRICS):
+    """Tabela do período com a métrica diária (`<métrica>_1d`), as móveis (`<métrica>_<w>d`) e o gasto acumulado"""
+    start, stop = series.positions(start_date, end_date)
+    table = pd.DataFrame({'data': series.dates[start:stop].astype('datetime64[ns]')})
+    for window in [1] + list(windows):
+        sums = series.window_sums(window, start_date, end_date)
+        for name in metrics:
+            values = compute_metric(sums, name)
+            table[f'{name}_{window}d'] = np.where(sums['impressoes'].isna(), np.nan, values)
+    table['gasto_acumulado'] = series.cumulative('gasto', start_date, end_date)
+    return table
@@ -0,0 +1,87 @@
+"""Gerador vetorizado de dados sintéticos do Meta Ads, para demonstração e testes de carga
+
+Uso:
+    python sample_data.py --campaigns 50 --adsets 10 --ads 20 --days 100 --output dados.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from metrics import safe_divide
+
+
+def generate_sample_data(campaigns=5, adsets=3, ads=5, days=31, accounts=1, seed=None, start='2025-01-01',
+                         hourly=False):
+    """Gera uma linha por dia e anúncio, com o mesmo esquema dos arquivos importados
+
+    Cada conta tem `campaigns` campanhas, cada campanha `adsets` conjuntos e cada
+    conjunto `ads` anúncios; o total de linhas é accounts × campaigns × adsets × ads × days
+    (× 24 com `hourly`, uma linha por hora).
+    """
+    rng = np.random.default_rng(seed)
+    cells = accounts * campaigns * adsets * ads
+    periods = days * 24 if hourly else days
+    rows = cells * periods
+
+    # Índices de cada linha: ordenadas por data e, dentro do dia (ou hora), por anúncio
+    ad_index = np.tile(np.arange(cells, dtype='int32'), periods)
+    adset_index = ad_index // ads
+    campaign_index = adset_index // adsets
+    account_index = campaign_index // campaigns
+
+    def labels(prefix, count, codes):
+        return pd.Categorical.from_codes(codes, [f'{prefix} {i + 1}' for i in range(count)])
+
+    impressions = rng.integers(1000, 10000, rows)
+    reach = (impressions * rng.uniform(0.7, 0.9, rows)).astype('int64')
+    clicks = (reach * rng.uniform(0.01, 0.1, rows)).astype('int64')
+    messages = (clicks * rng.uniform(0.1, 0.5, rows)).astype('int64')
+    spend = np.round(rng.uniform(50, 500, rows), 2)
+    revenue = np.round(spend * rng.uniform(0.8, 4.0, rows), 2)
+
+    return pd.DataFrame({
+        'data': np.repeat(pd.date_range(start=start, periods=periods, freq='h' if hourly else 'D').to_numpy(), cells),
+        'conta': labels('Conta', accounts, account_index),
+        'campanha': labels('Campanha', accounts * campaigns, campaign_index),
+        'conjunto': labels('Conjunto', accounts * campaigns * adsets, adset_index),
+        'anuncio': labels('Anúncio', cells, ad_index),
+        'impressoes': impressions,
+        'alcance': reach,
+        'cliques': clicks,
+        'mensagens': messages,
+        'ctr': np.round(safe_divide(clicks, impressions, 100), 2),
+        'cpc': np.round(safe_divide(spend, clicks), 2),
+        'cpm': np.round(safe_divide(spend, impressions, 1000), 2),
+        'gasto': spend,
+        'receita': revenue,
+        'roas': np.round(safe_divide(revenue, spend), 2),
+        'roi': np.round(safe_divide(revenue - spend, spend, 100), 2)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--campaigns', type=int, default=5)
+    parser.add_argument('--adsets', type=int, default=3)
+    parser.add_argument('--ads', type=int, default=5)
+    parser.add_argument('--days', type=int, default=31)
+    parser.add_argument('--accounts', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--hourly', action='store_true', help='Uma linha por hora em vez de por dia')
+    parser.add_argument('--output', required=True, help='Arquivo de saída (.csv, .parquet ou .feather)')
+    args = parser.parse_args()
+
+    df = generate_sample_data(args.campaigns, args.adsets, args.ads, args.days, args.accounts, args.seed,
+                              hourly=args.hourly)
+    if args.output.endswith('.parquet'):
+        df.to_parquet(args.output, index=False)
+    elif args.output.endswith('.feather'):
+        df.to_feather(args.output)
+    else:
+        df.to_csv(args.output, index=False, date_format='%Y-%m-%d %H:%M' if args.hourly else '%Y-%m-%d')
+    print(f'{len(df):,} linhas gravadas em {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Base local colunar (Feather/Arrow) com o cubo do dashboard, particionada por mês"""
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from cube import CATEGORY_DIMENSIONS, CUBE_DIMENSIONS, encode_dimensions
+
+# Diretório padrão da base local
+DEFAULT_STORE_DIR = os.environ.get('DASHBOARD_STORE_DIR', 'data_store')
+
+# Extensão dos arquivos de partição (um por mês)
+PARTITION_SUFFIX = '.feather'
+
+# Conjunto da base com os esboços de alcance, gravado junto com o cubo
+SKETCH_DATASET = 'alcance'
+
+# Conjunto da base com os alertas, recalculados a cada acréscimo só a partir dos dias novos
+ALERT_DATASET = 'alertas'
+
+
+def _dataset_dir(store_dir, dataset):
+    return os.path.join(store_dir, dataset)
+
+
+def _partition_path(store_dir, dataset, month):
+    return os.path.join(_dataset_dir(store_dir, dataset), f'mes={month}{PARTITION_SUFFIX}')
+
+
+def list_partitions(store_dir=DEFAULT_STORE_DIR, dataset='default'):
+    """Lista os arquivos de partição da base, em ordem cronológica"""
+    path = _dataset_dir(store_dir, dataset)
+    if not os.path.isdir(path):
+        return []
+    names = sorted(name for name in os.listdir(path) if name.endswith(PARTITION_SUFFIX))
+    return [os.path.join(path, name) for name in names]
+
+
+def partition_months(store_dir=DEFAULT_STORE_DIR, dataset='default'):
+    """Meses (AAAA-MM) gravados na base, em ordem cronológica"""
+    return [os.path.basename(path)[len('mes='):-len(PARTITION_SUFFIX)] for path in list_partitions(store_dir, dataset)]
+
+
+def store_signature(store_dir=DEFAULT_STORE_DIR, dataset='default'):
+    """Identifica a versão atual da base (nome, tamanho e data de modificação das partições)"""
+    signature = []
+    for path in list_partitions(store_dir, dataset):
+        stat = os.stat(path)
+        signature.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def changed_months(previous, signature):
+    """Meses regravados, novos ou removidos entre duas assinaturas da base, em ordem"""
+    return sorted({name[len('mes='):-len(PARTITION_SUFFIX)] for name, _, _ in set(previous) ^ set(signature)})
+
+
+def _read_partition(path):
+    # A tabela Arrow é convertida em DataFrame logo em seguida, então mapear o arquivo em memória
+    # não evitaria a cópia; sem compressão, a leitura é apenas a cópia dos dados
+    return feather.read_feather(path)
+
+
+def _write_partition(rows, path):
+    # Gravada com outro nome e só então renomeada, para que uma gravação interrompida não corrompa a base
+    temporary_path = path + '.tmp'
+    feather.write_feather(rows, temporary_path, compression='uncompressed')
+    os.replace(temporary_path, path)
+
+
+def read_store(store_dir=DEFAULT_STORE_DIR, dataset='default', start_month=None):
+    """Linhas gravadas na base, como foram gravadas (None se vazia); com `start_month`, só desse mês em diante"""
+    paths = [path for path, month in zip(list_partitions(store_dir, dataset), partition_months(store_dir, dataset))
+             if start_month is None or month >= start_month]
+    if not paths:
+        return None
+    return pd.concat([_read_partition(path) for path in paths], ignore_index=True)
+
+
+def load_store(store_dir=DEFAULT_STORE_DIR, dataset='default', start_month=None):
+    """Reabre o cubo salvo na base local (None se a base estiver vazia)"""
+    cube = read_store(store_dir, dataset, start_month)
+    if cube is None:
+        return None
+    return encode_dimensions(cube)
+
+
+def day_cells(rows):
+    """Chaves (dia, conta, campanha, conjunto, anúncio) das linhas, com as horas juntadas no dia"""
+    return pd.MultiIndex.from_frame(rows[CUBE_DIMENSIONS].assign(data=rows['data'].dt.normalize()))
+
+
+def append_cube(cube, store_dir=DEFAULT_STORE_DIR, dataset='default'):
+    """Acrescenta um cubo (ou esboços de alcance) à base, reescrevendo apenas os meses afetados
+
+    Células já existentes (mesmo dia, conta, campanha, conjunto e anúncio) são
+    substituídas pelas linhas do novo arquivo, inclusive quando a célula tem
+    várias linhas (esboços por registrador ou horas do dia). A comparação é por
+    dia de calendário, para que um dia gravado por hora e depois por dia (ou o
+    contrário) fique só com a versão mais recente. Retorna os meses gravados.
+    """
+    os.makedirs(_dataset_dir(store_dir, dataset), exist_ok=True)
+    months = cube['data'].dt.strftime('%Y-%m')
+    written = []
+    for month, new_rows in cube.groupby(months, sort=True):
+        path = _partition_path(store_dir, dataset, month)
+        # Dimensões gravadas como texto; as categorias são refeitas ao reabrir a base
+        new_rows = new_rows.astype({dimension: str for dimension in CATEGORY_DIMENSIONS})
+        if os.path.exists(path):
+            # Partições antigas podem não ter todas as dimensões (ex.: gravadas antes da conta existir)
+            old_rows = encode_dimensions(_read_partition(path))
+            old_rows = old_rows.astype({dimension: str for dimension in CATEGORY_DIMENSIONS})
+            replaced = day_cells(old_rows).isin(day_cells(new_rows))
+            new_rows = pd.concat([old_rows[~replaced], new_rows], ignore_index=True)
+        _write_partition(new_rows.sort_values(CUBE_DIMENSIONS, ignore_index=True), path)
+        written.append(month)
+    return written
+
+
+def replace_from(rows, since, end, store_dir=DEFAULT_STORE_DIR, dataset=ALERT_DATASET):
+    """Regrava os meses de `since` a `end` com as linhas de `rows`, mantendo as gravadas antes de `since`
+
+    Para tabelas recalculadas a partir de uma data (ex.: alertas), sem células a
+    casar. Todos os meses do intervalo são gravados, mesmo sem linhas, para indicar
+    que já foram calculados. Retorna os meses gravados.
+    """
+    os.makedirs(_dataset_dir(store_dir, dataset), exist_ok=True)
+    since = pd.Timestamp(since).normalize()
+    # Dimensões vazias (ex.: alertas de campanha não têm anúncio) continuam vazias
+    rows = rows.astype({'data': 'datetime64[ns]', **{dimension: object for dimension in CATEGORY_DIMENSIONS}})
+    row_months = rows['data'].dt.strftime('%Y-%m')
+    months = list(pd.period_range(since, pd.Timestamp(end), freq='M').strftime('%Y-%m'))
+    for month in months:
+        path = _partition_path(store_dir, dataset, month)
+        new_rows = rows[(row_months == month).to_numpy()]
+        if os.path.exists(path):
+            old_rows = _read_partition(path)
+            new_rows = pd.concat([old_rows[old_rows['data'] < since], new_rows], ignore_index=True)
+        _write_partition(new_rows.reset_index(drop=True), path)
+    return months
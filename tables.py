@@ -0,0 +1,151 @@
+"""Tabelas detalhadas do dashboard (campanhas e criativos), formatadas para exibição"""
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from cube import aggregate
+from metrics import percent_change
+
+# Colunas de cada tabela detalhada
+CAMPAIGN_TABLE_COLUMNS = ['campanha', 'alcance', 'impressoes', 'cliques', 'mensagens', 'gasto', 'receita',
+                          'ctr', 'cpc', 'cpm', 'roas', 'roi']
+AD_TABLE_COLUMNS = ['anuncio', 'alcance', 'impressoes', 'cliques', 'mensagens', 'gasto', 'ctr', 'cpc', 'cpm', 'cpl']
+
+# Rótulo e formato (do Python, com separadores trocados para pt-BR: R$ 1.234,56) de cada
+# coluna. Os formatos são fixos, e não os do idioma do navegador, para que todos vejam o
+# mesmo (R$ e % explícitos, CTR e ROI já calculados em %)
+COLUMN_FORMATS = {
+    'campanha': ('Campanha', None),
+    'anuncio': ('Anúncio', None),
+    'alcance': ('Alcance', '{:,.0f}'),
+    'impressoes': ('Impressões', '{:,.0f}'),
+    'cliques': ('Cliques', '{:,.0f}'),
+    'mensagens': ('Mensagens', '{:,.0f}'),
+    'gasto': ('Gasto', 'R$ {:,.2f}'),
+    'receita': ('Receita', 'R$ {:,.2f}'),
+    'ctr': ('CTR', '{:,.2f}%'),
+    'cpc': ('CPC', 'R$ {:,.2f}'),
+    'cpm': ('CPM', 'R$ {:,.2f}'),
+    'cpl': ('CPL', 'R$ {:,.2f}'),
+    'roas': ('ROAS', '{:,.2f}'),
+    'roi': ('ROI', '{:,.2f}%')
+}
+
+# Colunas cuja variação em relação ao período de comparação é mostrada nas tabelas
+CHANGE_COLUMNS = ['mensagens', 'gasto', 'ctr', 'cpc', 'cpm', 'cpl', 'roas', 'roi']
+COLUMN_FORMATS.update({f'{col}_var': (f"Δ {COLUMN_FORMATS[col][0]}", '{:+,.1f}%') for col in CHANGE_COLUMNS})
+
+# Métricas derivadas da tabela de criativos
+AD_METRICS = ['ctr', 'cpc', 'cpm', 'cpl']
+
+# Opções de linhas por página das tabelas detalhadas
+PAGE_SIZES = [25, 50, 100, 250, 1000]
+
+
+# Troca os separadores do formato do Python (1,234.56) pelos do pt-BR (1.234,56)
+PT_BR_SEPARATORS = str.maketrans(',.', '.,')
+
+
+def column_config(columns):
+    """Configuração do st.dataframe com o rótulo de cada coluna (o formato vem de styled_table)"""
+    config = {}
+    for col in columns:
+        label, number_format = COLUMN_FORMATS[col]
+        if number_format:
+            config[col] = st.column_config.NumberColumn(label)
+        else:
+            config[col] = st.column_config.TextColumn(label)
+    return config
+
+
+def format_number(value, number_format):
+    """Formata um valor com o formato da coluna e os separadores do pt-BR"""
+    return number_format.format(value).translate(PT_BR_SEPARATORS)
+
+
+def styled_table(rows):
+    """Página da tabela com os valores formatados em pt-BR; os dados continuam numéricos
+    (a ordenação no st.dataframe funciona), só o texto exibido muda"""
+    formats = {col: partial(format_number, number_format=COLUMN_FORMATS[col][1])
+               for col in rows.columns if COLUMN_FORMATS[col][1]}
+    return rows.style.format(formats, na_rep='')
+
+
+CAMPAIGN_COLUMN_CONFIG = column_config(CAMPAIGN_TABLE_COLUMNS)
+AD_COLUMN_CONFIG = column_config(AD_TABLE_COLUMNS)
+
+
+def display_values(totals, columns):
+    """Seleciona as colunas e arredonda os valores para exibição, de forma vetorizada"""
+    display = totals[columns].copy()
+    amounts = display.select_dtypes('float').columns
+    display[amounts] = display[amounts].round(2)
+    return display
+
+
+def campaign_table(campaign_totals):
+    """Tabela "Campanhas Publicadas" (exibir com CAMPAIGN_COLUMN_CONFIG)"""
+    return display_values(campaign_totals, CAMPAIGN_TABLE_COLUMNS)
+
+
+def ad_totals(cube):
+    """Agrega o cubo por anúncio com as métricas da tabela de criativos"""
+    return aggregate(cube, 'anuncio', AD_METRICS)
+
+
+def ad_table(ad_data):
+    """Tabela "Criativos Validados" (exibir com AD_COLUMN_CONFIG)"""
+    return display_values(ad_data, AD_TABLE_COLUMNS)
+
+
+def add_changes(table, current, previous):
+    """Acrescenta à tabela a variação de cada coluna de CHANGE_COLUMNS entre os totais alinhados
+    `current` e `previous` (em %; vazia sem base de comparação)
+    """
+    columns = [col for col in CHANGE_COLUMNS if col in table.columns]
+    changes = percent_change(current[columns].to_numpy(), previous[columns].to_numpy())
+    for i, col in enumerate(columns):
+        table[f'{col}_var'] = changes[:, i].round(2)
+    return table
+
+
+def search_rows(table, column, text):
+    """Linhas cujo `column` contém `text` (sem diferenciar maiúsculas)
+
+    Em colunas categóricas a busca é feita só nas categorias distintas e as linhas
+    são selecionadas pelos códigos.
+    """
+    if not text:
+        return table
+    values = table[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        matches = values.cat.categories.str.contains(text, case=False, regex=False)
+        return table[np.isin(values.cat.codes.to_numpy(), np.flatnonzero(matches))]
+    return table[values.astype(str).str.contains(text, case=False, regex=False).to_numpy()]
+
+
+def table_page(table, search='', sort_by=None, ascending=False, top_n=0, page=1, page_size=PAGE_SIZES[1]):
+    """Busca, ordena, limita aos `top_n` primeiros e retorna (página, total de linhas, página ajustada)
+
+    A primeira coluna da tabela é a de nomes, usada na busca. Apenas a página
+    retornada precisa ser enviada ao navegador.
+    """
+    rows = search_rows(table, table.columns[0], search)
+
+    if top_n and sort_by and pd.api.types.is_numeric_dtype(rows[sort_by]):
+        # Top-N parcial, sem ordenar a tabela inteira
+        rows = rows.nsmallest(top_n, sort_by) if ascending else rows.nlargest(top_n, sort_by)
+    else:
+        if sort_by:
+            key = (lambda values: values.astype(str)) if not pd.api.types.is_numeric_dtype(rows[sort_by]) else None
+            rows = rows.sort_values(sort_by, ascending=ascending, kind='stable', key=key)
+        if top_n:
+            rows = rows.head(top_n)
+
+    total = len(rows)
+    page_count = max(1, -(-total // page_size))
+    page = min(max(page, 1), page_count)
+    start = (page - 1) * page_size
+    return rows.iloc[start:start + page_size], total, page
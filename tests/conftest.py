@@ -0,0 +1,17 @@
+"""Configuração dos testes: os módulos do dashboard ficam na raiz do repositório"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sample_data import generate_sample_data  # noqa: E402
+
+
+@pytest.fixture
+def raw_rows():
+    """Linhas brutas de exemplo: 2 contas, 60 dias, com as mesmas células repetidas em duas linhas"""
+    df = generate_sample_data(campaigns=3, adsets=2, ads=2, days=60, accounts=2, seed=7)
+    return pd.concat([df, df.sample(frac=0.3, random_state=1)], ignore_index=True)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import alerts as alerts_module
+from alerts import BASELINE_DAYS, MIN_BASELINE_DAYS, filter_alerts, robust_scores, score_alerts
+from cube import build_cube, build_rollups
+from engine import build_dataset, load_store_dataset, save_dataset, upload_alerts
+from sample_data import generate_sample_data
+
+# Anúncio e dia com o gasto multiplicado nos dados de teste
+SPIKE_AD, SPIKE_DAY = 'Anúncio 2', pd.Timestamp('2025-02-20')
+
+
+def test_robust_score_of_a_known_spike():
+    baseline = np.array([10, 11, 9, 10, 12, 10, 8, 10, 11, 9, 10, 10, 12, 9], dtype='float64')
+    values = np.append(baseline, [40.0, 10.0])[None, :]
+    medians, scores = robust_scores(values)
+
+    median = np.median(baseline)
+    mad = np.median(np.abs(baseline - median))
+    assert medians[0, BASELINE_DAYS] == median
+    assert scores[0, BASELINE_DAYS] == pytest.approx((40 - median) / (1.4826 * mad))
+    assert scores[0, BASELINE_DAYS + 1] == pytest.approx(0.0)
+    # Sem MIN_BASELINE_DAYS dias anteriores, o dia não é avaliado
+    assert np.isnan(scores[0, :MIN_BASELINE_DAYS]).all()
+
+
+def test_constant_baseline_uses_the_scale_floor():
+    values = np.append(np.full(BASELINE_DAYS, 100.0), 103.0)[None, :]
+    _, scores = robust_scores(values)
+    assert scores[0, -1] == pytest.approx(3.0)
+
+
+@pytest.fixture
+def rows():
+    df = generate_sample_data(campaigns=2, adsets=2, ads=2, days=90, seed=1)
+    spike = (df['anuncio'] == SPIKE_AD) & (df['data'] == SPIKE_DAY)
+    df.loc[spike, 'gasto'] *= 8
+    return df
+
+
+def test_spike_is_flagged_for_the_ad_and_its_parents(rows):
+    alerts = score_alerts(build_rollups(build_cube(rows))['dia'])
+    spike = alerts[(alerts['data'] == SPIKE_DAY) & (alerts['metrica'] == 'Ritmo de gasto')]
+    assert SPIKE_AD in set(spike['anuncio'].dropna())
+    assert {'Anúncio', 'Conjunto', 'Campanha'} <= set(spike['nivel'])
+    assert (filter_alerts(alerts, selections={'anuncio': [SPIKE_AD]})['anuncio'].fillna(SPIKE_AD) == SPIKE_AD).all()
+
+
+def test_scoring_since_a_day_matches_the_full_history(rows):
+    daily = build_rollups(build_cube(rows))['dia']
+    since = pd.Timestamp('2025-02-15')
+    full = score_alerts(daily)
+    assert_frame_equal(score_alerts(daily, since), full[full['data'] >= since].reset_index(drop=True))
+
+
+def test_saved_alerts_are_scored_incrementally_and_reused(rows, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for start, end in [('2025-01-01', '2025-01-31'), ('2025-02-01', '2025-02-28'), ('2025-03-01', '2025-03-31'),
+                       ('2025-02-10', '2025-02-25')]:
+        save_dataset(build_dataset(build_cube(rows[rows['data'].between(start, end)])))
+
+    cube, _, _, alerts = load_store_dataset()
+    assert alerts is not None
+    full = score_alerts(build_rollups(cube)['dia'])
+    as_text = {dim: str for dim in ['conta', 'campanha', 'conjunto', 'anuncio']}
+    assert_frame_equal(alerts.astype(as_text), full.astype(as_text), check_dtype=False)
+    assert build_dataset(cube, alerts=alerts)['alerts'] is alerts
+
+
+def test_upload_extending_the_store_scores_only_the_new_days(rows, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    upload = build_rollups(build_cube(rows[rows['data'] >= '2025-02-10']))['dia']
+    # Sem base local, o histórico do arquivo é avaliado inteiro
+    assert_frame_equal(upload_alerts(upload), score_alerts(upload))
+
+    save_dataset(build_dataset(build_cube(rows[rows['data'] <= '2025-02-20'])))
+    scored = []
+    score = alerts_module.score_alerts
+    monkeypatch.setattr(alerts_module, 'score_alerts',
+                        lambda daily, since=None: scored.append(since) or score(daily, since))
+    alerts = upload_alerts(upload)
+    assert scored == [pd.Timestamp('2025-02-21')]
+
+    # Os dias já gravados usam os alertas da base, e os novos, a linha de base gravada
+    full = score_alerts(build_rollups(build_cube(rows))['dia'])
+    full = full[full['data'] >= '2025-02-10'].reset_index(drop=True)
+    as_text = {dim: str for dim in ['conta', 'campanha', 'conjunto', 'anuncio']}
+    assert_frame_equal(alerts.astype(as_text), full.astype(as_text), check_dtype=False)
+    assert SPIKE_AD in set(alerts.loc[alerts['data'] == SPIKE_DAY, 'anuncio'].dropna())
+
+
+def test_upload_with_a_new_account_is_scored_in_full(rows, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_dataset(build_dataset(build_cube(rows[rows['data'] <= '2025-02-20'])))
+    upload = build_rollups(build_cube(rows[rows['data'] >= '2025-02-10'].assign(conta='Outra conta')))['dia']
+    assert_frame_equal(upload_alerts(upload), score_alerts(upload))
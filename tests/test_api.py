@@ -0,0 +1,52 @@
+import json
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from api import start_in_thread
+from engine import Engine
+
+# Dados de exemplo pequenos, para consultas rápidas
+SAMPLE = {'sample': {'campaigns': 2, 'adsets': 1, 'ads': 2, 'days': 10}}
+
+
+@pytest.fixture(scope='module')
+def url():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    start_in_thread(Engine(), port)
+    return f'http://127.0.0.1:{port}'
+
+
+def post(url, payload):
+    request = urllib.request.Request(f'{url}/query', json.dumps(payload).encode(), method='POST')
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_query_returns_the_requested_views(url):
+    status, body = post(url, {'dataset': SAMPLE, 'views': ['metricas']})
+    assert status == 200 and body['metricas']['gasto_total'] > 0
+
+
+@pytest.mark.parametrize('payload', [{'dataset': 'x'}, {'granularity': ['dia']}, {'dataset': {'sample': {'days': 'abc'}}},
+                                     [1, 2]])
+def test_malformed_query_is_a_client_error(url, payload):
+    status, body = post(url, payload)
+    assert status == 400 and 'erro' in body
+
+
+def test_bad_query_in_a_batch_only_fails_itself(url):
+    queries = [{'dataset': SAMPLE, 'views': 'metricas'}, {'dataset': 'x'}, {'granularity': ['dia']},
+               {'dataset': SAMPLE, 'views': ['campanhas']}]
+    status, body = post(url, {'queries': queries})
+    assert status == 200
+    results = body['results']
+    assert 'metricas' in results[0] and 'campanhas' in results[3]
+    assert 'erro' in results[1] and 'erro' in results[2]
@@ -0,0 +1,37 @@
+"""Execução da página pelo AppTest do Streamlit: só a visualização escolhida é calculada"""
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# Etapa medida pelo painel de desempenho exclusiva de cada visualização (a primeira não tem)
+VIEW_STAGES = {'Desempenho de Campanhas': 'views.performance', 'Tabelas Detalhadas': 'views.tables',
+               'Alertas': 'views.alerts'}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Base local e exportações isoladas; sem pasta monitorada, a página usa os dados de exemplo
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('DASHBOARD_WATCH_DIR', raising=False)
+    monkeypatch.delenv('DASHBOARD_API_PORT', raising=False)
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.session_state['debug_panel'] = True
+    return at.run()
+
+
+def last_stages(at):
+    return at.session_state['debug_history'][-1]['stages']
+
+
+def test_only_the_selected_view_is_computed(app):
+    assert not app.exception
+    assert not set(last_stages(app)) & set(VIEW_STAGES.values())
+
+    for view, stage in VIEW_STAGES.items():
+        [selector] = [element for element in app.get('button_group') if element.key == 'view']
+        selector.set_value([view]).run()
+        assert not app.exception
+        assert set(last_stages(app)) & set(VIEW_STAGES.values()) == {stage}
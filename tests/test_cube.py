@@ -0,0 +1,125 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from cube import (CUBE_DIMENSIONS, build_cube, build_rollups, compare_totals, comparison_window, period_start,
+                  period_totals, prepare_rows, slice_dates)
+from engine import with_changes
+from metrics import BASE_COLUMNS
+from sample_data import generate_sample_data
+
+
+def groupby_totals(rows, key):
+    """Totais esperados, direto das linhas brutas"""
+    return rows.groupby(key, sort=True, observed=True)[BASE_COLUMNS].sum().reset_index()
+
+
+def test_cube_matches_groupby_of_raw_rows(raw_rows):
+    cube = build_cube(raw_rows)
+    as_text = {dim: str for dim in CUBE_DIMENSIONS[1:]}
+    expected = groupby_totals(raw_rows.astype(as_text), CUBE_DIMENSIONS)
+    assert cube['data'].is_monotonic_increasing
+    assert_frame_equal(cube.astype(as_text)[CUBE_DIMENSIONS + BASE_COLUMNS], expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('granularity', ['dia', 'semana', 'mes'])
+def test_rollups_keep_totals_per_period(raw_rows, granularity):
+    rollups = build_rollups(build_cube(raw_rows))
+    expected = groupby_totals(raw_rows.assign(data=period_start(raw_rows['data'], granularity)), 'data')
+    result = rollups[granularity].groupby('data', sort=True)[BASE_COLUMNS].sum().reset_index()
+    assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('granularity', ['dia', 'semana', 'mes'])
+@pytest.mark.parametrize('start, end', [('2025-01-01', '2025-03-01'), ('2025-01-08', '2025-02-10'),
+                                        ('2025-01-15', '2025-01-20'), ('2025-02-01', '2025-02-28')])
+def test_period_totals_match_groupby_within_dates(raw_rows, granularity, start, end):
+    rollups = build_rollups(build_cube(raw_rows))
+    selected = {'campanha': ['Campanha 1', 'Campanha 3']}
+    result = period_totals(rollups, granularity, pd.Timestamp(start).date(), pd.Timestamp(end).date(), selected)
+
+    rows = raw_rows[raw_rows['data'].between(start, end) & raw_rows['campanha'].isin(selected['campanha'])]
+    expected = groupby_totals(rows.assign(data=period_start(rows['data'], granularity)), 'data')
+    assert_frame_equal(result[['data'] + BASE_COLUMNS], expected, check_dtype=False)
+
+
+def test_hourly_rows_roll_up_to_days():
+    rows = generate_sample_data(campaigns=2, adsets=1, ads=2, days=3, seed=3, hourly=True)
+    rollups = build_rollups(build_cube(rows))
+    assert 'hora' in rollups
+    assert np.all(rollups['dia']['data'].to_numpy() == rollups['dia']['data'].to_numpy().astype('datetime64[D]'))
+    assert rollups['dia']['gasto'].sum() == pytest.approx(rows['gasto'].sum())
+
+
+@pytest.mark.parametrize('start, end', [('2025-01-10', '2025-01-20'), ('2024-12-01', '2025-01-01'),
+                                        ('2025-03-01', '2025-04-01'), ('2025-05-01', '2025-05-31')])
+def test_slice_dates_matches_boolean_mask(raw_rows, start, end):
+    cube = build_cube(raw_rows)
+    sliced = slice_dates(cube, pd.Timestamp(start).date(), pd.Timestamp(end).date())
+    assert_frame_equal(sliced, cube[cube['data'].between(start, end)])
+
+
+def test_prepare_rows_parses_text_dates_once_and_drops_invalid():
+    rows = pd.DataFrame({'data': ['2025-01-02', 'inválida', '2025-01-01'], 'hora': ['13:00', '0', '23'],
+                         'campanha': 'C', 'gasto': [1.0, 2.0, 3.0]})
+    prepared = prepare_rows(rows)
+    assert prepared['data'].dtype == 'datetime64[ns]'
+    assert prepared['data'].tolist() == [pd.Timestamp('2025-01-02 13:00'), pd.Timestamp('2025-01-01 23:00')]
+
+
+@pytest.mark.parametrize('start, end, comparison, expected', [
+    ('2025-03-10', '2025-03-16', 'anterior', ('2025-03-03', '2025-03-09')),
+    ('2025-03-01', '2025-03-01', 'anterior', ('2025-02-28', '2025-02-28')),
+    ('2025-03-01', '2025-03-31', 'anterior', ('2025-01-29', '2025-02-28')),
+    ('2025-03-10', '2025-03-16', 'ano_anterior', ('2024-03-10', '2024-03-16')),
+    ('2024-02-29', '2024-03-01', 'ano_anterior', ('2023-02-28', '2023-03-01'))
+])
+def test_comparison_window_boundaries(start, end, comparison, expected):
+    assert comparison_window(start, end, comparison) == tuple(date.fromisoformat(day) for day in expected)
+
+
+@pytest.fixture
+def compared_rows():
+    """Campanha 2 sem dados no período de comparação e Campanha 3 só nele"""
+    rows = generate_sample_data(campaigns=3, adsets=1, ads=2, days=40, seed=3)
+    current = rows['data'].between('2025-01-21', '2025-01-30')
+    rows = rows[~((rows['campanha'] == 'Campanha 2') & ~current) & ~((rows['campanha'] == 'Campanha 3') & current)]
+    return rows.reset_index(drop=True)
+
+
+def test_compare_totals_windows_and_rows_in_one_period(compared_rows):
+    cube = build_rollups(build_cube(compared_rows))['dia']
+    period = ('2025-01-21', '2025-01-30')
+    window = comparison_window(*period, 'anterior')
+    assert window == (date(2025, 1, 11), date(2025, 1, 20))
+
+    current, previous = compare_totals(cube, period, window)
+    for totals, (start, end) in [(current, period), (previous, window)]:
+        expected = compared_rows[compared_rows['data'].between(str(start), str(end))][BASE_COLUMNS].sum()
+        np.testing.assert_allclose(totals[BASE_COLUMNS].iloc[0].to_numpy(dtype='float64'),
+                                   expected.to_numpy(dtype='float64'))
+
+    # As linhas são as do período atual; a Campanha 3 (só na comparação) fica de fora
+    current, previous = compare_totals(cube, period, window, 'campanha', ['cpl'])
+    assert current['campanha'].astype(str).tolist() == ['Campanha 1', 'Campanha 2']
+    assert previous['campanha'].astype(str).tolist() == ['Campanha 1', 'Campanha 2']
+    assert (previous.loc[1, BASE_COLUMNS] == 0).all()
+
+
+def test_changes_without_a_baseline_are_empty(compared_rows):
+    cube = build_rollups(build_cube(compared_rows))['dia']
+    period = ('2025-01-21', '2025-01-30')
+    current, previous = compare_totals(cube, period, comparison_window(*period, 'anterior'), 'campanha', ['cpl'])
+    table = with_changes(current, previous)
+    change = (current.loc[0, 'gasto'] / previous.loc[0, 'gasto'] - 1) * 100
+    assert table.loc[0, 'gasto_var'] == pytest.approx(change)
+    # Sem gasto nem mensagens na comparação, a variação fica vazia (e não infinita)
+    assert np.isnan(table.loc[1, ['gasto_var', 'mensagens_var', 'cpl_var']].to_numpy(dtype='float64')).all()
+
+    # Sem dados no ano anterior, todas as variações ficam vazias
+    _, previous = compare_totals(cube, period, comparison_window(*period, 'ano_anterior'), 'campanha', ['cpl'])
+    assert (previous[BASE_COLUMNS] == 0).all().all()
+    assert with_changes(current, previous)['gasto_var'].isna().all()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import downsample_indices, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    x = pd.date_range('2025-01-01', periods=10_000, freq='h').to_numpy()
+    y = np.sin(np.arange(10_000) / 300) + rng.normal(0, 0.05, 10_000)
+    y[4321] = 25.0
+    return x, y
+
+
+@pytest.mark.parametrize('max_points', [3, 10, 500, 1500])
+def test_lttb_keeps_endpoints_and_budget(series, max_points):
+    x, y = series
+    indices = lttb_indices(x, y, max_points)
+    assert len(indices) == max_points
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_an_isolated_spike(series):
+    x, y = series
+    assert 4321 in lttb_indices(x, y, 500)
+
+
+def test_short_series_are_not_reduced(series):
+    x, y = series
+    assert np.array_equal(lttb_indices(x[:100], y[:100], 500), np.arange(100))
+    assert np.array_equal(downsample_indices(x[:100], y[:100], 500, 'minmax'), np.arange(100))
+
+
+def test_minmax_keeps_extremes_and_endpoints(series):
+    x, y = series
+    indices = minmax_indices(y, 200)
+    assert len(indices) <= 202
+    assert {0, len(y) - 1, int(np.argmax(y)), int(np.argmin(y))} <= set(indices.tolist())
+    assert np.all(np.diff(indices) > 0)
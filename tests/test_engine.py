@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+import engine
+from engine import Engine, QueryError, data_path
+from sample_data import generate_sample_data
+
+# Dados de exemplo pequenos, para consultas rápidas
+SAMPLE = {'sample': {'campaigns': 2, 'adsets': 1, 'ads': 2, 'days': 20}}
+
+
+@pytest.fixture
+def query():
+    shared = Engine()
+    return lambda **fields: shared.query({'dataset': SAMPLE, **fields})
+
+
+def test_api_tables_use_raw_totals_in_percent(query):
+    result = query(views=['metricas', 'campanhas'])
+    campaigns = pd.DataFrame(result['campanhas'])
+    clicks, impressions = campaigns['cliques'].sum(), campaigns['impressoes'].sum()
+    assert result['metricas']['ctr'] == pytest.approx(clicks / impressions * 100)
+    assert campaigns['ctr'].between(1, 100).all()
+
+
+def test_scalar_filters_equal_lists(query):
+    assert query(filters={'campanha': 'Campanha 1'}) == query(filters={'campanha': ['Campanha 1']})
+    assert query(views='metricas').keys() == {'metricas'}
+
+
+def test_comparison_tables_are_built_only_when_requested():
+    shared = Engine()
+    fields = {'dataset': SAMPLE, 'filters': {'inicio': '2025-01-11', 'fim': '2025-01-20'}, 'comparison': 'anterior'}
+    result = shared.query({**fields, 'views': ['metricas']})
+    assert result['comparacao']['inicio'] == '2025-01-01'
+    assert not any(key[0] == 'comparacao_tabelas' for key in shared.cache.entries)
+
+    campaigns = pd.DataFrame(shared.query({**fields, 'views': ['campanhas']})['campanhas'])
+    assert any(key[0] == 'comparacao_tabelas' for key in shared.cache.entries)
+    assert 'gasto_var' in campaigns
+
+
+@pytest.mark.parametrize('fields', [
+    {'dataset': 'x'},
+    {'dataset': {'sample': {'days': 'abc'}}},
+    {'dataset': {'sample': {'days': 0}}},
+    {'dataset': {'sample': {'campaigns': 10**4, 'adsets': 10**4, 'days': 365}}},
+    {'dataset': {'sample': {'hourly': 'sim'}}},
+    {'dataset': {'files': {'a': 'a.csv'}}},
+    {'parse_options': {'sep': [';']}, 'dataset': {'store': True}},
+    {'filters': ['campanha']},
+    {'filters': {'campanha': {'nome': 'x'}}},
+    {'filters': {'inicio': '2025-13-01', 'fim': '2025-01-31'}},
+    {'granularity': ['dia']},
+    {'views': [['metricas']]},
+    {'comparison': 1},
+])
+def test_malformed_queries_raise_query_error(fields):
+    with pytest.raises(QueryError):
+        Engine().query({'dataset': SAMPLE, **fields})
+
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    root = tmp_path / 'dados'
+    (root / 'contas').mkdir(parents=True)
+    generate_sample_data(campaigns=1, adsets=1, ads=2, days=5).to_csv(root / 'contas' / 'a.csv', index=False)
+    (tmp_path / 'fora.csv').write_text('data,gasto\n2025-01-01,1\n')
+    (root / 'contas' / 'link.csv').symlink_to(tmp_path / 'fora.csv')
+    monkeypatch.setattr(engine, 'DATA_ROOT', str(root.resolve()))
+    return root
+
+
+def test_paths_are_resolved_under_the_data_root(data_root):
+    assert data_path('contas/a.csv') == str((data_root / 'contas' / 'a.csv').resolve())
+    result = Engine().query({'dataset': {'files': 'contas/a.csv'}, 'views': ['metricas']})
+    assert result['metricas']['gasto_total'] > 0
+
+
+@pytest.mark.parametrize('spec', [{'files': ['../fora.csv']}, {'files': ['contas/link.csv']}, {'watch_dir': '/'},
+                                  {'watch_dir': '..'}, {'files': [1]}])
+def test_paths_outside_the_data_root_are_rejected(data_root, spec):
+    with pytest.raises(QueryError):
+        Engine().resolve(spec)
+
+
+def test_watch_dir_skips_links_out_of_the_root(data_root):
+    key, _ = Engine().resolve({'watch_dir': 'contas'})
+    assert [source.split(':')[0].endswith('a.csv') for source in key[1]] == [True]
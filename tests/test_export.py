@@ -0,0 +1,70 @@
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import export
+from cube import build_cube, build_rollups
+from export import export_path, write_export
+from metrics import add_derived_metrics
+from sample_data import generate_sample_data
+
+
+@pytest.fixture
+def cube(tmp_path, monkeypatch):
+    """Cubo por hora pequeno, exportado em blocos de 50 linhas para uma pasta temporária"""
+    monkeypatch.setattr(export, 'EXPORT_DIR', str(tmp_path))
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_ROWS', 50)
+    return build_rollups(build_cube(generate_sample_data(campaigns=2, adsets=1, ads=2, days=2, seed=5,
+                                                         hourly=True)))['hora']
+
+
+def as_text(df):
+    return df.astype({col: str for col in ['conta', 'campanha', 'conjunto', 'anuncio']})
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'parquet', 'xlsx'])
+def test_chunked_export_matches_the_table(cube, export_format):
+    assert len(cube) > 3 * export.EXPORT_CHUNK_ROWS
+    path = write_export({'dados': cube}, export_path('dados', export_format), export_format, derived=True)
+    if export_format == 'csv':
+        written = pd.read_csv(path, parse_dates=['data'])
+    elif export_format == 'parquet':
+        written = pd.read_parquet(path)
+    else:
+        written = pd.read_excel(path, sheet_name='dados')
+
+    expected = as_text(add_derived_metrics(cube.copy()))
+    assert len(written) == len(cube) and list(written.columns) == list(expected.columns)
+    # Horas preservadas e um único cabeçalho, apesar da gravação em blocos
+    assert written['data'].dt.hour.nunique() == 24
+    pd.testing.assert_frame_equal(as_text(written), expected, check_dtype=False, check_categorical=False)
+
+
+def test_several_tables_become_a_zip_or_sheets(cube):
+    tables = {'campanhas': cube.head(150), 'anuncios': cube.tail(50)}
+    path = write_export(tables, export_path('tabelas', 'csv', multiple=True), 'csv')
+    assert path.endswith('.zip')
+    with zipfile.ZipFile(path) as archive:
+        assert sorted(archive.namelist()) == ['anuncios.csv', 'campanhas.csv']
+        assert len(pd.read_csv(io.BytesIO(archive.read('campanhas.csv')))) == 150
+
+    path = write_export(tables, export_path('tabelas', 'xlsx', multiple=True), 'xlsx')
+    assert path.endswith('.xlsx')
+    assert load_workbook(path, read_only=True).sheetnames == ['campanhas', 'anuncios']
+
+
+def test_export_path_follows_the_data_and_filters(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_DIR', str(tmp_path))
+    key = (('base', ()), '2025-01-01', '2025-01-31', ('Conta 1',))
+    path = export_path(key, 'csv')
+    assert path == export_path(key, 'csv')
+    assert os.path.dirname(path) == str(tmp_path)
+    assert path.endswith('.csv')
+    assert export_path((key[0], '2025-01-01', '2025-01-30', key[3]), 'csv') != path
+    assert export_path(key, 'parquet') != path
+    assert export_path(key, 'csv', multiple=True).endswith('.zip')
+    assert export_path(key, 'xlsx', multiple=True).endswith('.xlsx')
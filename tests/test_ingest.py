@@ -0,0 +1,95 @@
+import io
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from engine import load_files
+from ingest import list_excel_sheets, parse_to_cube, read_excel_sheet
+from sample_data import generate_sample_data
+
+
+@pytest.fixture
+def export_rows():
+    """Exportação com os nomes de coluna do gerenciador de anúncios e uma coluna não usada"""
+    rows = generate_sample_data(campaigns=2, adsets=1, ads=3, days=20, seed=2)
+    rows = rows.rename(columns={'data': 'Data', 'campanha': 'Campanha', 'gasto': 'Gasto'})
+    return rows.assign(Observacao='texto livre')
+
+
+def excel_bytes(sheets):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+
+def test_excel_reads_only_recognized_columns_of_the_chosen_sheet(export_rows):
+    content = excel_bytes({'Resumo': export_rows.head(3), 'Dados': export_rows})
+    assert list_excel_sheets('dados.xlsx', content) == ['Resumo', 'Dados']
+
+    df = read_excel_sheet(io.BytesIO(content), 'Dados')
+    assert len(df) == len(export_rows)
+    assert 'Observacao' not in df.columns
+
+    # Planilha inexistente: usa a primeira
+    assert len(read_excel_sheet(io.BytesIO(content), 'Outra')) == 3
+
+
+def test_excel_and_csv_give_the_same_cube(export_rows):
+    csv_cube, _, csv_error, _, _ = parse_to_cube('dados.csv', export_rows.to_csv(index=False).encode())
+    excel_cube, _, excel_error, _, _ = parse_to_cube('dados.xlsx', excel_bytes({'Dados': export_rows}),
+                                                  {'sheet': 'Dados'})
+    assert csv_error is None and excel_error is None
+    assert_frame_equal(excel_cube, csv_cube, check_dtype=False, check_categorical=False)
+
+
+def test_streaming_csv_matches_reading_at_once(export_rows):
+    content = export_rows.to_csv(index=False).encode()
+    whole = parse_to_cube('dados.csv', content)[0]
+    streamed = parse_to_cube('dados.csv', content, {'streaming': True})[0]
+    assert_frame_equal(streamed, whole, check_dtype=False)
+
+
+def parse_source(key, name, source):
+    return parse_to_cube(name, source)
+
+
+def test_files_without_account_column_are_kept_apart_and_totals_preserved():
+    # Duas contas com os mesmos nomes de campanha, conjunto e anúncio nos mesmos dias
+    first = generate_sample_data(campaigns=2, adsets=1, ads=2, days=10, seed=1).drop(columns='conta')
+    second = generate_sample_data(campaigns=2, adsets=1, ads=2, days=10, seed=2).drop(columns='conta')
+    sources = [('a', 'conta_a.csv', first.to_csv(index=False).encode()),
+               ('b', 'conta_b.csv', second.to_csv(index=False).encode())]
+    cube, report, _ = load_files(sources, {}, parse_source)
+
+    assert [row['Erro'] for row in report] == ['', '']
+    assert sorted(cube['conta'].cat.categories) == ['conta_a', 'conta_b']
+    assert cube['gasto'].sum() == pytest.approx(first['gasto'].sum() + second['gasto'].sum())
+
+
+def test_reexport_of_the_same_source_replaces_overlapping_days():
+    rows = generate_sample_data(campaigns=2, adsets=1, ads=2, days=10, seed=1).drop(columns='conta')
+    week, longer = rows[rows['data'] < '2025-01-08'], rows[rows['data'] < '2025-01-09']
+    sources = [('a', 'conta_a.csv', week.to_csv(index=False).encode()),
+               ('b', 'conta_a.csv', longer.to_csv(index=False).encode())]
+    cube, _, _ = load_files(sources, {}, parse_source)
+    assert cube['gasto'].sum() == pytest.approx(longer['gasto'].sum())
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_files_without_valid_dates_are_an_error(export_rows, streaming):
+    header_only = export_rows.head(0).to_csv(index=False).encode()
+    invalid_dates = export_rows.head(5).assign(Data='sem data').to_csv(index=False).encode()
+    for content, dropped in [(header_only, 0), (invalid_dates, 5)]:
+        cube, sketches, error, _, invalid = parse_to_cube('dados.csv', content, {'streaming': streaming})
+        assert (cube, sketches, error, invalid) == (None, None, 'O arquivo não contém linhas de dados.', dropped)
+
+
+def test_report_counts_rows_dropped_for_invalid_dates(export_rows):
+    rows = export_rows.astype({'Data': str})
+    rows.loc[rows.index[-4:], 'Data'] = 'não informada'
+    cube, report, _ = load_files([('a', 'dados.csv', rows.to_csv(index=False).encode())], {}, parse_source)
+    assert report[0]['Datas inválidas'] == 4 and report[0]['Erro'] == ''
+    assert cube['gasto'].sum() == pytest.approx(export_rows['Gasto'].iloc[:-4].sum())
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from memo import MemoCache
+
+
+def sized_cache(max_bytes, **kwargs):
+    """Cache em que o tamanho de cada valor é o próprio valor"""
+    return MemoCache(max_bytes, sizeof=lambda value: value, **kwargs)
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = sized_cache(10)
+    for key in 'abc':
+        cache.get_or_compute(key, lambda: 3)
+    cache.get_or_compute('a', lambda: 3)  # hit: 'a' passa a ser o mais recente
+    cache.get_or_compute('d', lambda: 3)
+
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.stats() == {'hits': 1, 'misses': 4, 'evictions': 1, 'entries': 3, 'bytes': 9, 'max_bytes': 10}
+
+
+def test_oversized_values_are_not_kept_unless_requested():
+    cache = sized_cache(10)
+    cache.get_or_compute('a', lambda: 4)
+    assert cache.get_or_compute('grande', lambda: 50) == 50
+    assert 'grande' not in cache and 'a' in cache
+
+    keeping = sized_cache(10, keep_oversized=True)
+    keeping.get_or_compute('a', lambda: 4)
+    keeping.get_or_compute('grande', lambda: 50)
+    assert 'grande' in keeping and 'a' not in keeping
+
+
+def test_concurrent_misses_compute_once():
+    cache = sized_cache(100)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 1
+
+    threads = [threading.Thread(target=cache.get_or_compute, args=('chave', compute)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 7
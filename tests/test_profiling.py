@@ -0,0 +1,39 @@
+import json
+import time
+
+from profiling import HISTORY_SIZE, StageProfiler, history_summary, history_to_json, history_to_prometheus, new_history
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = StageProfiler(enabled=False)
+    with profiler.stage('filtros'):
+        pass
+    assert profiler.timings == {}
+
+
+def test_repeated_stages_are_summed_and_profiled_once():
+    profiler = StageProfiler(enabled=True, profile_stages=['graficos'])
+    for _ in range(2):
+        with profiler.stage('graficos'):
+            with profiler.stage('tabelas'):
+                time.sleep(0.01)
+    assert profiler.timings['graficos'] >= profiler.timings['tabelas'] >= 0.02
+    assert set(profiler.profiles) == {'graficos'}
+
+
+def test_history_summary_and_exports():
+    history = new_history()
+    for seconds in range(1, HISTORY_SIZE + 11):
+        profiler = StageProfiler(enabled=True)
+        profiler.timings['filtros'] = float(seconds)
+        profiler.finish(history)
+
+    assert len(history) == HISTORY_SIZE
+    [row] = history_summary(history)
+    assert row['etapa'] == 'filtros'
+    assert row['ultima'] == HISTORY_SIZE + 10
+    assert row['execucoes'] == HISTORY_SIZE
+    assert row['mediana'] <= row['p90'] <= row['ultima']
+
+    assert len(json.loads(history_to_json(history))) == HISTORY_SIZE
+    assert 'dashboard_stage_seconds{stage="filtros",quantile="0.5"}' in history_to_prometheus(history)
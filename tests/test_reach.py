@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import build_cube
+from reach import (SKETCH_REGISTERS, build_sketches, covers_cube, distinct_reach, estimate_reach, merge_sketches,
+                   register_ranks)
+
+# Erro relativo típico do HyperLogLog com SKETCH_REGISTERS registradores
+STANDARD_ERROR = 1.04 / np.sqrt(SKETCH_REGISTERS)
+
+
+def user_rows(users, days=10, campaigns=('C1', 'C2'), seed=0):
+    """Uma linha por usuário alcançado, sorteado entre `users`, em cada dia e campanha"""
+    rng = np.random.default_rng(seed)
+    n = days * len(campaigns) * 500
+    return pd.DataFrame({
+        'data': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, days, n), unit='D'),
+        'conta': 'X', 'campanha': rng.choice(list(campaigns), n), 'conjunto': 'S', 'anuncio': 'A',
+        'impressoes': 1, 'alcance': 1, 'cliques': 0, 'mensagens': 0, 'gasto': 1.0, 'receita': 0.0,
+        'usuario': rng.choice(users, n)
+    })
+
+
+@pytest.mark.parametrize('count', [100, 5_000, 200_000])
+def test_estimate_is_within_the_error_bound(count):
+    indices, ranks = register_ranks(pd.util.hash_array(np.arange(count, dtype='int64')))
+    registers = np.zeros(SKETCH_REGISTERS, dtype='uint8')
+    np.maximum.at(registers, indices.astype('int64'), ranks)
+    assert abs(estimate_reach(registers) - count) <= 4 * STANDARD_ERROR * count
+
+
+def test_distinct_reach_counts_each_user_once():
+    rows = user_rows(np.arange(3_000))
+    sketches = build_sketches(rows)
+    exact = rows['usuario'].nunique()
+    assert rows['alcance'].sum() > 2 * exact
+    assert distinct_reach(sketches) == pytest.approx(exact, rel=4 * STANDARD_ERROR)
+
+    january_5 = rows[rows['data'] == '2025-01-05']
+    reach = distinct_reach(sketches, '2025-01-05', '2025-01-05', {'campanha': ['C1']})
+    assert reach == pytest.approx(january_5[january_5['campanha'] == 'C1']['usuario'].nunique(),
+                                  rel=4 * STANDARD_ERROR)
+
+
+def test_merge_equals_sketching_all_rows_and_needs_every_part():
+    first, second = user_rows(np.arange(2_000), seed=1), user_rows(np.arange(1_000, 4_000), seed=2)
+    merged = merge_sketches([build_sketches(first), build_sketches(second)])
+    together = build_sketches(pd.concat([first, second], ignore_index=True))
+    assert distinct_reach(merged) == distinct_reach(together)
+    assert merge_sketches([build_sketches(first), None]) is None
+    assert build_sketches(first.drop(columns='usuario')) is None
+
+
+def test_sketches_cover_the_cube_only_with_every_cell():
+    rows = user_rows(np.arange(500))
+    cube = build_cube(rows)
+    sketches = build_sketches(rows)
+    assert covers_cube(sketches, cube)
+    assert not covers_cube(sketches[sketches['data'] != sketches['data'].iloc[0]], cube)
+    assert not covers_cube(None, cube)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from cube import build_cube, build_rollups
+from registry import DatasetRegistry, dataset_size
+from sample_data import generate_sample_data
+
+
+@pytest.fixture
+def dataset():
+    rollups = build_rollups(build_cube(generate_sample_data(campaigns=2, adsets=1, ads=2, days=10, seed=6)))
+    return {'rollups': rollups, 'report': []}
+
+
+def test_returned_frames_are_read_only(dataset):
+    registry = DatasetRegistry()
+    frozen = registry.get_or_compute('a', lambda: dataset)
+    daily = frozen['rollups']['dia']
+    assert registry.get_or_compute('a', lambda: None) is frozen
+
+    with pytest.raises(ValueError):
+        daily['gasto'].to_numpy()[0] = 0
+    with pytest.raises(ValueError):
+        daily.iloc[0, daily.columns.get_loc('impressoes')] = 0
+    with pytest.raises(ValueError):
+        daily['campanha'].cat.codes.to_numpy()[0] = 1
+    # O original, de quem carregou, segue gravável e igual ao congelado
+    np.testing.assert_array_equal(daily['gasto'], dataset['rollups']['dia']['gasto'])
+
+
+def test_budget_evicts_the_least_recently_used_dataset(dataset):
+    size = dataset_size(dataset)
+    registry = DatasetRegistry(max_bytes=2.5 * size)
+    for key in 'abc':
+        registry.get_or_compute(key, lambda: dataset)
+        if key == 'b':
+            registry.get_or_compute('a', lambda: dataset)  # 'a' passa a ser o mais recente
+
+    assert 'b' not in registry
+    assert 'a' in registry and 'c' in registry
+    assert registry.stats()['evictions'] == 1
+
+
+def test_a_dataset_over_the_budget_is_still_kept(dataset):
+    registry = DatasetRegistry(max_bytes=1)
+    registry.get_or_compute('a', lambda: dataset)
+    registry.get_or_compute('b', lambda: dataset)
+    assert 'a' not in registry and 'b' in registry
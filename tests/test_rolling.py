@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine as engine_module
+from cube import aggregate, build_cube, period_totals
+from engine import Engine, load_store_dataset
+from metrics import BASE_COLUMNS
+from rolling import RollingSeries, rolling_table
+from sample_data import generate_sample_data
+from store import append_cube, store_signature
+
+
+@pytest.fixture
+def daily():
+    """Totais diários com dois dias sem dados no meio da série"""
+    rows = generate_sample_data(campaigns=2, adsets=2, ads=2, days=70, seed=9)
+    rows = rows[~rows['data'].isin(pd.to_datetime(['2025-02-03', '2025-02-04']))]
+    return aggregate(build_cube(rows), 'data')
+
+
+def expected_windows(daily, window):
+    """Janelas de `window` dias pelo pandas.rolling, com os dias sem dados como zero"""
+    full = daily.set_index('data')[BASE_COLUMNS].asfreq('D', fill_value=0)
+    return full.rolling(window, min_periods=window).sum()
+
+
+def ratio(numerator, denominator):
+    """Razão das somas; janelas sem denominador valem 0, como nas métricas do dashboard"""
+    return (numerator / denominator).mask(denominator == 0, 0).to_numpy()
+
+
+@pytest.mark.parametrize('window', [1, 7, 28])
+def test_window_sums_and_ratios_match_pandas_rolling(daily, window):
+    table = rolling_table(RollingSeries().append(daily), windows=[7, 28])
+    sums = expected_windows(daily, window)
+    assert table['data'].tolist() == sums.index.tolist()
+    np.testing.assert_allclose(table[f'ctr_{window}d'], ratio(sums['cliques'], sums['impressoes']) * 100)
+    np.testing.assert_allclose(table[f'roas_{window}d'], ratio(sums['receita'], sums['gasto']))
+
+
+def test_incremental_appends_match_a_single_append(daily):
+    whole = rolling_table(RollingSeries().append(daily))
+    series = RollingSeries()
+    for start in range(0, len(daily), 10):
+        series.append(daily.iloc[start:start + 10])
+    # Reenviar dias já presentes os substitui, sem somar
+    series.append(daily.iloc[-15:])
+    pd.testing.assert_frame_equal(rolling_table(series), whole)
+
+
+def test_cumulative_spend_restarts_at_the_period(daily):
+    series = RollingSeries().append(daily)
+    table = rolling_table(series, pd.Timestamp('2025-02-01').date(), pd.Timestamp('2025-02-28').date())
+    period = daily[daily['data'].between('2025-02-01', '2025-02-28')]
+    assert table['gasto_acumulado'].iloc[-1] == pytest.approx(period['gasto'].sum())
+    assert len(table) == 28
+
+
+def test_store_series_is_extended_with_the_rewritten_months(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rows = generate_sample_data(campaigns=2, adsets=2, ads=2, days=70, seed=9)
+    engine = Engine()
+    selections = {'campanha': ['Campanha 1']}
+
+    def store_series():
+        dataset_key = ('base', store_signature())
+        rollups = engine.dataset(dataset_key, load_store_dataset)['rollups']
+        return engine.rolling_series(dataset_key, rollups, selections), rollups
+
+    append_cube(build_cube(rows[rows['data'] < '2025-02-15']))
+    store_series()
+    append_cube(build_cube(rows[rows['data'] >= '2025-02-10']))
+    summed = []
+    monkeypatch.setattr(engine_module, 'period_totals', lambda *args: summed.append(args[2]) or period_totals(*args))
+    series, rollups = store_series()
+
+    # Só fevereiro e março (meses regravados) são somados de novo
+    assert summed == [datetime(2025, 2, 1)]
+    expected = RollingSeries().append(period_totals(rollups, 'dia', selections=selections))
+    pd.testing.assert_frame_equal(rolling_table(series), rolling_table(expected))
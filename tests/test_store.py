@@ -0,0 +1,68 @@
+import pyarrow.feather as feather
+import pytest
+
+from cube import build_cube
+from metrics import BASE_COLUMNS
+from sample_data import generate_sample_data
+from store import append_cube, list_partitions, load_store, store_signature
+
+
+@pytest.fixture
+def daily_rows():
+    return generate_sample_data(campaigns=2, adsets=2, ads=2, days=45, seed=11)
+
+
+def totals(cube):
+    return cube[BASE_COLUMNS].sum()
+
+
+def test_save_and_reload_by_month(tmp_path, daily_rows):
+    cube = build_cube(daily_rows)
+    assert append_cube(cube, tmp_path) == ['2025-01', '2025-02']
+    assert len(list_partitions(tmp_path)) == 2
+    reloaded = load_store(tmp_path)
+    assert reloaded['data'].is_monotonic_increasing
+    assert totals(reloaded).tolist() == pytest.approx(totals(cube).tolist())
+
+
+def test_resaving_the_same_days_replaces_instead_of_adding(tmp_path, daily_rows):
+    cube = build_cube(daily_rows)
+    append_cube(cube, tmp_path)
+    append_cube(cube, tmp_path)
+    overlap = build_cube(daily_rows[daily_rows['data'].between('2025-01-20', '2025-02-05')])
+    assert append_cube(overlap, tmp_path) == ['2025-01', '2025-02']
+
+    reloaded = load_store(tmp_path)
+    assert len(reloaded) == len(cube)
+    assert totals(reloaded).tolist() == pytest.approx(totals(cube).tolist())
+
+
+def test_only_affected_months_are_rewritten(tmp_path, daily_rows):
+    append_cube(build_cube(daily_rows), tmp_path)
+    before = dict((name, mtime) for name, _, mtime in store_signature(tmp_path))
+    append_cube(build_cube(daily_rows[daily_rows['data'] >= '2025-02-10']), tmp_path)
+    after = dict((name, mtime) for name, _, mtime in store_signature(tmp_path))
+    assert after['mes=2025-01.feather'] == before['mes=2025-01.feather']
+
+
+def test_hourly_save_replaces_the_same_calendar_day(tmp_path):
+    hourly = generate_sample_data(campaigns=1, adsets=1, ads=2, days=2, seed=5, hourly=True)
+    daily = hourly.assign(data=hourly['data'].dt.normalize())
+    append_cube(build_cube(daily), tmp_path)
+    append_cube(build_cube(hourly), tmp_path)
+    reloaded = load_store(tmp_path)
+    assert len(reloaded) == len(build_cube(hourly))
+    assert reloaded['gasto'].sum() == pytest.approx(hourly['gasto'].sum())
+
+
+def test_old_partition_without_account_is_filled_before_replacing(tmp_path, daily_rows):
+    cube = build_cube(daily_rows.drop(columns='conta'))
+    append_cube(cube, tmp_path)
+    # Partição gravada antes de a conta existir
+    path = list_partitions(tmp_path)[0]
+    feather.write_feather(feather.read_feather(path).drop(columns='conta'), path)
+
+    append_cube(cube, tmp_path)
+    reloaded = load_store(tmp_path)
+    assert reloaded['conta'].cat.categories.tolist() == ['Não especificado']
+    assert totals(reloaded).tolist() == pytest.approx(totals(cube).tolist())
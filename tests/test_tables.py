@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from cube import build_cube
+from engine import campaign_totals
+from sample_data import generate_sample_data
+from tables import (CAMPAIGN_COLUMN_CONFIG, CAMPAIGN_TABLE_COLUMNS, COLUMN_FORMATS, add_changes, ad_table, ad_totals,
+                    campaign_table, format_number, styled_table, table_page)
+
+
+@pytest.fixture
+def cube():
+    return build_cube(generate_sample_data(campaigns=4, adsets=2, ads=3, days=30, seed=4))
+
+
+def test_values_are_shown_with_pt_br_separators(cube):
+    table = campaign_table(campaign_totals(cube)).head(3)
+    table.loc[table.index[0], ['gasto', 'impressoes', 'ctr']] = [1234567.891, 1234567, 4.25]
+    styled = styled_table(table)
+    html = styled.to_html()
+    assert 'R$ 1.234.567,89' in html and '>1.234.567<' in html and '4,25%' in html
+    # Os dados continuam numéricos, para a ordenação no st.dataframe
+    assert styled.data['gasto'].dtype.kind == 'f'
+    assert CAMPAIGN_COLUMN_CONFIG['gasto']['type_config']['format'] is None
+    assert format_number(-12.34, COLUMN_FORMATS['gasto_var'][1]) == '-12,3%'
+
+
+def test_display_values_round_without_changing_scale(cube):
+    totals = campaign_totals(cube)
+    table = campaign_table(totals)
+    assert list(table.columns) == CAMPAIGN_TABLE_COLUMNS
+    # CTR e ROI continuam em % (0–100), como nos cartões e na API
+    np.testing.assert_allclose(table['ctr'], totals['ctr'].round(2))
+    np.testing.assert_allclose(table['roi'], totals['roi'].round(2))
+    assert (table['gasto'] == totals['gasto'].round(2)).all()
+    assert table['impressoes'].dtype.kind == 'i'
+
+
+def test_changes_are_percentages_and_empty_without_a_base(cube):
+    current = ad_totals(cube)
+    previous = current.assign(gasto=current['gasto'] / 2, mensagens=0)
+    table = add_changes(ad_table(current), current, previous)
+    np.testing.assert_allclose(table['gasto_var'], 100.0)
+    assert table['mensagens_var'].isna().all()
+    assert 'roas_var' not in table
+
+
+def test_table_page_searches_sorts_and_paginates_on_the_server(cube):
+    table = ad_table(ad_totals(cube))
+    expected = table[table['anuncio'].astype(str).str.contains('anúncio 1', case=False)]
+    expected = expected.sort_values('gasto', ascending=False)
+
+    rows, total, page = table_page(table, 'ANÚNCIO 1', 'gasto', page=2, page_size=5)
+    assert total == len(expected)
+    assert page == 2
+    assert rows['anuncio'].tolist() == expected['anuncio'].iloc[5:10].tolist()
+
+
+def test_table_page_top_n_and_page_bounds(cube):
+    table = ad_table(ad_totals(cube))
+    rows, total, page = table_page(table, sort_by='cpl', ascending=True, top_n=7, page=99, page_size=5)
+    assert total == 7
+    assert page == 2
+    assert rows['cpl'].tolist() == table['cpl'].nsmallest(7).iloc[5:].tolist()
+
+    rows, total, page = table_page(table, search='não existe')
+    assert (len(rows), total, page) == (0, 0, 1)